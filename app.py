@@ -3,24 +3,85 @@ Enhanced Multi-Model Image Classification Flask Application
 Supports MobileNetV2, ResNet50, EfficientNetB0, and DenseNet121
 """
 
+import io
 import os
 import json
-import time
 import threading
+import uuid
+import tempfile
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_file, session
-import tensorflow as tf
+import time
+from flask import Flask, Request, Response, current_app, g, render_template, request, jsonify, send_file, session
 import numpy as np
 from werkzeug.utils import secure_filename
 
-# Import utility modules
-from utils.model_factory import ModelFactory
-from utils.training_utils import TrainingPipeline
-from utils.prediction_utils import MultiModelPredictor
-from utils.analytics_utils import AnalyticsUtils
+# Import utility modules. TensorFlow-backed utilities (models, training, inference) are imported
+# where they are used, so pages and dataset routes answer without loading TensorFlow
+from utils.lazy_loading import LazyComponent
+from utils.analytics_cache import AnalyticsCache, PlotRenderer, REPORT_PLOT, metrics_path, plot_path
+from utils.dataset_index import DatasetIndex
+from utils.metrics_store import MetricsStore
+from utils.progress_events import HEARTBEAT_SEC, ProgressEventBus, ProgressFileWatcher, format_sse
+from utils.serving_metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE, HTTP_REQUEST_SECONDS, IMAGE_DECODE_SECONDS, REGISTRY as metrics_registry,
+    TRAINING_EPOCH_SECONDS
+)
+
+class IngestRequest(Request):
+    """
+    Archive uploads to /api/ingest and /api/predict_batch get their own size
+    limits. Ingest requests stream file parts straight into the staging folder,
+    where the background job reads them after the request has finished. Parts
+    not handed to a job are removed when the request ends (see
+    remove_staged_uploads), including those of a parse cut short by a 413 or
+    a client disconnect.
+    """
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Staged file parts of this request, recorded as they are created
+        self.staged_files = []
+    
+    def hand_over_staged(self):
+        """Paths of the staged parts, which the caller now owns"""
+        paths = [f.name for f in self.staged_files]
+        self.staged_files = []
+        return paths
+    
+    # Config key of the upload size limit of each archive route
+    UPLOAD_LIMITS = {
+        '/api/ingest': 'INGEST_MAX_CONTENT_LENGTH',
+        '/api/predict_batch': 'BATCH_MAX_CONTENT_LENGTH'
+    }
+    
+    def _is_ingest(self):
+        return self.path == '/api/ingest'
+    
+    @property
+    def max_content_length(self):
+        limit_key = self.UPLOAD_LIMITS.get(self.path)
+        if current_app and limit_key:
+            return current_app.config[limit_key]
+        return super().max_content_length
+    
+    @property
+    def max_form_parts(self):
+        # Every ingested image is a file part (plus its folder name field)
+        if current_app and self._is_ingest():
+            return current_app.config['INGEST_MAX_FORM_PARTS']
+        return super().max_form_parts
+    
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if current_app and self._is_ingest():
+            staged_file = tempfile.NamedTemporaryFile('wb+', dir=current_app.config['INGEST_STAGING_FOLDER'],
+                                                      prefix='ingest_', suffix='.part', delete=False)
+            self.staged_files.append(staged_file)
+            return staged_file
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
 
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = IngestRequest
 app.secret_key = 'your-secret-key-change-this-in-production'
 
 # Configuration
@@ -29,43 +90,294 @@ app.config['UPLOAD_FOLDER'] = 'uploads'
 app.config['MODELS_FOLDER'] = 'models'
 app.config['METRICS_FOLDER'] = 'metrics'
 app.config['DATA_FOLDER'] = 'data'
+app.config['RESULTS_FOLDER'] = 'results'
+app.config['CACHE_FOLDER'] = 'cache'
+
+# Bulk ingestion: request size limit (bytes), worker threads (0 = CPU count), de-duplication
+# ('none', 'exact' or 'perceptual'), dHash distance for near duplicates and pre-resizing
+app.config['INGEST_STAGING_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'ingest')
+app.config['INGEST_MAX_CONTENT_LENGTH'] = int(os.environ.get('INGEST_MAX_CONTENT_LENGTH', 8 * 1024 ** 3))
+app.config['INGEST_MAX_FORM_PARTS'] = int(os.environ.get('INGEST_MAX_FORM_PARTS', 100_000))
+app.config['INGEST_WORKERS'] = int(os.environ.get('INGEST_WORKERS', 0))
+app.config['INGEST_DEDUP'] = os.environ.get('INGEST_DEDUP', 'exact')
+app.config['INGEST_PHASH_THRESHOLD'] = int(os.environ.get('INGEST_PHASH_THRESHOLD', 6))
+app.config['INGEST_PRE_RESIZE'] = os.environ.get('INGEST_PRE_RESIZE', '1') == '1'
+
+# Training input pipeline: 'generator' (ImageDataGenerator), 'tf_data' (cached tf.data)
+# or 'shards' (pre-resized NumPy shards, rebuilt incrementally before each run)
+app.config['TRAINING_INPUT_PIPELINE'] = os.environ.get('TRAINING_INPUT_PIPELINE', 'generator')
+app.config['SHARDS_FOLDER'] = os.environ.get('SHARDS_FOLDER', os.path.join(app.config['CACHE_FOLDER'], 'shards'))
+app.config['SHARD_SIZE'] = int(os.environ.get('SHARD_SIZE', 1024))
+
+# Parallel training: worker processes (1 = train in-process, one model after another),
+# CPU threads per worker (0 = split evenly) and global memory limit in MB (0 = none)
+app.config['TRAINING_PARALLEL_WORKERS'] = int(os.environ.get('TRAINING_PARALLEL_WORKERS', 1))
+app.config['TRAINING_THREADS_PER_WORKER'] = int(os.environ.get('TRAINING_THREADS_PER_WORKER', 0))
+app.config['TRAINING_MEMORY_LIMIT_MB'] = int(os.environ.get('TRAINING_MEMORY_LIMIT_MB', 0))
+
+# Train only classification heads on cached frozen-backbone features (implies tf_data)
+app.config['TRAINING_HEAD_ONLY'] = os.environ.get('TRAINING_HEAD_ONLY', '0') == '1'
+
+# Distillation of the trained ensemble into the 'student' model: softmax temperature and
+# weight of the soft ensemble targets against the hard labels
+app.config['DISTILL_TEMPERATURE'] = float(os.environ.get('DISTILL_TEMPERATURE', 2.0))
+app.config['DISTILL_ALPHA'] = float(os.environ.get('DISTILL_ALPHA', 0.7))
+
+# Archive size limit (bytes) of /api/predict_batch uploads
+app.config['BATCH_MAX_CONTENT_LENGTH'] = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', 8 * 1024 ** 3))
+
+# Server-side directories accepted by /api/predict_batch must live below this root
+app.config['BATCH_INPUT_ROOT'] = os.environ.get('BATCH_INPUT_ROOT', os.getcwd())
+
+# Memory budget for resident models in MB (0 = unlimited)
+app.config['MODEL_MEMORY_BUDGET_MB'] = float(os.environ.get('MODEL_MEMORY_BUDGET_MB', 0))
+
+# Serving backend: 'keras' (.h5), 'tflite_fp16' or 'tflite_int8'
+app.config['INFERENCE_BACKEND'] = os.environ.get('INFERENCE_BACKEND', 'keras')
+
+# Export TFLite fp16/int8 variants after each successful training run
+app.config['EXPORT_TFLITE'] = os.environ.get('EXPORT_TFLITE', '1') == '1'
+app.config['TFLITE_CALIBRATION_SAMPLES'] = int(os.environ.get('TFLITE_CALIBRATION_SAMPLES', 100))
+
+# Per-model execution within one ensemble prediction ('sequential' or 'parallel')
+app.config['INFERENCE_EXECUTION_MODE'] = os.environ.get('INFERENCE_EXECUTION_MODE', 'sequential')
+app.config['TF_INTRA_OP_THREADS'] = int(os.environ.get('TF_INTRA_OP_THREADS', 0))
+app.config['TF_INTER_OP_THREADS'] = int(os.environ.get('TF_INTER_OP_THREADS', 0))
+
+# Ensemble mode: 'full' runs every model; 'cascade' runs the fastest model first and
+# escalates only while the ensemble is below the confidence or agreement threshold (%)
+app.config['ENSEMBLE_MODE'] = os.environ.get('ENSEMBLE_MODE', 'full')
+app.config['CASCADE_CONFIDENCE_THRESHOLD'] = float(os.environ.get('CASCADE_CONFIDENCE_THRESHOLD', 90))
+app.config['CASCADE_AGREEMENT_THRESHOLD'] = float(os.environ.get('CASCADE_AGREEMENT_THRESHOLD', 100))
+
+# Prediction result cache keyed by image content hash and model versions:
+# entries (0 = disabled), time to live in seconds (0 = no expiry) and SQLite persistence
+app.config['PREDICTION_CACHE_SIZE'] = int(os.environ.get('PREDICTION_CACHE_SIZE', 1024))
+app.config['PREDICTION_CACHE_TTL_SEC'] = float(os.environ.get('PREDICTION_CACHE_TTL_SEC', 3600))
+app.config['PREDICTION_CACHE_PERSIST'] = os.environ.get('PREDICTION_CACHE_PERSIST', '0') == '1'
+
+# Prometheus-style /metrics endpoint and per-request latency instrumentation
+app.config['ENABLE_METRICS'] = os.environ.get('ENABLE_METRICS', '1') == '1'
+
+# Training progress streams (/api/training_events): each open stream holds a request thread,
+# so at most SSE_MAX_STREAMS run at once (others get 503 and the dashboard polls instead)
+# and each ends after SSE_MAX_STREAM_SEC (the browser reconnects with Last-Event-ID)
+app.config['SSE_MAX_STREAMS'] = int(os.environ.get('SSE_MAX_STREAMS',
+                                                   max(1, int(os.environ.get('WEB_THREADS', 8)) // 2)))
+app.config['SSE_MAX_STREAM_SEC'] = float(os.environ.get('SSE_MAX_STREAM_SEC', 300))
+
+# Micro-batching of concurrent /api/predict requests
+app.config['ENABLE_MICRO_BATCHING'] = os.environ.get('ENABLE_MICRO_BATCHING', '1') == '1'
+app.config['BATCH_MAX_SIZE'] = int(os.environ.get('BATCH_MAX_SIZE', 8))
+app.config['BATCH_MAX_WAIT_MS'] = float(os.environ.get('BATCH_MAX_WAIT_MS', 5))
+
+# Production serving (see wsgi.py): inference worker processes that preload the models and run
+# the micro-batches (0 = run the models in the web process), and training in worker processes only
+app.config['INFERENCE_WORKERS'] = int(os.environ.get('INFERENCE_WORKERS', 0))
+app.config['TRAINING_SUBPROCESS'] = os.environ.get('TRAINING_SUBPROCESS', '0') == '1'
 
 # Create necessary directories
 for folder in [app.config['UPLOAD_FOLDER'], app.config['MODELS_FOLDER'], 
-               app.config['METRICS_FOLDER'], app.config['DATA_FOLDER']]:
+               app.config['METRICS_FOLDER'], app.config['DATA_FOLDER'],
+               app.config['RESULTS_FOLDER'], app.config['CACHE_FOLDER'],
+               app.config['INGEST_STAGING_FOLDER']]:
     os.makedirs(folder, exist_ok=True)
 
-# GPU Configuration
-gpus = tf.config.experimental.list_physical_devices('GPU')
-if gpus:
-    try:
-        for gpu in gpus:
-            tf.config.experimental.set_memory_growth(gpu, True)
-        print(f"✅ GPU configured: {len(gpus)} GPU(s) available")
-    except RuntimeError as e:
-        print(f"⚠️ GPU configuration error: {e}")
-else:
-    print("⚠️ No GPU detected, using CPU")
-
-# Initialize global components
-training_pipeline = TrainingPipeline(
-    data_dir=app.config['DATA_FOLDER'],
-    models_dir=app.config['MODELS_FOLDER'],
-    metrics_dir=app.config['METRICS_FOLDER']
-)
+# Warm-up: load TensorFlow, the models and the model-backed components in a background thread at
+# startup so /api/ready turns ready before the first prediction (0 = load on first use only)
+app.config['WARMUP_ON_START'] = os.environ.get('WARMUP_ON_START', '1') == '1'
+
+# ==================== Lazy Model Runtime ====================
+# TensorFlow is imported, configured and used by the components below only when a route (or the
+# warm-up) first touches one of them
+
+tensorflow_state = {'thread_config': None}
+tensorflow_lock = threading.Lock()
+
+def init_tensorflow():
+    """Import TensorFlow once, configure GPUs and size the thread pools before the first op runs"""
+    with tensorflow_lock:
+        if tensorflow_state['thread_config'] is not None:
+            return tensorflow_state['thread_config']
+        
+        import tensorflow as tf
+        from utils.inference_utils import configure_tf_threads
+        
+        # GPU Configuration
+        gpus = tf.config.experimental.list_physical_devices('GPU')
+        if gpus:
+            try:
+                for gpu in gpus:
+                    tf.config.experimental.set_memory_growth(gpu, True)
+                print(f"✅ GPU configured: {len(gpus)} GPU(s) available")
+            except RuntimeError as e:
+                print(f"⚠️ GPU configuration error: {e}")
+        else:
+            print("⚠️ No GPU detected, using CPU")
+        
+        thread_config = configure_tf_threads(
+            app.config['INFERENCE_EXECUTION_MODE'],
+            app.config['TF_INTRA_OP_THREADS'],
+            app.config['TF_INTER_OP_THREADS']
+        )
+        print(f"🧵 Inference mode: {app.config['INFERENCE_EXECUTION_MODE']} "
+              f"(intra-op: {thread_config['intra_op_threads']}, inter-op: {thread_config['inter_op_threads']})")
+        tensorflow_state['thread_config'] = thread_config
+        return thread_config
 
-# Initialize predictor (will handle missing class indices gracefully)
-try:
-    predictor = MultiModelPredictor(
+def create_training_pipeline():
+    init_tensorflow()
+    from utils.training_utils import TrainingPipeline
+    return TrainingPipeline(
+        data_dir=app.config['DATA_FOLDER'],
         models_dir=app.config['MODELS_FOLDER'],
         metrics_dir=app.config['METRICS_FOLDER']
     )
-    print("✅ Predictor initialized successfully")
-except Exception as e:
-    print(f"⚠️  Predictor initialization warning: {e}")
-    predictor = None
 
-analytics_utils = AnalyticsUtils(app.config['METRICS_FOLDER'])
+def create_training_engine():
+    init_tensorflow()
+    from utils.training_engine import TrainingEngine
+    return TrainingEngine(
+        data_dir=app.config['DATA_FOLDER'],
+        models_dir=app.config['MODELS_FOLDER'],
+        metrics_dir=app.config['METRICS_FOLDER'],
+        cache_dir=app.config['CACHE_FOLDER'],
+        event_bus=progress_bus
+    )
+
+def create_analytics_utils():
+    from utils.analytics_utils import AnalyticsUtils
+    return AnalyticsUtils(app.config['METRICS_FOLDER'])
+
+def create_model_registry():
+    init_tensorflow()
+    from utils.model_registry import ModelRegistry
+    return ModelRegistry(
+        models_dir=app.config['MODELS_FOLDER'],
+        memory_budget_mb=app.config['MODEL_MEMORY_BUDGET_MB'],
+        backend=app.config['INFERENCE_BACKEND'],
+        tflite_threads=app.config['TF_INTRA_OP_THREADS']
+    )
+
+def create_inference_engine():
+    init_tensorflow()
+    from utils.inference_utils import InferenceEngine
+    from utils.inference_service import ProcessInferenceEngine
+    engine_settings = dict(
+        models_dir=app.config['MODELS_FOLDER'],
+        metrics_dir=app.config['METRICS_FOLDER'],
+        registry=model_registry.resolve(),
+        execution_mode=app.config['INFERENCE_EXECUTION_MODE'],
+        ensemble_mode=app.config['ENSEMBLE_MODE'],
+        cascade_confidence=app.config['CASCADE_CONFIDENCE_THRESHOLD'],
+        cascade_agreement=app.config['CASCADE_AGREEMENT_THRESHOLD']
+    )
+    if app.config['INFERENCE_WORKERS'] > 0:
+        # Workers are spawned by start_inference_workers(), not at import: spawned children may re-import this module
+        return ProcessInferenceEngine(
+            workers=app.config['INFERENCE_WORKERS'],
+            intra_op_threads=app.config['TF_INTRA_OP_THREADS'],
+            inter_op_threads=app.config['TF_INTER_OP_THREADS'],
+            memory_budget_mb=app.config['MODEL_MEMORY_BUDGET_MB'],
+            **engine_settings
+        )
+    return InferenceEngine(**engine_settings)
+
+def create_prediction_scheduler():
+    from utils.batch_scheduler import MicroBatchScheduler
+    return MicroBatchScheduler(
+        inference_engine.resolve(),
+        max_batch_size=app.config['BATCH_MAX_SIZE'],
+        max_wait_ms=app.config['BATCH_MAX_WAIT_MS'],
+        # One batch in flight per inference worker
+        workers=max(1, app.config['INFERENCE_WORKERS'])
+    )
+
+def create_prediction_cache():
+    from utils.prediction_cache import PredictionCache
+    return PredictionCache(
+        max_entries=app.config['PREDICTION_CACHE_SIZE'],
+        ttl_sec=app.config['PREDICTION_CACHE_TTL_SEC'],
+        persist_path=(os.path.join(app.config['CACHE_FOLDER'], 'prediction_cache.sqlite')
+                      if app.config['PREDICTION_CACHE_PERSIST'] else None)
+    )
+
+# Training callbacks publish progress here; SSE clients and training_status read from it
+progress_bus = ProgressEventBus()
+sse_slots = threading.BoundedSemaphore(max(1, app.config['SSE_MAX_STREAMS']))
+
+# Initialize global components; each is built on first use
+training_pipeline = LazyComponent(create_training_pipeline, 'training pipeline')
+training_engine = LazyComponent(create_training_engine, 'training engine')
+analytics_utils = LazyComponent(create_analytics_utils, 'analytics')
+
+def build_training_report():
+    return analytics_utils.generate_training_report(app.config['METRICS_FOLDER'])
+
+# Analytics derived from the metrics files are rebuilt only when a file changes; plots render in the background
+analytics_cache = AnalyticsCache()
+plot_renderer = PlotRenderer(app.config['METRICS_FOLDER'], cache=analytics_cache, report_builder=build_training_report)
+
+# Load-once model cache and in-memory inference engine shared by the prediction routes
+model_registry = LazyComponent(create_model_registry, 'model registry')
+inference_engine = LazyComponent(create_inference_engine, 'inference engine')
+prediction_scheduler = LazyComponent(create_prediction_scheduler, 'prediction scheduler')
+prediction_cache = (LazyComponent(create_prediction_cache, 'prediction cache')
+                    if app.config['PREDICTION_CACHE_SIZE'] > 0 else None)
+
+# Multi-model predictor (explanations and confidence analysis); created by the first route that needs it
+predictor = None
+
+# Append-only per-epoch training history, written by the training callbacks (in worker processes too)
+metrics_store = MetricsStore(app.config['METRICS_FOLDER'])
+# Id of the last metrics store row applied to training_status
+status_cursor = {'last_id': 0}
+
+# Persistent index of training images; a full rescan at startup picks up offline changes
+dataset_index = DatasetIndex(app.config['DATA_FOLDER'])
+
+background_services = {'started': False}
+
+def start_background_services():
+    """
+    Start the web process's background threads (the startup dataset rescan).
+    Called by the web entry points, never at import: spawned worker processes
+    re-import the main module, which is this file under `python app.py`.
+    """
+    if background_services['started']:
+        return
+    background_services['started'] = True
+    threading.Thread(target=dataset_index.rescan, name='dataset-rescan', daemon=True).start()
+
+def start_inference_workers():
+    """Spawn the inference workers and wait until their models are loaded (no-op for in-process inference)"""
+    if app.config['INFERENCE_WORKERS'] > 0:
+        inference_engine.start()
+
+warmup_state = {'status': 'idle', 'started_at': None, 'elapsed': None, 'models': {}, 'error': None}
+
+def warm_up():
+    """Import TensorFlow, build the serving components and load the models; sets warmup_state"""
+    warmup_state.update({'status': 'warming', 'started_at': datetime.now().isoformat(), 'error': None})
+    start = time.perf_counter()
+    try:
+        start_inference_workers()
+        warmup_state['models'] = inference_engine.load_all_models()
+        prediction_scheduler.resolve()
+        if prediction_cache is not None:
+            prediction_cache.resolve()
+        warmup_state['status'] = 'ready'
+    except Exception as e:
+        print(f"❌ Warm-up error: {e}")
+        warmup_state.update({'status': 'error', 'error': str(e)})
+    finally:
+        warmup_state['elapsed'] = round(time.perf_counter() - start, 2)
+    if warmup_state['status'] == 'ready':
+        print(f"✅ Warm-up finished in {warmup_state['elapsed']}s")
+
+def start_warmup():
+    """Run warm_up() in a background thread"""
+    threading.Thread(target=warm_up, name='warm-up', daemon=True).start()
 
 # Global training status
 training_status = {
@@ -76,6 +388,121 @@ training_status = {
     'selected_models': []
 }
 
+def apply_progress_event(event):
+    """Mirror progress bus events into training_status"""
+    if event['type'] == 'training_status':
+        training_status.update({k: v for k, v in event.items() if k not in ('type', 'id', 'timestamp')})
+        return
+    
+    model_progress = training_status['progress'].setdefault(event['model'], {})
+    if event['type'] == 'epoch':
+        model_progress.update({
+            'status': 'training',
+            'epochs': event['epoch'],
+            'accuracy': (event['val_accuracy'] or event['accuracy']) * 100,
+            'streamed': True
+        })
+        if 'pid' in event:
+            model_progress['worker_pid'] = event['pid']
+        training_status['current_model'] = event['model']
+    elif event['type'] == 'model_status':
+        model_progress.update({k: v for k, v in event.items() if k not in ('type', 'model', 'id', 'timestamp')})
+
+progress_bus.add_listener(apply_progress_event)
+
+def record_epoch_duration(event):
+    """Feed epoch durations reported by training callbacks and worker processes into /metrics"""
+    if event['type'] == 'epoch' and event.get('epoch_seconds') is not None:
+        TRAINING_EPOCH_SECONDS.observe(event['epoch_seconds'], model=event['model'])
+
+progress_bus.add_listener(record_epoch_duration)
+
+def refresh_plots(event):
+    """Re-render the plots drawn from a model's metrics once it finishes training"""
+    if event['type'] == 'model_status' and event.get('status') == 'completed':
+        plot_renderer.refresh()
+
+progress_bus.add_listener(refresh_plots)
+
+def model_cache_families(registries):
+    """Model cache metric families from (labels, summary, memory bytes, per-model status) of each registry"""
+    counters = [
+        ('model_cache_hits_total', 'Model cache lookups served from memory', 'hits'),
+        ('model_cache_misses_total', 'Model cache lookups that loaded a model', 'misses'),
+        ('model_cache_loads_total', 'Models loaded from disk', 'loads'),
+        ('model_cache_reloads_total', 'Models reloaded because their file changed', 'reloads'),
+        ('model_cache_evictions_total', 'Models evicted to respect the memory budget', 'evictions')
+    ]
+    families = [(name, 'counter', documentation, [(labels, summary[key]) for labels, summary, _, _ in registries])
+                for name, documentation, key in counters]
+    families += [
+        ('model_cache_memory_bytes', 'gauge', 'Estimated memory held by resident models',
+         [(labels, memory_bytes) for labels, _, memory_bytes, _ in registries]),
+        ('model_memory_bytes', 'gauge', 'Estimated memory of each resident model',
+         [({**labels, 'model': model_type}, round(info['memory_mb'] * 1024 * 1024))
+          for labels, _, _, cache_status in registries
+          for model_type, info in cache_status.items() if 'memory_mb' in info]),
+        ('model_cache_resident_models', 'gauge', 'Models currently held in memory',
+         [(labels, len(summary['resident_models'])) for labels, summary, _, _ in registries])
+    ]
+    return families
+
+def collect_serving_metrics():
+    """Model cache, queue and training state read at scrape time; components not loaded yet are skipped"""
+    families = [
+        ('training_active', 'gauge', 'Whether a training run is in progress',
+         [({}, int(bool(training_status['is_training'])))]),
+        ('warmup_ready', 'gauge', 'Whether the models are loaded and the app is ready to predict',
+         [({}, int(warmup_state['status'] == 'ready'))])
+    ]
+    if app.config['INFERENCE_WORKERS'] > 0:
+        # The models live in the inference workers; the web process's registry never loads one
+        if inference_engine.loaded:
+            families += model_cache_families([({'worker': str(worker_id)}, stats['summary'], stats['memory_bytes'],
+                                               stats['status'])
+                                              for worker_id, stats in inference_engine.registry_stats().items()])
+    elif model_registry.loaded:
+        families += model_cache_families([({}, model_registry.summary(), model_registry.memory_usage(),
+                                           model_registry.status())])
+    if prediction_scheduler.loaded:
+        families.append(('prediction_queue_depth', 'gauge', 'Prediction requests waiting for the next micro-batch',
+                         [({}, prediction_scheduler.queue_depth())]))
+    if app.config['INFERENCE_WORKERS'] > 0 and inference_engine.loaded:
+        workers = inference_engine.worker_status()
+        families.append(('inference_workers_alive', 'gauge', 'Inference worker processes that are running',
+                         [({}, sum(1 for info in workers.values() if info['alive']))]))
+    if prediction_cache is not None and prediction_cache.loaded:
+        cache_summary = prediction_cache.summary()
+        families += [
+            ('prediction_cache_hits_total', 'counter', 'Predictions served from the result cache',
+             [({}, cache_summary['hits'])]),
+            ('prediction_cache_misses_total', 'counter', 'Result cache lookups that ran the models',
+             [({}, cache_summary['misses'])]),
+            ('prediction_cache_stale_total', 'counter', 'Cached results dropped because a model was retrained',
+             [({}, cache_summary['stale'])]),
+            ('prediction_cache_entries', 'gauge', 'Entries held in the result cache',
+             [({}, cache_summary['entries'])])
+        ]
+    return families
+
+metrics_registry.add_collector(collect_serving_metrics)
+
+# Handle on the running training job so it can be cancelled and overlapping runs rejected
+training_control = {
+    'thread': None,
+    'stop_event': threading.Event(),
+    'scheduler': None
+}
+
+# Batch prediction and ingestion jobs keyed by job id
+batch_jobs = {}
+ingest_jobs = {}
+
+# Only one benchmark at a time; concurrent runs would skew each other's timings
+benchmark_job = {'status': 'idle'}
+cascade_job = {'status': 'idle'}
+evaluation_job = {'status': 'idle'}
+
 @app.route('/')
 def index():
     """Main interface for dataset setup and training"""
@@ -89,8 +516,7 @@ def dashboard():
 @app.route('/analytics')
 def analytics():
     """Training metrics and analytics visualization"""
-    available_models = get_trained_models()
-    return render_template('analytics.html', models=available_models)
+    return render_template('analytics.html')
 
 # ==================== Dataset Management Routes ====================
 
@@ -122,9 +548,23 @@ def create_folders():
     except Exception as e:
         return jsonify({'error': f'Error creating folders: {str(e)}'}), 500
 
+def create_ingestion_pipeline(options=None):
+    """Ingestion pipeline configured from app.config, overridable per request"""
+    from utils.ingestion import IngestionPipeline
+    options = options or {}
+    return IngestionPipeline(
+        data_dir=app.config['DATA_FOLDER'],
+        dataset_index=dataset_index,
+        workers=app.config['INGEST_WORKERS'] or None,
+        dedup=options.get('dedup', app.config['INGEST_DEDUP']),
+        phash_threshold=int(options.get('phash_threshold', app.config['INGEST_PHASH_THRESHOLD'])),
+        pre_resize=str(options.get('pre_resize', '1' if app.config['INGEST_PRE_RESIZE'] else '0')) == '1'
+    )
+
 @app.route('/api/upload_images', methods=['POST'])
 def upload_images():
-    """Upload training images to class folders"""
+    """Upload training images to class folders (validated, de-duplicated and pre-resized)"""
+    from utils.ingestion import iter_upload_items
     try:
         images = request.files.getlist('images')
         folder_names = request.form.getlist('folder_names')
@@ -132,28 +572,20 @@ def upload_images():
         if not images or not folder_names:
             return jsonify({'error': 'No images or folder names provided'}), 400
         
-        uploaded_count = 0
-        errors = []
+        uploads = [(image, folder_name, image.filename)
+                   for image, folder_name in zip(images, folder_names) if image and image.filename]
+        results = []
+        summary = create_ingestion_pipeline(request.form).run(iter_upload_items(uploads), results.append)
         
-        for image, folder_name in zip(images, folder_names):
-            if image and image.filename:
-                try:
-                    filename = secure_filename(image.filename)
-                    folder_path = os.path.join(app.config['DATA_FOLDER'], folder_name)
-                    
-                    if not os.path.exists(folder_path):
-                        os.makedirs(folder_path, exist_ok=True)
-                    
-                    file_path = os.path.join(folder_path, filename)
-                    image.save(file_path)
-                    uploaded_count += 1
-                    
-                except Exception as e:
-                    errors.append(f'Error uploading {image.filename}: {str(e)}')
+        errors = [f"{r['source']}: {r.get('error') or r['status'].replace('_', ' ')}"
+                  + (f" of {r['duplicate_of']}" if r.get('duplicate_of') else '')
+                  for r in results if r['status'] != 'accepted']
         
         response_data = {
-            'message': f'Successfully uploaded {uploaded_count} images',
-            'uploaded_count': uploaded_count
+            'message': f"Successfully uploaded {summary['accepted']} images",
+            'uploaded_count': summary['accepted'],
+            'summary': summary,
+            'results': results
         }
         
         if errors:
@@ -161,80 +593,348 @@ def upload_images():
         
         return jsonify(response_data)
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Error uploading images: {str(e)}'}), 500
 
+@app.route('/api/ingest', methods=['POST'])
+def ingest_images():
+    """
+    Start a bulk ingestion job for a zip/tar archive of class folders
+    ('archive') or many images with 'folder_names' (or one 'folder_name').
+    Optional form fields: dedup, phash_threshold, pre_resize.
+    """
+    from utils.ingestion import DEDUP_MODES
+    try:
+        if request.form.get('dedup', app.config['INGEST_DEDUP']) not in DEDUP_MODES:
+            return jsonify({'error': f"dedup must be one of {', '.join(DEDUP_MODES)}"}), 400
+        
+        job_id = uuid.uuid4().hex[:12]
+        archive = request.files.get('archive')
+        images = request.files.getlist('images')
+        
+        if archive and archive.filename:
+            archive.stream.close()
+            source = {'archive': archive.stream.name}
+        elif images:
+            folder_names = request.form.getlist('folder_names')
+            if not folder_names and request.form.get('folder_name'):
+                folder_names = [request.form['folder_name']] * len(images)
+            if len(folder_names) != len(images):
+                return jsonify({'error': 'Provide one folder name per image or a single folder_name'}), 400
+            for image in images:
+                image.stream.close()
+            source = {'uploads': [(image.stream.name, folder_name, image.filename)
+                                  for image, folder_name in zip(images, folder_names)]}
+        else:
+            return jsonify({'error': 'Provide an archive file or images'}), 400
+        
+        output_path = os.path.join(app.config['RESULTS_FOLDER'], f"ingest_{job_id}.jsonl")
+        ingest_jobs[job_id] = {
+            'job_id': job_id,
+            'status': 'running',
+            'processed': 0,
+            'accepted': 0,
+            'start_time': datetime.now().isoformat()
+        }
+        
+        job_thread = threading.Thread(
+            target=background_ingestion,
+            args=(job_id, source, output_path, dict(request.form), request.hand_over_staged())
+        )
+        job_thread.daemon = True
+        job_thread.start()
+        
+        return jsonify({
+            'message': 'Ingestion started',
+            'job_id': job_id,
+            'status_url': f"/api/ingest/{job_id}",
+            'results_url': f"/api/ingest/{job_id}/results"
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': f'Error starting ingestion: {str(e)}'}), 500
+
+def background_ingestion(job_id, source, output_path, options, staged):
+    """Background ingestion function writing one JSON result per input file"""
+    from utils.batch_prediction import JsonlResultWriter
+    from utils.ingestion import iter_archive_items, iter_upload_items
+    job = ingest_jobs[job_id]
+    writer = JsonlResultWriter(output_path)
+    
+    def record(result):
+        writer.write(result)
+        job['processed'] += 1
+        if result['status'] == 'accepted':
+            job['accepted'] += 1
+    
+    try:
+        if 'archive' in source:
+            items = iter_archive_items(source['archive'])
+        else:
+            items = iter_upload_items(source['uploads'])
+        summary = create_ingestion_pipeline(options).run(items, record)
+        job.update(summary)
+        job['status'] = 'completed'
+        
+    except Exception as e:
+        print(f"❌ Ingestion error: {str(e)}")
+        job.update({'status': 'error', 'error': str(e)})
+        
+    finally:
+        writer.close()
+        job['end_time'] = datetime.now().isoformat()
+        for path in staged:
+            if os.path.exists(path):
+                os.remove(path)
+
+@app.route('/api/ingest/<job_id>')
+def get_ingest_status(job_id):
+    """Get status of an ingestion job"""
+    job = ingest_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': f'Ingestion job {job_id} not found'}), 404
+    
+    return jsonify(job)
+
+@app.route('/api/ingest/<job_id>/results')
+def download_ingest_results(job_id):
+    """Download per-file results of an ingestion job"""
+    try:
+        if job_id not in ingest_jobs:
+            return jsonify({'error': f'Ingestion job {job_id} not found'}), 404
+        
+        output_path = os.path.join(app.config['RESULTS_FOLDER'], f"ingest_{job_id}.jsonl")
+        if not os.path.exists(output_path):
+            return jsonify({'error': 'Results not available yet'}), 404
+        
+        return send_file(
+            os.path.abspath(output_path),
+            as_attachment=True,
+            download_name=f"ingest_{job_id}.jsonl",
+            mimetype='application/x-ndjson'
+        )
+        
+    except Exception as e:
+        return jsonify({'error': f'Error downloading results: {str(e)}'}), 500
+
 @app.route('/api/dataset_info')
 def dataset_info():
-    """Get information about the current dataset"""
+    """Get information about the current dataset from the dataset index"""
     try:
-        dataset_info = {}
-        total_images = 0
-        
-        if os.path.exists(app.config['DATA_FOLDER']):
-            for item in os.listdir(app.config['DATA_FOLDER']):
-                item_path = os.path.join(app.config['DATA_FOLDER'], item)
-                # Only process directories, ignore files like info.txt
-                if os.path.isdir(item_path):
-                    image_count = len([f for f in os.listdir(item_path) 
-                                     if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))])
-                    if image_count > 0:  # Only count classes with images
-                        dataset_info[item] = image_count
-                        total_images += image_count
+        # ?rescan=1 also re-checks files edited in place; the default only looks at changed folders
+        if request.args.get('rescan'):
+            dataset_index.rescan()
+        else:
+            dataset_index.refresh()
+        
+        dataset_info = dataset_index.class_counts()
+        totals = dataset_index.totals()
         
         return jsonify({
             'classes': dataset_info,
-            'total_images': total_images,
-            'num_classes': len(dataset_info)
+            'total_images': totals['valid'],
+            'num_classes': len(dataset_info),
+            'invalid_images': totals['invalid'],
+            'invalid_files': dataset_index.invalid_files() if totals['invalid'] else [],
+            'total_bytes': totals['bytes']
         })
         
     except Exception as e:
         return jsonify({'error': f'Error getting dataset info: {str(e)}'}), 500
 
+shard_build = {'is_building': False, 'last_build': None, 'error': None}
+shard_build_lock = threading.Lock()
+
+def build_dataset_shards():
+    """Refresh the dataset index and incrementally rebuild the pre-resized shards"""
+    from utils.dataset_shards import build_shards
+    with shard_build_lock:
+        shard_build.update({'is_building': True, 'error': None})
+        try:
+            dataset_index.refresh()
+            summary = build_shards(dataset_index, app.config['SHARDS_FOLDER'], shard_size=app.config['SHARD_SIZE'])
+            shard_build['last_build'] = dict(summary, finished=datetime.now().isoformat())
+            return summary
+        except Exception as e:
+            shard_build['error'] = str(e)
+            raise
+        finally:
+            shard_build['is_building'] = False
+
+@app.route('/api/dataset/shards', methods=['GET', 'POST'])
+def dataset_shards():
+    """GET: shard manifest summary; POST: rebuild the shards incrementally in the background"""
+    from utils.dataset_shards import load_manifest
+    try:
+        if request.method == 'POST':
+            if shard_build['is_building']:
+                return jsonify({'error': 'Shards are already being built'}), 400
+            # Training memory-maps shard files lazily; a rebuild could compact or delete one mid-epoch
+            if training_status['is_training']:
+                return jsonify({'error': 'Cannot rebuild shards while training is in progress'}), 409
+            
+            def run_build():
+                try:
+                    build_dataset_shards()
+                except Exception as e:
+                    print(f"❌ Shard build error: {str(e)}")
+            
+            threading.Thread(target=run_build, daemon=True).start()
+            return jsonify({'message': 'Shard build started'}), 202
+        
+        manifest = load_manifest(app.config['SHARDS_FOLDER'])
+        return jsonify({
+            **shard_build,
+            'shard_dir': app.config['SHARDS_FOLDER'],
+            'images': manifest.get('num_images', 0) if manifest else 0,
+            'shards': len(manifest['shards']) if manifest else 0,
+            'img_size': manifest['img_size'] if manifest else None,
+            'updated': manifest.get('updated') if manifest else None
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Error with dataset shards: {str(e)}'}), 500
+
+# ==================== Operational Metrics ====================
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+@app.before_request
+def parse_uploads():
+    """Parse multipart bodies before the view, so an oversized upload reaches the 413 handler, not a route's 500"""
+    if request.mimetype == 'multipart/form-data':
+        request.form
+
+@app.teardown_request
+def remove_staged_uploads(exc):
+    """Delete staged ingest parts no job took over: failed requests, 413s and aborted uploads"""
+    for staged_file in getattr(request, 'staged_files', []):
+        staged_file.close()
+        if os.path.exists(staged_file.name):
+            os.remove(staged_file.name)
+
+@app.after_request
+def record_request_latency(response):
+    if app.config['ENABLE_METRICS'] and 'request_start' in g:
+        # Route templates rather than raw paths keep label cardinality bounded
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, route=route,
+                                     method=request.method, status=response.status_code)
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of serving and training metrics"""
+    if not app.config['ENABLE_METRICS']:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics_registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/api/health')
+def health():
+    """Liveness: the web process answers without loading TensorFlow or any model"""
+    return jsonify({'status': 'ok'})
+
+@app.route('/api/ready')
+def ready():
+    """Readiness: 200 once the warm-up has loaded the models, 503 until then"""
+    components = {
+        'tensorflow': {'loaded': tensorflow_state['thread_config'] is not None}
+    }
+    for component in (model_registry, inference_engine, prediction_scheduler, prediction_cache,
+                      training_engine, analytics_utils):
+        if component is not None:
+            components[component.name] = {'loaded': component.loaded, 'load_seconds': component.load_seconds}
+    
+    is_ready = warmup_state['status'] == 'ready'
+    return jsonify({
+        'ready': is_ready,
+        'warmup': warmup_state,
+        'components': components
+    }), 200 if is_ready else 503
+
 # ==================== Training Routes ====================
 
 @app.route('/api/start_training', methods=['POST'])
 def start_training():
     """Start training process for selected models"""
+    from utils.model_factory import ModelFactory
+    from utils.model_registry import SERVABLE_MODELS
     global training_status
     
-    if training_status['is_training']:
+    training_thread = training_control['thread']
+    if training_status['is_training'] or (training_thread is not None and training_thread.is_alive()):
         return jsonify({'error': 'Training is already in progress'}), 400
     
     try:
         data = request.get_json()
         selected_models = data.get('models', list(ModelFactory.SUPPORTED_MODELS.keys()))
+        input_pipeline = data.get('input_pipeline', app.config['TRAINING_INPUT_PIPELINE'])
+        head_only = bool(data.get('head_only', app.config['TRAINING_HEAD_ONLY']))
+        parallel_workers = int(data.get('parallel_workers', app.config['TRAINING_PARALLEL_WORKERS']))
+        resume = bool(data.get('resume', False))
+        if head_only or resume:
+            # Feature caching and epoch checkpoints are provided by the tf.data engine
+            input_pipeline = 'tf_data'
         
-        # Validate selected models
-        valid_models = [m for m in selected_models if m in ModelFactory.SUPPORTED_MODELS]
+        # Validate selected models; the student is distilled after the selected ensemble models
+        valid_models = [m for m in selected_models if m in SERVABLE_MODELS]
         if not valid_models:
             return jsonify({'error': 'No valid models selected'}), 400
         
+        if input_pipeline not in ('generator', 'tf_data', 'shards'):
+            return jsonify({'error': 'input_pipeline must be generator, tf_data or shards'}), 400
+        
         # Check if dataset exists
-        if not os.path.exists(app.config['DATA_FOLDER']) or not os.listdir(app.config['DATA_FOLDER']):
+        dataset_index.refresh()
+        if dataset_index.totals()['valid'] == 0:
             return jsonify({'error': 'No training data found. Please upload images first.'}), 400
         
-        # Initialize training status
+        # Initialize training status; rows of earlier runs are never read back
+        status_cursor['last_id'] = metrics_store.last_id()
         training_status.update({
             'is_training': True,
             'current_model': None,
             'progress': {model: {'status': 'pending', 'epochs': 0, 'accuracy': 0} 
                         for model in valid_models},
             'start_time': datetime.now().isoformat(),
-            'selected_models': valid_models
+            'selected_models': valid_models,
+            'input_pipeline': input_pipeline,
+            'head_only': head_only,
+            'parallel_workers': parallel_workers,
+            'resume': resume,
+            'stopping': False,
+            'cancelled': False,
+            'error': None
+        })
+        
+        progress_bus.publish({
+            'type': 'training_status',
+            'is_training': True,
+            'selected_models': valid_models,
+            'start_time': training_status['start_time']
         })
         
         # Start training in background thread
+        training_control['stop_event'].clear()
         training_thread = threading.Thread(
             target=background_training,
-            args=(valid_models,)
+            args=(valid_models, input_pipeline, head_only, parallel_workers, resume)
         )
         training_thread.daemon = True
+        training_control['thread'] = training_thread
         training_thread.start()
         
         return jsonify({
             'message': 'Training started successfully',
             'models': valid_models,
+            'input_pipeline': input_pipeline,
+            'head_only': head_only,
+            'parallel_workers': parallel_workers,
+            'resume': resume,
             'estimated_time': len(valid_models) * 10  # Rough estimate: 10 min per model
         })
         
@@ -242,89 +942,295 @@ def start_training():
         training_status['is_training'] = False
         return jsonify({'error': f'Error starting training: {str(e)}'}), 500
 
-def background_training(selected_models):
+def background_training(selected_models, input_pipeline='generator', head_only=False, parallel_workers=1,
+                        resume=False):
     """Background training function"""
+    from utils.model_registry import STUDENT_MODEL
+    from utils.tflite_export import export_model
+    from utils.training_engine import TrainingEngine
     global training_status
+    stop_event = training_control['stop_event']
     
     try:
-        print(f"🚀 Starting background training for models: {selected_models}")
+        print(f"🚀 Starting background training for models: {selected_models} ({input_pipeline} pipeline)")
+        
+        engine = training_engine
+        if input_pipeline == 'shards':
+            # Only new or changed images are decoded into the shards
+            build_dataset_shards()
+            engine = TrainingEngine(
+                data_dir=app.config['DATA_FOLDER'],
+                models_dir=app.config['MODELS_FOLDER'],
+                metrics_dir=app.config['METRICS_FOLDER'],
+                cache_dir=app.config['CACHE_FOLDER'],
+                event_bus=progress_bus,
+                **dict(training_engine.settings(), shard_dir=app.config['SHARDS_FOLDER'])
+            )
         
         # Train all selected models
-        results = training_pipeline.train_all_models(selected_models)
+        teacher_models = [m for m in selected_models if m != STUDENT_MODEL]
+        isolated = app.config['TRAINING_SUBPROCESS']
+        results = {}
+        if teacher_models and (isolated or (parallel_workers > 1 and len(teacher_models) > 1)):
+            results = parallel_training(teacher_models, input_pipeline, head_only, max(1, parallel_workers),
+                                        resume, engine)
+        elif teacher_models and input_pipeline in ('tf_data', 'shards'):
+            results = engine.train_all_models(teacher_models, head_only=head_only,
+                                              stop_event=stop_event, resume=resume)
+        elif teacher_models:
+            results = legacy_training(teacher_models, stop_event)
+        
+        # Distil the (freshly) trained ensemble into the student last
+        if STUDENT_MODEL in selected_models and isolated:
+            results.update(parallel_training([STUDENT_MODEL], input_pipeline, False, 1, resume, engine))
+        elif STUDENT_MODEL in selected_models:
+            results[STUDENT_MODEL] = distill_student(stop_event, resume, engine)
         
-        # Update training status with results
+        # Publish final per-model results
         for model_type, result in results.items():
-            if model_type in training_status['progress']:
-                if result['status'] == 'success':
-                    training_status['progress'][model_type].update({
-                        'status': 'completed',
-                        'accuracy': result.get('final_accuracy', 0) * 100
-                    })
-                else:
-                    training_status['progress'][model_type].update({
-                        'status': 'error',
-                        'error': result.get('error', 'Unknown error')
-                    })
+            if model_type not in training_status['progress']:
+                continue
+            if result['status'] == 'success':
+                event = {'status': 'completed', 'accuracy': result.get('final_accuracy', 0) * 100}
+            elif result['status'] == 'cancelled':
+                event = {'status': 'cancelled', 'resumable': result.get('resumable', False)}
+            else:
+                event = {'status': 'error', 'error': result.get('error', 'Unknown error')}
+            progress_bus.publish({'type': 'model_status', 'model': model_type, **event})
         
-        training_status['is_training'] = False
-        training_status['current_model'] = None
-        print("✅ Background training completed")
+        # Export quantized TFLite variants of the freshly trained models
+        if app.config['EXPORT_TFLITE'] and not stop_event.is_set():
+            for model_type, result in results.items():
+                # Worker processes export their own model
+                if result['status'] != 'success' or 'tflite_exported' in result:
+                    continue
+                try:
+                    training_status['current_model'] = model_type
+                    export_model(
+                        model_type,
+                        models_dir=app.config['MODELS_FOLDER'],
+                        data_dir=app.config['DATA_FOLDER'],
+                        metrics_dir=app.config['METRICS_FOLDER'],
+                        calibration_samples=app.config['TFLITE_CALIBRATION_SAMPLES']
+                    )
+                except Exception as e:
+                    print(f"⚠️ TFLite export failed for {model_type}: {e}")
+        
+        progress_bus.publish({
+            'type': 'training_status',
+            'is_training': False,
+            'current_model': None,
+            'stopping': False,
+            'cancelled': stop_event.is_set()
+        })
+        print("⏹️ Background training cancelled" if stop_event.is_set() else "✅ Background training completed")
         
     except Exception as e:
         print(f"❌ Background training error: {str(e)}")
-        training_status.update({
+        progress_bus.publish({
+            'type': 'training_status',
             'is_training': False,
             'current_model': None,
+            'stopping': False,
             'error': str(e)
         })
+    finally:
+        training_control['scheduler'] = None
+
+def distill_student(stop_event, resume=False, engine=None):
+    """Train the student on the cached outputs of every trained ensemble model"""
+    from utils.model_registry import STUDENT_MODEL
+    if stop_event.is_set():
+        return {'status': 'cancelled', 'epochs_completed': 0}
+    
+    progress_bus.publish({'type': 'model_status', 'model': STUDENT_MODEL, 'status': 'training'})
+    try:
+        return (engine or training_engine).train_student(
+            temperature=app.config['DISTILL_TEMPERATURE'],
+            alpha=app.config['DISTILL_ALPHA'],
+            stop_event=stop_event,
+            resume=resume
+        )
+    except Exception as e:
+        print(f"❌ Error distilling student: {e}")
+        return {'status': 'error', 'error': str(e)}
+
+def legacy_training(selected_models, stop_event):
+    """Train with the generator pipeline one model at a time so a stop request skips the remaining models"""
+    results = {}
+    # The generator pipeline only reports through progress files; turn them into bus events
+    watcher = ProgressFileWatcher(progress_bus, app.config['METRICS_FOLDER'], selected_models).start()
+    try:
+        for model_type in selected_models:
+            if stop_event.is_set():
+                results[model_type] = {'status': 'cancelled', 'epochs_completed': 0}
+                continue
+            progress_bus.publish({'type': 'model_status', 'model': model_type, 'status': 'training'})
+            results.update(training_pipeline.train_all_models([model_type]))
+    finally:
+        watcher.stop()
+    return results
+
+def parallel_training(selected_models, input_pipeline, head_only, parallel_workers, resume=False, engine=None):
+    """Train models concurrently in worker processes and mirror their progress into training_status"""
+    from utils.training_scheduler import TrainingScheduler
+    if input_pipeline == 'tf_data' and not head_only and min(parallel_workers, len(selected_models)) > 1:
+        # Fill the shared decode cache once instead of racing to build it in every worker
+        training_engine.warm_cache()
+    
+    scheduler = TrainingScheduler(
+        data_dir=app.config['DATA_FOLDER'],
+        models_dir=app.config['MODELS_FOLDER'],
+        metrics_dir=app.config['METRICS_FOLDER'],
+        cache_dir=app.config['CACHE_FOLDER'],
+        max_workers=parallel_workers,
+        threads_per_worker=app.config['TRAINING_THREADS_PER_WORKER'],
+        memory_limit_mb=app.config['TRAINING_MEMORY_LIMIT_MB'],
+        input_pipeline=input_pipeline,
+        head_only=head_only,
+        resume=resume,
+        engine_kwargs=(engine or training_engine).settings(),
+        distill_kwargs={'temperature': app.config['DISTILL_TEMPERATURE'], 'alpha': app.config['DISTILL_ALPHA']},
+        export_kwargs=({'calibration_samples': app.config['TFLITE_CALIBRATION_SAMPLES']}
+                       if app.config['EXPORT_TFLITE'] else None)
+    )
+    training_control['scheduler'] = scheduler
+    if training_control['stop_event'].is_set():
+        scheduler.cancel()
+    
+    def on_event(event):
+        training_status['active_models'] = list(scheduler.workers)
+        if event['type'] == 'started':
+            progress_bus.publish({'type': 'model_status', 'model': event['model'], 'status': 'training',
+                                  'worker_pid': event['pid']})
+        elif event['type'] == 'progress':
+            progress_bus.publish(dict(event, type='epoch'))
+    
+    watcher = None
+    if input_pipeline == 'generator':
+        watcher = ProgressFileWatcher(progress_bus, app.config['METRICS_FOLDER'], selected_models).start()
+    try:
+        return scheduler.run(selected_models, on_event=on_event)
+    finally:
+        if watcher is not None:
+            watcher.stop()
 
 @app.route('/api/training_status')
 def get_training_status():
     """Get current training status"""
     global training_status
     
-    # Update progress from saved files if training is active
+    # Fallback for models that have not streamed any epoch events yet: only rows appended since the last poll
     if training_status['is_training']:
-        for model_type in training_status['selected_models']:
-            progress_file = os.path.join(app.config['METRICS_FOLDER'], f"{model_type}_progress.json")
-            if os.path.exists(progress_file):
-                try:
-                    with open(progress_file, 'r') as f:
-                        progress_data = json.load(f)
-                    
-                    if progress_data['epochs']:
-                        current_epoch = len(progress_data['epochs'])
-                        latest_accuracy = progress_data['val_accuracy'][-1] if progress_data['val_accuracy'] else 0
-                        
-                        training_status['progress'][model_type].update({
-                            'status': 'training',
-                            'epochs': current_epoch,
-                            'accuracy': latest_accuracy * 100
-                        })
-                        training_status['current_model'] = model_type
-                        
-                except Exception as e:
-                    print(f"Error reading progress for {model_type}: {e}")
+        try:
+            for row in metrics_store.tail(status_cursor['last_id'], model_types=training_status['selected_models']):
+                status_cursor['last_id'] = max(status_cursor['last_id'], row['id'])
+                model_progress = training_status['progress'].get(row['model_type'])
+                if model_progress is None or model_progress.get('streamed'):
+                    continue
+                
+                model_progress.update({
+                    'status': 'training',
+                    'epochs': row['epoch'],
+                    'accuracy': (row['val_accuracy'] or row['accuracy']) * 100
+                })
+                training_status['current_model'] = row['model_type']
+                
+        except Exception as e:
+            print(f"Error reading training progress: {e}")
     
     return jsonify(training_status)
 
 @app.route('/api/stop_training', methods=['POST'])
 def stop_training():
-    """Stop training process (best effort)"""
+    """
+    Cancel the running training job. tf.data training stops after the current
+    batch (completed epochs stay checkpointed for resume); generator training
+    stops after the current model, or is terminated in parallel mode.
+    """
     global training_status
     
-    training_status.update({
-        'is_training': False,
-        'current_model': None
+    training_thread = training_control['thread']
+    if training_thread is None or not training_thread.is_alive():
+        training_status.update({'is_training': False, 'current_model': None})
+        return jsonify({'message': 'No training in progress'})
+    
+    training_control['stop_event'].set()
+    scheduler = training_control['scheduler']
+    if scheduler is not None:
+        scheduler.cancel()
+    progress_bus.publish({'type': 'training_status', 'stopping': True})
+    
+    # Optionally wait for the job to wind down, e.g. {"wait": 30}
+    data = request.get_json(silent=True) or {}
+    wait = float(data.get('wait', 0))
+    if wait > 0:
+        training_thread.join(timeout=wait)
+    
+    return jsonify({
+        'message': 'Training stop signal sent',
+        'stopped': not training_thread.is_alive()
     })
+
+@app.route('/api/training_events')
+def training_events():
+    """
+    Stream training progress as Server-Sent Events: a 'snapshot' of
+    training_status first, then incremental epoch/model_status/training_status
+    events. Reconnecting clients send Last-Event-ID and only get what they missed.
+    Streams are capped in number and duration so they cannot use up the request threads.
+    """
+    if not sse_slots.acquire(blocking=False):
+        return jsonify({'error': 'Too many open progress streams; poll /api/training_status instead'}), 503, \
+            {'Retry-After': str(int(app.config['SSE_MAX_STREAM_SEC']))}
+    
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id', '')
+    deadline = time.monotonic() + app.config['SSE_MAX_STREAM_SEC']
+    
+    def snapshot():
+        state, last_id = progress_bus.snapshot(lambda: json.loads(json.dumps(training_status)))
+        return format_sse(state, 'snapshot', last_id), last_id
     
-    return jsonify({'message': 'Training stop signal sent'})
+    def stream():
+        if last_event_id.isdigit() and int(last_event_id) <= progress_bus.last_id:
+            last_id = int(last_event_id)
+        else:
+            message, last_id = snapshot()
+            yield message
+        
+        # Ask the browser to reconnect shortly after the stream ends at its deadline
+        yield 'retry: 2000\n\n'
+        while time.monotonic() < deadline:
+            events, missed = progress_bus.events_since(
+                last_id, timeout=max(0.0, min(HEARTBEAT_SEC, deadline - time.monotonic())))
+            if missed:
+                message, last_id = snapshot()
+                yield message
+                continue
+            if not events:
+                # Comment line keeps proxies from closing the connection and detects gone clients
+                yield ': heartbeat\n\n'
+                continue
+            for event in events:
+                yield format_sse(event, event['type'], event['id'])
+                last_id = event['id']
+    
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs when the stream ends or the client goes away, even if the generator never started
+    response.call_on_close(sse_slots.release)
+    return response
 
 # ==================== Prediction Routes ====================
 
 @app.route('/api/predict', methods=['POST'])
 def predict_image():
     """Make predictions using all available models"""
+    from utils.prediction_utils import MultiModelPredictor
+    from utils.inference_utils import (
+        ENSEMBLE_MODES, decode_image_bytes, format_model_prediction, format_ensemble_prediction, result_complete
+    )
+    from utils.prediction_cache import content_hash
     global predictor
     
     try:
@@ -338,6 +1244,7 @@ def predict_image():
         # Reinitialize predictor if it wasn't available at startup
         if predictor is None:
             try:
+                init_tensorflow()
                 predictor = MultiModelPredictor(
                     models_dir=app.config['MODELS_FOLDER'],
                     metrics_dir=app.config['METRICS_FOLDER']
@@ -345,91 +1252,229 @@ def predict_image():
             except Exception as e:
                 return jsonify({'error': 'No trained models available. Please train models first.'}), 400
         
-        # Save uploaded image temporarily
-        filename = secure_filename(image_file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"temp_{int(time.time())}_{filename}")
-        image_file.save(filepath)
+        ensemble_mode = request.form.get('ensemble_mode') or inference_engine.ensemble_mode
+        if ensemble_mode not in ENSEMBLE_MODES:
+            return jsonify({'error': f'Ensemble mode must be one of {list(ENSEMBLE_MODES)}'}), 400
         
-        try:
+        image_bytes = image_file.read()
+        
+        # Identical images scored by the same model versions are answered from the cache
+        cache_key = model_versions = cached = None
+        if prediction_cache is not None:
+            cache_key = content_hash(image_bytes, inference_engine.cache_variant(ensemble_mode))
+            model_versions = inference_engine.model_versions(ensemble_mode)
+            cached = prediction_cache.get(cache_key, model_versions)
+        
+        if cached:
+            individual_results, ensemble_result = cached
+        else:
+            # Decode the upload once in memory; no temporary file round trip
+            try:
+                with IMAGE_DECODE_SECONDS.time():
+                    image_tensor = decode_image_bytes(image_bytes)
+            except Exception as e:
+                return jsonify({'error': f'Invalid image file: {str(e)}'}), 400
+            
             # Load models if not already loaded
-            loading_status = predictor.load_all_models()
+            loading_status = inference_engine.load_all_models(ensemble_mode)
             loaded_models = [model for model, status in loading_status.items() if status == 'loaded']
             
+            if not loaded_models and ensemble_mode == 'student':
+                return jsonify({'error': 'The student model has not been trained. Please run distillation first.'}), 400
             if not loaded_models:
                 return jsonify({'error': 'No trained models available. Please train models first.'}), 400
             
-            # Make predictions
-            individual_results, ensemble_result = predictor.predict_all_models(filepath)
-            
-            # Clean up temporary file
-            os.remove(filepath)
-            
-            if not individual_results:
-                return jsonify({'error': 'Failed to make predictions'}), 500
-            
-            # Format results for frontend
-            formatted_results = []
-            for result in individual_results:
-                formatted_results.append({
-                    'model_name': result.model_name,
-                    'model_display_name': result.model_display_name,
-                    'predicted_class': result.predicted_class,
-                    'confidence': round(result.confidence, 2),
-                    'all_probabilities': {k: round(v, 2) for k, v in result.all_probabilities.items()},
-                    'prediction_time': round(result.prediction_time * 1000, 1),  # Convert to ms
-                    'model_params': result.model_params,
-                    'model_speed': result.model_speed
-                })
-            
-            # Format ensemble result
-            ensemble_data = None
-            if ensemble_result:
-                ensemble_data = {
-                    'predicted_class': ensemble_result.predicted_class,
-                    'confidence': round(ensemble_result.confidence, 2),
-                    'model_agreement': round(ensemble_result.model_agreement, 1),
-                    'voting_results': ensemble_result.voting_results,
-                    'average_probabilities': {k: round(v, 2) for k, v in ensemble_result.average_probabilities.items()}
-                }
-            
-            # Generate explanation
-            explanation = predictor.get_prediction_explanation(individual_results, ensemble_result)
-            
-            # Confidence analysis
-            confidence_analysis = predictor.analyze_prediction_confidence(individual_results)
+            # Make predictions on the shared tensor, coalesced with concurrent requests
+            if app.config['ENABLE_MICRO_BATCHING']:
+                individual_results, ensemble_result = prediction_scheduler.predict(image_tensor, ensemble_mode)
+            else:
+                individual_results, ensemble_result = inference_engine.predict_all_models(image_tensor, ensemble_mode)
             
-            return jsonify({
-                'success': True,
-                'individual_results': formatted_results,
-                'ensemble_result': ensemble_data,
-                'explanation': explanation,
-                'confidence_analysis': {
-                    'avg_confidence': round(confidence_analysis.get('avg_confidence', 0), 1),
-                    'confidence_level': confidence_analysis.get('confidence_level', 'Unknown'),
-                    'class_consensus': confidence_analysis.get('unanimous_prediction', False),
-                    'confidence_range': round(confidence_analysis.get('confidence_range', 0), 1)
-                },
-                'timestamp': datetime.now().isoformat()
-            })
-            
-        except Exception as e:
-            # Clean up temporary file if it exists
-            if os.path.exists(filepath):
-                os.remove(filepath)
-            raise e
+            # Only cache complete ensembles; a model that failed to load would otherwise stay missing
+            if prediction_cache is not None and result_complete(ensemble_result):
+                prediction_cache.put(cache_key, model_versions, individual_results, ensemble_result)
+        
+        if not individual_results:
+            return jsonify({'error': 'Failed to make predictions'}), 500
+        
+        # Format results for frontend
+        formatted_results = [format_model_prediction(result) for result in individual_results]
+        ensemble_data = format_ensemble_prediction(ensemble_result)
+        
+        # Generate explanation
+        explanation = predictor.get_prediction_explanation(individual_results, ensemble_result)
+        
+        # Confidence analysis
+        confidence_analysis = predictor.analyze_prediction_confidence(individual_results)
+        
+        return jsonify({
+            'success': True,
+            'individual_results': formatted_results,
+            'ensemble_result': ensemble_data,
+            'explanation': explanation,
+            'execution_mode': inference_engine.execution_mode,
+            'ensemble_mode': ensemble_mode,
+            'models_run': [result.model_name for result in individual_results],
+            'cached': bool(cached),
+            'total_prediction_time': ensemble_data['total_time'] if ensemble_data else 0,
+            'confidence_analysis': {
+                'avg_confidence': round(confidence_analysis.get('avg_confidence', 0), 1),
+                'confidence_level': confidence_analysis.get('confidence_level', 'Unknown'),
+                'class_consensus': confidence_analysis.get('unanimous_prediction', False),
+                'confidence_range': round(confidence_analysis.get('confidence_range', 0), 1)
+            },
+            'timestamp': datetime.now().isoformat()
+        })
             
     except Exception as e:
         return jsonify({'error': f'Prediction error: {str(e)}'}), 500
 
+@app.route('/api/predict_batch', methods=['POST'])
+def predict_batch():
+    """Start a batch prediction job for an uploaded zip/tar archive or a server-side directory"""
+    try:
+        data = request.get_json(silent=True) or request.form
+        output_format = data.get('format', 'jsonl')
+        try:
+            batch_size = int(data.get('batch_size', 32))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'batch_size must be an integer'}), 400
+        
+        if output_format not in ('jsonl', 'csv'):
+            return jsonify({'error': 'Output format must be jsonl or csv'}), 400
+        if batch_size < 1:
+            return jsonify({'error': 'batch_size must be at least 1'}), 400
+        
+        job_id = uuid.uuid4().hex[:12]
+        cleanup_source = False
+        
+        if 'archive' in request.files and request.files['archive'].filename:
+            archive = request.files['archive']
+            source = os.path.join(app.config['UPLOAD_FOLDER'], f"batch_{job_id}_{secure_filename(archive.filename)}")
+            archive.save(source)
+            cleanup_source = True
+        elif data.get('directory'):
+            source = os.path.realpath(data['directory'])
+            input_root = os.path.realpath(app.config['BATCH_INPUT_ROOT'])
+            
+            if os.path.commonpath([source, input_root]) != input_root:
+                return jsonify({'error': 'Directory is outside the allowed batch input root'}), 403
+            if not os.path.isdir(source):
+                return jsonify({'error': f'Directory not found: {data["directory"]}'}), 400
+        else:
+            return jsonify({'error': 'Provide an archive file or a server-side directory'}), 400
+        
+        output_path = os.path.join(app.config['RESULTS_FOLDER'], f"batch_{job_id}.{output_format}")
+        batch_jobs[job_id] = {
+            'job_id': job_id,
+            'status': 'running',
+            'format': output_format,
+            'processed': 0,
+            'failed': 0,
+            'start_time': datetime.now().isoformat()
+        }
+        
+        job_thread = threading.Thread(
+            target=background_batch_prediction,
+            args=(job_id, source, output_path, output_format, batch_size, cleanup_source)
+        )
+        job_thread.daemon = True
+        job_thread.start()
+        
+        return jsonify({
+            'message': 'Batch prediction started',
+            'job_id': job_id,
+            'status_url': f"/api/predict_batch/{job_id}",
+            'results_url': f"/api/predict_batch/{job_id}/results"
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': f'Error starting batch prediction: {str(e)}'}), 500
+
+def background_batch_prediction(job_id, source, output_path, output_format, batch_size, cleanup_source):
+    """Background batch prediction function"""
+    from utils.batch_prediction import run_batch_prediction
+    job = batch_jobs[job_id]
+    
+    def update_progress(summary):
+        job.update(processed=summary['processed'], failed=summary['failed'])
+    
+    try:
+        summary = run_batch_prediction(
+            inference_engine,
+            source,
+            output_path,
+            output_format=output_format,
+            batch_size=batch_size,
+            progress_callback=update_progress,
+            cache=prediction_cache
+        )
+        job.update(summary)
+        job['status'] = 'completed'
+        
+    except Exception as e:
+        print(f"❌ Batch prediction error: {str(e)}")
+        job.update({'status': 'error', 'error': str(e)})
+        
+    finally:
+        job['end_time'] = datetime.now().isoformat()
+        if cleanup_source and os.path.exists(source):
+            os.remove(source)
+
+@app.route('/api/predict_batch/<job_id>')
+def get_batch_status(job_id):
+    """Get status of a batch prediction job"""
+    job = batch_jobs.get(job_id)
+    if not job:
+        return jsonify({'error': f'Batch job {job_id} not found'}), 404
+    
+    return jsonify({k: v for k, v in job.items() if k != 'output_path'})
+
+@app.route('/api/predict_batch/<job_id>/results')
+def download_batch_results(job_id):
+    """Download results of a batch prediction job"""
+    try:
+        job = batch_jobs.get(job_id)
+        if not job:
+            return jsonify({'error': f'Batch job {job_id} not found'}), 404
+        
+        output_path = os.path.join(app.config['RESULTS_FOLDER'], f"batch_{job_id}.{job['format']}")
+        if not os.path.exists(output_path):
+            return jsonify({'error': 'Results not available yet'}), 404
+        
+        return send_file(
+            os.path.abspath(output_path),
+            as_attachment=True,
+            download_name=f"predictions_{job_id}.{job['format']}",
+            mimetype='text/csv' if job['format'] == 'csv' else 'application/x-ndjson'
+        )
+        
+    except Exception as e:
+        return jsonify({'error': f'Error downloading results: {str(e)}'}), 500
+
+@app.route('/api/prediction_cache', methods=['GET', 'DELETE'])
+def prediction_cache_stats():
+    """GET: prediction cache hit rate and size; DELETE: drop every cached result"""
+    if prediction_cache is None:
+        return jsonify({'enabled': False})
+    
+    if request.method == 'DELETE':
+        prediction_cache.clear()
+        return jsonify({'message': 'Prediction cache cleared', 'enabled': True, **prediction_cache.summary()})
+    return jsonify({'enabled': True, **prediction_cache.summary()})
+
 @app.route('/api/models/available')
 def get_available_models():
     """Get information about available models"""
+    from utils.model_factory import ModelFactory
+    from utils.prediction_utils import MultiModelPredictor
     global predictor
     
     try:
         # Reinitialize predictor if needed
         if predictor is None:
             try:
+                init_tensorflow()
                 predictor = MultiModelPredictor(
                     models_dir=app.config['MODELS_FOLDER'],
                     metrics_dir=app.config['METRICS_FOLDER']
@@ -437,6 +1482,7 @@ def get_available_models():
             except:
                 # If predictor can't be initialized, create a minimal response
                 model_info = ModelFactory.get_model_info()
+                cache_status = model_registry.status()
                 available_models = {}
                 
                 for model_type, info in model_info.items():
@@ -445,8 +1491,10 @@ def get_available_models():
                     
                     available_models[model_type] = {
                         **info,
+                        'speed': inference_engine.speed_label(model_type),
                         'status': status,
-                        'loading_status': 'not_loaded',
+                        'loading_status': cache_status[model_type]['cache_state'],
+                        'cache': cache_status[model_type],
                         'model_path': model_path
                     }
                 
@@ -454,46 +1502,147 @@ def get_available_models():
         
         available_models = predictor.get_available_models()
         training_status_info = training_pipeline.get_training_status()
+        cache_status = model_registry.status()
         
         # Combine information
         for model_type in available_models:
             available_models[model_type]['training_status'] = training_status_info.get(model_type, 'unknown')
+            if model_type in cache_status:
+                available_models[model_type]['loading_status'] = cache_status[model_type]['cache_state']
+                available_models[model_type]['cache'] = cache_status[model_type]
+            available_models[model_type]['speed'] = inference_engine.speed_label(model_type)
         
         return jsonify(available_models)
         
     except Exception as e:
         return jsonify({'error': f'Error getting model info: {str(e)}'}), 500
 
+@app.route('/api/benchmark', methods=['GET', 'POST'])
+def benchmark():
+    """GET: last benchmark report per model; POST: benchmark trained models in the background"""
+    from utils.inference_benchmark import InferenceBenchmark, best_result, load_benchmark
+    from utils.model_registry import SERVABLE_MODELS
+    try:
+        if request.method == 'POST':
+            if benchmark_job['status'] == 'running':
+                return jsonify({'error': 'A benchmark is already running'}), 400
+            if training_control['thread'] is not None and training_control['thread'].is_alive():
+                return jsonify({'error': 'Training is in progress; benchmark results would be skewed'}), 400
+            
+            data = request.get_json(silent=True) or {}
+            models = data.get('models') or None
+            invalid_models = [m for m in models or [] if m not in SERVABLE_MODELS]
+            if invalid_models:
+                return jsonify({'error': f'Invalid models: {invalid_models}'}), 400
+            
+            try:
+                benchmark_runner = InferenceBenchmark(
+                    models_dir=app.config['MODELS_FOLDER'],
+                    metrics_dir=app.config['METRICS_FOLDER'],
+                    batch_sizes=data.get('batch_sizes') or [1, 8, 32],
+                    thread_counts=data.get('thread_counts'),
+                    backends=data.get('backends'),
+                    warmup=int(data.get('warmup', 5)),
+                    runs=int(data.get('runs', 30))
+                )
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
+            
+            benchmark_job.clear()
+            benchmark_job.update({
+                'status': 'running',
+                'models': models or 'all trained',
+                'completed_configs': 0,
+                'start_time': datetime.now().isoformat()
+            })
+            
+            def run_benchmark():
+                def update_progress(model_type, backend, threads):
+                    benchmark_job['completed_configs'] += 1
+                    benchmark_job['current'] = f'{model_type} ({backend}, {threads} threads)'
+                
+                try:
+                    reports = benchmark_runner.run(models, progress_callback=update_progress)
+                    benchmark_job['errors'] = {m: r['error'] for m, r in reports.items() if 'error' in r}
+                    benchmark_job['status'] = 'completed'
+                except Exception as e:
+                    print(f"❌ Benchmark error: {str(e)}")
+                    benchmark_job.update({'status': 'error', 'error': str(e)})
+                finally:
+                    benchmark_job.pop('current', None)
+                    benchmark_job['end_time'] = datetime.now().isoformat()
+            
+            threading.Thread(target=run_benchmark, daemon=True).start()
+            return jsonify({'message': 'Benchmark started', 'status_url': '/api/benchmark'}), 202
+        
+        reports = {}
+        for model_type in SERVABLE_MODELS:
+            report = load_benchmark(app.config['METRICS_FOLDER'], model_type)
+            if report:
+                reports[model_type] = {
+                    **report,
+                    'speed': inference_engine.speed_label(model_type),
+                    'serving': best_result(report, model_registry.backend)
+                }
+        
+        return jsonify({'job': benchmark_job, 'reports': reports})
+        
+    except Exception as e:
+        return jsonify({'error': f'Error with benchmark: {str(e)}'}), 500
+
 # ==================== Analytics Routes ====================
 
 @app.route('/api/analytics/metrics/<model_name>')
 def get_model_metrics(model_name):
     """Get training metrics for a specific model"""
     try:
-        metrics_file = os.path.join(app.config['METRICS_FOLDER'], f"{model_name}_metrics.json")
+        metrics = analytics_cache.read_json(metrics_path(app.config['METRICS_FOLDER'], model_name))
         
-        if not os.path.exists(metrics_file):
+        if metrics is None:
             return jsonify({'error': f'Metrics not found for {model_name}'}), 404
         
-        with open(metrics_file, 'r') as f:
-            metrics = json.load(f)
-        
         return jsonify(metrics)
         
     except Exception as e:
         return jsonify({'error': f'Error loading metrics: {str(e)}'}), 500
 
+@app.route('/api/analytics/history/<model_name>')
+def get_training_history(model_name):
+    """Per-epoch rows of a model's latest training run; ?after=<id> returns only rows appended since"""
+    try:
+        run_id = metrics_store.latest_run(model_name)
+        if run_id is None:
+            return jsonify({'error': f'No training history for {model_name}'}), 404
+        
+        after = int(request.args.get('after', 0))
+        rows = metrics_store.tail(after, run_id=run_id)
+        return jsonify({
+            'model': model_name,
+            'run_id': run_id,
+            'rows': rows,
+            'last_id': rows[-1]['id'] if rows else after
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Error loading training history: {str(e)}'}), 500
+
 @app.route('/api/analytics/comparison')
 def get_model_comparison():
     """Get comparison data for all trained models"""
+    from utils.model_factory import ModelFactory
+    from utils.tflite_export import load_export_report
     try:
-        comparison_data = []
+        metrics_dir = app.config['METRICS_FOLDER']
+        model_types = list(ModelFactory.SUPPORTED_MODELS.keys())
+        metrics_files = [metrics_path(metrics_dir, model_type) for model_type in model_types]
+        export_reports = [os.path.join(metrics_dir, f"{model_type}_tflite.json") for model_type in model_types]
         
-        for model_type in ModelFactory.SUPPORTED_MODELS.keys():
-            metrics_file = os.path.join(app.config['METRICS_FOLDER'], f"{model_type}_metrics.json")
-            if os.path.exists(metrics_file):
-                with open(metrics_file, 'r') as f:
-                    metrics = json.load(f)
+        def build_comparison():
+            comparison_data = []
+            for model_type in model_types:
+                metrics = analytics_cache.read_json(metrics_path(metrics_dir, model_type))
+                if metrics is None:
+                    continue
                 
                 summary = metrics.get('summary', {})
                 comparison_data.append({
@@ -503,48 +1652,241 @@ def get_model_comparison():
                     'final_accuracy': summary.get('final_accuracy', 0) * 100,
                     'training_time': metrics.get('training_time', 0),
                     'total_epochs': summary.get('total_epochs', 0),
-                    'status': 'completed' if summary else 'not_trained'
+                    'status': 'completed' if summary else 'not_trained',
+                    'quantization': load_export_report(metrics_dir, model_type)
                 })
+            return comparison_data
         
-        # Generate rankings
-        rankings = analytics_utils.get_model_rankings(app.config['METRICS_FOLDER'])
+        # Re-read and re-ranked only when a metrics or export report file changed
+        comparison_data = analytics_cache.derived('comparison', metrics_files + export_reports, build_comparison)
+        rankings = analytics_cache.derived('rankings', metrics_files,
+                                           lambda: analytics_utils.get_model_rankings(metrics_dir))
+        
+        # Queue the plots drawn from metrics that changed since they were rendered
+        plot_renderer.refresh()
         
         return jsonify({
             'comparison_data': comparison_data,
-            'rankings': rankings
+            'rankings': rankings,
+            'student': get_student_comparison()
         })
         
     except Exception as e:
         return jsonify({'error': f'Error generating comparison: {str(e)}'}), 500
 
+def get_student_comparison():
+    """Distilled student against the ensemble it learned from: accuracy and per-image latency, or None"""
+    from utils.model_registry import SERVABLE_MODELS, STUDENT_MODEL
+    from utils.tflite_export import load_export_report
+    metrics = analytics_cache.read_json(metrics_path(app.config['METRICS_FOLDER'], STUDENT_MODEL))
+    if metrics is None:
+        return None
+    
+    distillation = metrics.get('distillation', {})
+    teachers = distillation.get('teachers', [])
+    teacher_latencies = [inference_engine.model_latency_ms(model_type) for model_type in teachers]
+    summary = metrics.get('summary', {})
+    
+    return {
+        'model': STUDENT_MODEL,
+        'model_name': SERVABLE_MODELS[STUDENT_MODEL],
+        'best_accuracy': summary.get('best_val_accuracy', 0) * 100,
+        'training_time': metrics.get('training_time', 0),
+        'teachers': teachers,
+        'student_val_accuracy': distillation.get('student_val_accuracy'),
+        'ensemble_val_accuracy': distillation.get('ensemble_val_accuracy'),
+        'agreement_with_ensemble': distillation.get('agreement_with_ensemble'),
+        'latency_ms': inference_engine.model_latency_ms(STUDENT_MODEL),
+        # Sequential full-ensemble cost; only known once every teacher has been benchmarked
+        'ensemble_latency_ms': (round(sum(teacher_latencies), 2)
+                                if teachers and None not in teacher_latencies else None),
+        'quantization': load_export_report(app.config['METRICS_FOLDER'], STUDENT_MODEL)
+    }
+
+@app.route('/api/analytics/cascade', methods=['GET', 'POST'])
+def cascade_analysis():
+    """GET: last cascade latency/accuracy report; POST: analyze the validation split in the background"""
+    from utils.cascade_analysis import CascadeAnalysis, load_cascade_analysis
+    try:
+        if request.method == 'POST':
+            if cascade_job['status'] == 'running':
+                return jsonify({'error': 'A cascade analysis is already running'}), 400
+            if training_control['thread'] is not None and training_control['thread'].is_alive():
+                return jsonify({'error': 'Training is in progress; please wait until it finishes'}), 400
+            
+            data = request.get_json(silent=True) or {}
+            try:
+                analysis = CascadeAnalysis(
+                    inference_engine,
+                    data_dir=app.config['DATA_FOLDER'],
+                    metrics_dir=app.config['METRICS_FOLDER'],
+                    cache_dir=app.config['CACHE_FOLDER'],
+                    validation_split=float(data.get('validation_split', 0.2)),
+                    batch_size=int(data.get('batch_size', 32)),
+                    **{key: data[key] for key in ('confidence_thresholds', 'agreement_thresholds') if data.get(key)}
+                )
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
+            
+            cascade_job.clear()
+            cascade_job.update({'status': 'running', 'scored_models': [], 'start_time': datetime.now().isoformat()})
+            
+            def run_analysis():
+                try:
+                    analysis.run(progress_callback=cascade_job['scored_models'].append)
+                    cascade_job['status'] = 'completed'
+                except Exception as e:
+                    print(f"❌ Cascade analysis error: {str(e)}")
+                    cascade_job.update({'status': 'error', 'error': str(e)})
+                finally:
+                    cascade_job['end_time'] = datetime.now().isoformat()
+            
+            threading.Thread(target=run_analysis, daemon=True).start()
+            return jsonify({'message': 'Cascade analysis started', 'status_url': '/api/analytics/cascade'}), 202
+        
+        return jsonify({
+            'job': cascade_job,
+            'settings': {
+                'ensemble_mode': inference_engine.ensemble_mode,
+                'confidence_threshold': inference_engine.cascade_confidence,
+                'agreement_threshold': inference_engine.cascade_agreement,
+                'order': inference_engine.cascade_order()
+            },
+            'report': load_cascade_analysis(app.config['METRICS_FOLDER'])
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Error with cascade analysis: {str(e)}'}), 500
+
+@app.route('/api/analytics/evaluation', methods=['GET', 'POST'])
+def model_evaluation():
+    """GET: last evaluation report; POST: evaluate every trained model and ensemble subset in the background"""
+    from utils.evaluation import ModelEvaluation, load_evaluation_report
+    try:
+        if request.method == 'POST':
+            if evaluation_job['status'] == 'running':
+                return jsonify({'error': 'An evaluation is already running'}), 400
+            if training_control['thread'] is not None and training_control['thread'].is_alive():
+                return jsonify({'error': 'Training is in progress; please wait until it finishes'}), 400
+            
+            data = request.get_json(silent=True) or {}
+            try:
+                evaluation = ModelEvaluation(
+                    inference_engine,
+                    data_dir=app.config['DATA_FOLDER'],
+                    metrics_dir=app.config['METRICS_FOLDER'],
+                    cache_dir=app.config['CACHE_FOLDER'],
+                    validation_split=float(data.get('validation_split', 0.2)),
+                    batch_size=int(data.get('batch_size', 32)),
+                    **{key: data[key] for key in ('top_k', 'calibration_bins') if data.get(key)}
+                )
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
+            
+            evaluation_job.clear()
+            evaluation_job.update({'status': 'running', 'evaluated_models': [],
+                                   'start_time': datetime.now().isoformat()})
+            
+            def run_evaluation():
+                try:
+                    report = evaluation.run(data.get('models'),
+                                            progress_callback=evaluation_job['evaluated_models'].append)
+                    evaluation_job.update({'status': 'completed', 'scored_models': report['scored_models']})
+                except Exception as e:
+                    print(f"❌ Evaluation error: {str(e)}")
+                    evaluation_job.update({'status': 'error', 'error': str(e)})
+                finally:
+                    evaluation_job['end_time'] = datetime.now().isoformat()
+            
+            threading.Thread(target=run_evaluation, daemon=True).start()
+            return jsonify({'message': 'Evaluation started', 'status_url': '/api/analytics/evaluation'}), 202
+        
+        return jsonify({
+            'job': evaluation_job,
+            'report': load_evaluation_report(app.config['METRICS_FOLDER'])
+        })
+        
+    except Exception as e:
+        return jsonify({'error': f'Error with model evaluation: {str(e)}'}), 500
+
+@app.route('/api/analytics/evaluation/ensemble')
+def evaluate_ensemble():
+    """Metrics of the averaged ensemble of ?models=a,b,... from cached validation outputs, without inference"""
+    from utils.evaluation import ModelEvaluation
+    from utils.model_registry import SERVABLE_MODELS
+    try:
+        model_types = [m for m in request.args.get('models', '').split(',') if m]
+        unknown = [m for m in model_types if m not in SERVABLE_MODELS]
+        if not model_types or unknown:
+            return jsonify({'error': f"models must list servable models, got: {', '.join(unknown) or 'none'}"}), 400
+        
+        evaluation = ModelEvaluation(
+            inference_engine,
+            data_dir=app.config['DATA_FOLDER'],
+            metrics_dir=app.config['METRICS_FOLDER'],
+            cache_dir=app.config['CACHE_FOLDER'],
+            validation_split=float(request.args.get('validation_split', 0.2))
+        )
+        return jsonify(evaluation.evaluate_subset(model_types))
+        
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Error evaluating ensemble: {str(e)}'}), 500
+
+@app.route('/api/analytics/plots')
+def plot_status():
+    """Render state of every analytics plot: current, stale, queued, rendering or error"""
+    try:
+        return jsonify({'plots': plot_renderer.status()})
+    except Exception as e:
+        return jsonify({'error': f'Error reading plot status: {str(e)}'}), 500
+
 @app.route('/api/analytics/plots/<plot_name>')
 def get_plot(plot_name):
-    """Serve analytics plot images"""
+    """Serve analytics plot images; clients revalidate with ETag/Last-Modified and get 304 while unchanged"""
     try:
-        plot_path = os.path.join(app.config['METRICS_FOLDER'], f"{plot_name}.png")
+        # A plot drawn from outdated metrics is served as is and re-rendered in the background
+        plot_renderer.refresh([plot_name])
         
-        if not os.path.exists(plot_path):
+        plot_file = plot_path(app.config['METRICS_FOLDER'], plot_name)
+        if not os.path.exists(plot_file):
             return jsonify({'error': 'Plot not found'}), 404
         
-        return send_file(plot_path, mimetype='image/png')
+        stat = os.stat(plot_file)
+        return send_file(
+            os.path.abspath(plot_file),
+            mimetype='image/png',
+            etag=f"{plot_name}-{stat.st_mtime_ns}-{stat.st_size}",
+            last_modified=stat.st_mtime,
+            max_age=0
+        )
         
     except Exception as e:
         return jsonify({'error': f'Error serving plot: {str(e)}'}), 500
 
 @app.route('/api/analytics/generate_report')
 def generate_analytics_report():
-    """Generate comprehensive analytics report"""
+    """Queue the comprehensive report for rendering unless it is already up to date (?force=1 re-renders)"""
     try:
-        report_path = analytics_utils.generate_training_report(app.config['METRICS_FOLDER'])
+        force = request.args.get('force') == '1'
+        plot_renderer.refresh([REPORT_PLOT], force=force)
+        report = plot_renderer.status().get(REPORT_PLOT)
         
-        if report_path and os.path.exists(report_path):
-            return jsonify({
-                'success': True,
-                'message': 'Report generated successfully',
-                'report_url': f"/api/analytics/plots/comprehensive_training_report"
-            })
-        else:
-            return jsonify({'error': 'Failed to generate report'}), 500
+        if report is None:
+            return jsonify({'error': 'No trained models to report on'}), 400
+        if report['status'] == 'error':
+            return jsonify({'error': f"Failed to generate report: {report['error']}"}), 500
+        
+        return jsonify({
+            'success': True,
+            'status': report['status'],
+            'message': 'Report is up to date' if report['status'] == 'current' else 'Report generation queued',
+            'report_url': f"/api/analytics/plots/{REPORT_PLOT}",
+            'status_url': '/api/analytics/plots'
+        }), 202 if report['status'] in ('queued', 'rendering') else 200
             
     except Exception as e:
         return jsonify({'error': f'Error generating report: {str(e)}'}), 500
@@ -553,20 +1895,26 @@ def generate_analytics_report():
 
 @app.route('/api/download/model/<model_name>')
 def download_model(model_name):
-    """Download trained model file"""
+    """Download trained model file (Keras .h5 or an exported TFLite variant via ?format=)"""
+    from utils.model_factory import ModelFactory
+    from utils.model_registry import MODEL_BACKENDS, backend_model_path
     try:
         if model_name not in ModelFactory.SUPPORTED_MODELS:
             return jsonify({'error': 'Invalid model name'}), 400
         
-        model_path = os.path.join(app.config['MODELS_FOLDER'], f"{model_name}_model.h5")
+        model_format = request.args.get('format', 'keras')
+        if model_format not in MODEL_BACKENDS:
+            return jsonify({'error': f'Invalid model format. Use one of: {", ".join(MODEL_BACKENDS)}'}), 400
+        
+        model_path = backend_model_path(app.config['MODELS_FOLDER'], model_name, model_format)
         
         if not os.path.exists(model_path):
             return jsonify({'error': f'Model {model_name} not found'}), 404
         
         return send_file(
-            model_path,
+            os.path.abspath(model_path),
             as_attachment=True,
-            download_name=f"{model_name}_model.h5",
+            download_name=os.path.basename(model_path),
             mimetype='application/octet-stream'
         )
         
@@ -576,6 +1924,7 @@ def download_model(model_name):
 @app.route('/api/download/metrics/<model_name>')
 def download_metrics(model_name):
     """Download model training metrics"""
+    from utils.model_factory import ModelFactory
     try:
         if model_name not in ModelFactory.SUPPORTED_MODELS:
             return jsonify({'error': 'Invalid model name'}), 400
@@ -595,28 +1944,46 @@ def download_metrics(model_name):
     except Exception as e:
         return jsonify({'error': f'Error downloading metrics: {str(e)}'}), 500
 
-# ==================== Helper Functions ====================
-
-def get_trained_models():
-    """Get list of trained models"""
-    trained_models = []
-    
-    for model_type in ModelFactory.SUPPORTED_MODELS.keys():
-        model_path = os.path.join(app.config['MODELS_FOLDER'], f"{model_type}_model.h5")
-        if os.path.exists(model_path):
-            trained_models.append({
-                'type': model_type,
-                'name': ModelFactory.SUPPORTED_MODELS[model_type],
-                'info': ModelFactory.get_model_info()[model_type]
-            })
-    
-    return trained_models
+@app.route('/api/download/progress/<model_name>')
+def download_progress(model_name):
+    """Export a model's latest training run from the metrics store as progress JSON"""
+    from utils.model_registry import SERVABLE_MODELS
+    try:
+        if model_name not in SERVABLE_MODELS:
+            return jsonify({'error': 'Invalid model name'}), 400
+        
+        progress = metrics_store.progress(model_name)
+        if progress is None:
+            return jsonify({'error': f'Training history for {model_name} not found'}), 404
+        
+        return send_file(
+            io.BytesIO(json.dumps(progress).encode('utf-8')),
+            as_attachment=True,
+            download_name=f"{model_name}_progress.json",
+            mimetype='application/json'
+        )
+        
+    except Exception as e:
+        return jsonify({'error': f'Error exporting training progress: {str(e)}'}), 500
 
 # ==================== Error Handlers ====================
 
+def format_size(num_bytes):
+    for unit in ('bytes', 'KB', 'MB', 'GB'):
+        if num_bytes < 1024 or unit == 'GB':
+            return f"{num_bytes:g}{unit}" if unit == 'bytes' else f"{num_bytes:.3g}{unit}"
+        num_bytes /= 1024
+
 @app.errorhandler(413)
 def too_large(e):
-    return jsonify({'error': 'File too large. Maximum size is 16MB.'}), 413
+    # The limits depend on the route (see IngestRequest)
+    limit = request.max_content_length
+    if limit and (request.content_length is None or request.content_length > limit):
+        return jsonify({'error': f'File too large. Maximum size is {format_size(limit)}.'}), 413
+    if request.max_form_parts:
+        return jsonify({'error': f'Too many files or fields in one request. '
+                                 f'Maximum is {request.max_form_parts} parts.'}), 413
+    return jsonify({'error': 'Request too large.'}), 413
 
 @app.errorhandler(404)
 def not_found(e):
@@ -635,4 +2002,10 @@ if __name__ == '__main__':
     print(f"📊 Metrics folder: {app.config['METRICS_FOLDER']}")
     print("🌐 Starting Flask server...")
     
+    # The debug reloader imports this module in a watcher process too; only the serving child starts work
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_background_services()
+        if app.config['WARMUP_ON_START']:
+            start_warmup()
+    
     app.run(host='0.0.0.0', port=5000, debug=True, threaded=True)
\ No newline at end of file
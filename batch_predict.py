@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Bulk-score a directory, zip or tar archive of images with every trained model
+Writes per-image and ensemble results incrementally as JSONL or CSV
+"""
+
+import argparse
+
+from utils.inference_utils import ENSEMBLE_MODES, EXECUTION_MODES, InferenceEngine, configure_tf_threads
+from utils.batch_prediction import run_batch_prediction
+from utils.prediction_cache import PredictionCache
+
+
+def main():
+    """Command-line entry point for batch prediction"""
+    parser = argparse.ArgumentParser(description='Batch image classification with all trained models')
+    parser.add_argument('source', help='Directory, zip or tar archive of images')
+    parser.add_argument('-o', '--output', help='Output file (default: predictions.<format>)')
+    parser.add_argument('-f', '--format', choices=['jsonl', 'csv'], default='jsonl', help='Output format')
+    parser.add_argument('-b', '--batch-size', type=int, default=32, help='Images per forward pass')
+    parser.add_argument('--execution-mode', choices=EXECUTION_MODES, default='sequential',
+                        help='Run the models one after another or concurrently')
+    parser.add_argument('--ensemble-mode', choices=ENSEMBLE_MODES, default='full',
+                        help='Run every model, or fastest first and escalate only on low confidence')
+    parser.add_argument('--cascade-confidence', type=float, default=90.0,
+                        help='Cascade: ensemble confidence (%%) at which an image exits early')
+    parser.add_argument('--cascade-agreement', type=float, default=100.0,
+                        help='Cascade: model agreement (%%) required to exit early')
+    parser.add_argument('--models-dir', default='models', help='Folder with trained models')
+    parser.add_argument('--metrics-dir', default='metrics', help='Folder with training metrics')
+    parser.add_argument('--cache', help='SQLite prediction cache to reuse results of identical images across runs')
+    args = parser.parse_args()
+
+    output_path = args.output or f'predictions.{args.format}'
+    configure_tf_threads(args.execution_mode)
+    engine = InferenceEngine(
+        models_dir=args.models_dir,
+        metrics_dir=args.metrics_dir,
+        execution_mode=args.execution_mode,
+        ensemble_mode=args.ensemble_mode,
+        cascade_confidence=args.cascade_confidence,
+        cascade_agreement=args.cascade_agreement
+    )
+
+    cache = PredictionCache(max_entries=100_000, ttl_sec=None, persist_path=args.cache) if args.cache else None
+
+    print(f"🚀 Scoring images from {args.source}")
+
+    def report_progress(summary):
+        print(f"   📊 {summary['processed']} processed, {summary['failed']} failed", end='\r')
+
+    summary = run_batch_prediction(
+        engine,
+        args.source,
+        output_path,
+        output_format=args.format,
+        batch_size=args.batch_size,
+        progress_callback=report_progress,
+        cache=cache
+    )
+
+    print(f"\n✅ Done: {summary['processed']} images in {summary['elapsed']}s "
+          f"({summary['images_per_sec']} images/sec), {summary['failed']} failed")
+    if cache is not None:
+        print(f"🗃️ {summary['cached']} images answered from the prediction cache")
+    print(f"📁 Results written to {output_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark inference latency and throughput of every trained model
+Writes p50/p95/p99 latency, images/sec and peak RSS to metrics/benchmark_<model>.json
+"""
+
+import argparse
+
+from utils.model_registry import MODEL_BACKENDS, SERVABLE_MODELS
+from utils.inference_benchmark import DEFAULT_BATCH_SIZES, DEFAULT_TIMED_RUNS, DEFAULT_WARMUP_RUNS, InferenceBenchmark
+
+
+def main():
+    """Command-line entry point for the inference benchmark"""
+    parser = argparse.ArgumentParser(description='Benchmark trained models per backend, batch size and thread count')
+    parser.add_argument('models', nargs='*', help='Models to benchmark (default: every trained model)')
+    parser.add_argument('-b', '--batch-sizes', type=int, nargs='+', default=list(DEFAULT_BATCH_SIZES),
+                        help='Batch sizes to time')
+    parser.add_argument('-t', '--threads', type=int, nargs='+', help='CPU thread counts (default: 1 and all cores)')
+    parser.add_argument('--backends', nargs='+', choices=list(MODEL_BACKENDS),
+                        help='Serving backends (default: every exported one)')
+    parser.add_argument('--warmup', type=int, default=DEFAULT_WARMUP_RUNS, help='Untimed runs per batch size')
+    parser.add_argument('--runs', type=int, default=DEFAULT_TIMED_RUNS, help='Timed runs per batch size')
+    parser.add_argument('--models-dir', default='models', help='Folder with trained models')
+    parser.add_argument('--metrics-dir', default='metrics', help='Folder for benchmark reports')
+    args = parser.parse_args()
+
+    unknown = [m for m in args.models if m not in SERVABLE_MODELS]
+    if unknown:
+        parser.error(f"unknown models: {', '.join(unknown)} (choose from {', '.join(SERVABLE_MODELS)})")
+
+    runner = InferenceBenchmark(
+        models_dir=args.models_dir,
+        metrics_dir=args.metrics_dir,
+        batch_sizes=args.batch_sizes,
+        thread_counts=args.threads,
+        backends=args.backends,
+        warmup=args.warmup,
+        runs=args.runs
+    )
+    reports = runner.run(args.models or None)
+    if not reports:
+        print("⚠️ No trained models found")
+        return
+
+    print(f"\n{'model':<14}{'backend':<13}{'threads':>8}{'batch':>7}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'img/s':>9}{'RSS MB':>9}")
+    for model_type, report in reports.items():
+        if 'error' in report:
+            print(f"{model_type:<14}❌ {report['error']}")
+            continue
+        for row in report['results']:
+            if 'error' in row:
+                print(f"{model_type:<14}{row['backend']:<13}{row['threads']:>8}  ❌ {row['error']}")
+                continue
+            print(f"{model_type:<14}{row['backend']:<13}{row['threads']:>8}{row['batch_size']:>7}"
+                  f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}{row['images_per_sec']:>9}"
+                  f"{row['peak_rss_mb'] or '-':>9}")
+    print(f"📁 Reports written to {args.metrics_dir}/benchmark_<model>.json")
+
+
+if __name__ == "__main__":
+    main()
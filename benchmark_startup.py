@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Benchmark the web app's cold start
+Import time, first request to the model-free routes, idle RSS and warm-up time
+over fresh interpreters; results go to metrics/startup_benchmark.json
+"""
+
+import argparse
+
+from utils.startup_benchmark import LIGHT_ROUTES, StartupBenchmark
+
+
+def main():
+    """Command-line entry point for the startup benchmark"""
+    parser = argparse.ArgumentParser(description='Cold-start time and idle memory of the web app')
+    parser.add_argument('--runs', type=int, default=3, help='Fresh interpreters to measure')
+    parser.add_argument('--routes', nargs='+', default=list(LIGHT_ROUTES), help='Routes requested before warm-up')
+    parser.add_argument('--no-warmup', action='store_true', help='Skip timing the model warm-up')
+    parser.add_argument('--inference-workers', type=int, default=0,
+                        help='Measure the warm-up with this many inference worker processes')
+    parser.add_argument('--metrics-dir', default='metrics', help='Folder for the benchmark report')
+    args = parser.parse_args()
+
+    benchmark = StartupBenchmark(
+        metrics_dir=args.metrics_dir,
+        runs=args.runs,
+        routes=args.routes,
+        warmup=not args.no_warmup,
+        inference_workers=args.inference_workers
+    )
+    summary = benchmark.run()['summary']
+    if not summary:
+        print("⚠️ Every run failed; see the report for errors")
+        return
+
+    print(f"\n{'import':>10}{'idle RSS':>10}{'warm-up':>10}{'ready RSS':>11}")
+    print(f"{summary['import_seconds']:>9}s{summary['idle_rss_mb']:>7} MB"
+          f"{summary['warmup_seconds'] or '-':>9}s{summary['ready_rss_mb'] or '-':>8} MB")
+    for route, ms in summary['first_request_ms'].items():
+        print(f"   first {route}: {ms} ms")
+    if summary['tensorflow_loaded_when_idle']:
+        print("⚠️ TensorFlow was imported before warm-up; a model-free import path pulls it in")
+    print(f"📁 Report written to {args.metrics_dir}/startup_benchmark.json")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark CPU training throughput of every supported architecture
+Fixed steps on seeded synthetic data; results go to metrics/training_benchmark.json
+"""
+
+import json
+import argparse
+
+from utils.model_factory import ModelFactory
+from utils.training_benchmark import SYNTHETIC_SOURCE, TrainingBenchmark, compare_reports
+
+
+def main():
+    """Command-line entry point for the training benchmark"""
+    parser = argparse.ArgumentParser(description='Fixed-step CPU training throughput benchmark')
+    parser.add_argument('models', nargs='*', help='Architectures to benchmark (default: all supported)')
+    parser.add_argument('--source', default=SYNTHETIC_SOURCE,
+                        help="'synthetic' or a small fixed dataset folder (class folders or shards)")
+    parser.add_argument('--steps', type=int, default=20, help='Timed training steps per model')
+    parser.add_argument('--warmup-steps', type=int, default=3, help='Untimed steps (graph tracing) per model')
+    parser.add_argument('-b', '--batch-size', type=int, default=32, help='Images per step')
+    parser.add_argument('-t', '--threads', type=int, help='CPU threads (default: all cores)')
+    parser.add_argument('--seed', type=int, default=42, help='Seed for data and weights')
+    parser.add_argument('--profile', action='store_true', help='Capture a TensorFlow profiler trace per model')
+    parser.add_argument('--profile-steps', type=int, default=5, help='Steps covered by the profiler trace')
+    parser.add_argument('--baseline', help='Earlier training_benchmark.json to compare against')
+    parser.add_argument('--metrics-dir', default='metrics', help='Folder for the benchmark report')
+    args = parser.parse_args()
+
+    unknown = [m for m in args.models if m not in ModelFactory.SUPPORTED_MODELS]
+    if unknown:
+        parser.error(f"unknown models: {', '.join(unknown)} (choose from {', '.join(ModelFactory.SUPPORTED_MODELS)})")
+
+    benchmark = TrainingBenchmark(
+        metrics_dir=args.metrics_dir,
+        source=args.source,
+        steps=args.steps,
+        warmup_steps=args.warmup_steps,
+        batch_size=args.batch_size,
+        threads=args.threads,
+        seed=args.seed,
+        profile=args.profile,
+        profile_steps=args.profile_steps
+    )
+    report = benchmark.run(args.models or None)
+
+    comparison = {}
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            comparison = compare_reports(report, json.load(f))
+
+    print(f"\n{'model':<14}{'img/s':>9}{'step p50':>10}{'step p95':>10}{'wait %':>8}{'RSS MB':>9}{'vs base':>9}")
+    for model_type, result in report['results'].items():
+        if 'error' in result:
+            print(f"{model_type:<14}❌ {result['error']}")
+            continue
+        change = comparison.get(model_type, {}).get('images_per_sec_change_pct')
+        print(f"{model_type:<14}{result['images_per_sec']:>9}{result['step_time_ms']['p50']:>10}"
+              f"{result['step_time_ms']['p95']:>10}{result['input_wait_fraction'] * 100:>8.1f}"
+              f"{result['peak_rss_mb'] or '-':>9}{'' if change is None else f'{change:+.1f}%':>9}")
+        if result.get('profile_dir'):
+            print(f"   🔬 Profiler trace: {result['profile_dir']}")
+
+    revision = report['revision'] or {}
+    print(f"📁 Report written to {args.metrics_dir}/training_benchmark.json "
+          f"(commit {revision.get('commit', 'unknown')}{', dirty' if revision.get('dirty') else ''})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Pack the training images into pre-resized NumPy shards with a manifest
+Re-running only decodes images that were added or changed since the last build
+"""
+
+import argparse
+
+from utils.dataset_index import DatasetIndex
+from utils.dataset_shards import DEFAULT_SHARD_SIZE, build_shards
+
+
+def main():
+    """Command-line entry point for building dataset shards"""
+    parser = argparse.ArgumentParser(description='Build or update the sharded training dataset')
+    parser.add_argument('--data-dir', default='data', help='Folder with one sub-folder per class')
+    parser.add_argument('-o', '--output', default='cache/shards', help='Shard folder')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help='Images per shard')
+    args = parser.parse_args()
+
+    index = DatasetIndex(args.data_dir)
+    index.refresh()
+    summary = build_shards(index, args.output, shard_size=args.shard_size)
+
+    print(f"✅ {summary['images']} images in {summary['shards']} shards: {summary['decoded']} decoded, "
+          f"{summary['carried_over']} carried over, {summary['removed']} removed, {summary['failed']} failed")
+    print(f"📁 Shards written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,8 @@ Debug script to check dataset structure and identify training issues
 
 import os
 from tensorflow.keras.preprocessing.image import ImageDataGenerator
+from utils.data_pipeline import build_training_datasets
+from utils.dataset_index import DatasetIndex
 
 def debug_dataset(data_dir='data'):
     """Debug dataset structure and data generators"""
@@ -23,28 +25,35 @@ def debug_dataset(data_dir='data'):
     items = os.listdir(data_dir)
     print(f"📋 Contents: {items}")
     
-    # Check each subdirectory
+    # Bring the dataset index up to date (only new or changed files are decoded)
+    index = DatasetIndex(data_dir)
+    scan = index.rescan()
+    print(f"🗂️ Index: {scan['indexed']} files (re)indexed, {scan['removed']} removed, "
+          f"{scan['unchanged']} unchanged ({scan['elapsed']:.2f}s)")
+    
+    # Check each class
     total_images = 0
     class_info = {}
     
-    for item in items:
-        item_path = os.path.join(data_dir, item)
-        if os.path.isdir(item_path):
-            # Count images in this class folder
-            image_files = [f for f in os.listdir(item_path) 
-                          if f.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))]
-            image_count = len(image_files)
-            total_images += image_count
-            class_info[item] = {
-                'count': image_count,
-                'files': image_files[:5]  # Show first 5 files
-            }
-            
-            print(f"📂 Class '{item}': {image_count} images")
-            if image_count > 0:
-                print(f"   Sample files: {image_files[:3]}")
-            else:
-                print(f"   ⚠️  No images found!")
+    for class_name, counts in index.class_counts(include_invalid=True).items():
+        image_files = [os.path.basename(row['path']) for row in index.files(class_name, limit=5)]
+        image_count = counts['valid']
+        total_images += image_count
+        class_info[class_name] = {
+            'count': image_count,
+            'files': image_files  # Show first 5 files
+        }
+        
+        print(f"📂 Class '{class_name}': {image_count} images")
+        if image_count > 0:
+            print(f"   Sample files: {image_files[:3]}")
+        else:
+            print(f"   ⚠️  No images found!")
+        if counts['invalid']:
+            print(f"   ⚠️  {counts['invalid']} unreadable files")
+    
+    for row in index.invalid_files(limit=10):
+        print(f"   ❌ {row['path']}: {row['error']}")
     
     print(f"\n📊 Total: {total_images} images across {len(class_info)} classes")
     
@@ -114,6 +123,22 @@ def debug_dataset(data_dir='data'):
         except Exception as gen_error:
             print(f"   ❌ Error creating generators: {gen_error}")
     
+    # Test the cached tf.data pipeline used by the tf_data training mode
+    print(f"\n🧪 Testing tf.data Pipeline")
+    print("-" * 30)
+    
+    try:
+        splits = build_training_datasets(data_dir, batch_size=8, validation_split=0.2)
+        print(f"   ✅ Classes: {splits.class_indices}")
+        print(f"   ✅ Training samples: {splits.train_samples}")
+        print(f"   ✅ Validation samples: {splits.val_samples}")
+        
+        batch_x, batch_y = next(iter(splits.train_ds))
+        print(f"   ✅ Successfully loaded batch: {batch_x.shape}, {batch_y.shape}")
+        
+    except Exception as pipeline_error:
+        print(f"   ❌ Error in tf.data pipeline: {pipeline_error}")
+    
     print(f"\n💡 Recommendations:")
     print(f"   - Minimum 10-20 images per class for good results")
     print(f"   - Use batch_size <= {total_images // 4} for this dataset")
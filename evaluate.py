@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Evaluate every trained model on the validation split
+Confusion matrices, per-class precision/recall, calibration, top-k accuracy and
+every ensemble subset, computed from cached model outputs; results go to
+metrics/evaluation_report.json
+"""
+
+import argparse
+
+from utils.evaluation import DEFAULT_CALIBRATION_BINS, DEFAULT_TOP_K, ModelEvaluation
+from utils.inference_utils import InferenceEngine, configure_tf_threads
+
+
+def main():
+    """Command-line entry point for model evaluation"""
+    parser = argparse.ArgumentParser(description='Vectorized evaluation of the trained models and their ensembles')
+    parser.add_argument('--models', nargs='+', help='Models to evaluate (default: every trained model)')
+    parser.add_argument('--data-dir', default='data', help='Folder with one sub-folder per class')
+    parser.add_argument('--validation-split', type=float, default=0.2, help='Validation fraction used in training')
+    parser.add_argument('-b', '--batch-size', type=int, default=32, help='Images per forward pass')
+    parser.add_argument('--top-k', type=int, nargs='+', default=list(DEFAULT_TOP_K), help='Top-k accuracies')
+    parser.add_argument('--calibration-bins', type=int, default=DEFAULT_CALIBRATION_BINS,
+                        help='Confidence bins for the calibration error')
+    parser.add_argument('--models-dir', default='models', help='Folder with trained models')
+    parser.add_argument('--metrics-dir', default='metrics', help='Folder with training metrics')
+    parser.add_argument('--cache-dir', default='cache', help='Folder for the cached model outputs')
+    args = parser.parse_args()
+
+    configure_tf_threads()
+    engine = InferenceEngine(models_dir=args.models_dir, metrics_dir=args.metrics_dir)
+    evaluation = ModelEvaluation(
+        engine,
+        data_dir=args.data_dir,
+        metrics_dir=args.metrics_dir,
+        cache_dir=args.cache_dir,
+        validation_split=args.validation_split,
+        batch_size=args.batch_size,
+        top_k=args.top_k,
+        calibration_bins=args.calibration_bins
+    )
+    report = evaluation.run(args.models)
+
+    print(f"\n{'model':<14}{'accuracy':>10}{'macro F1':>10}{'ECE':>8}{'NLL':>8}  top-k")
+    for model_type, result in report['models'].items():
+        top_k = ', '.join(f"@{k} {value}%" for k, value in result['top_k_accuracy'].items())
+        print(f"{model_type:<14}{result['accuracy']:>9}%{result['macro_f1']:>10}"
+              f"{result['calibration']['ece']:>8}{result['calibration']['nll']:>8}  {top_k}")
+    for row in report['ensembles'][:5]:
+        print(f"   🧩 {' + '.join(row['models'])}: {row['accuracy']}% (ECE {row['ece']})")
+    print(f"📁 Report written to {args.metrics_dir}/evaluation_report.json")
+
+
+if __name__ == "__main__":
+    main()
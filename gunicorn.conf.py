@@ -0,0 +1,25 @@
+"""
+Gunicorn settings for wsgi.py
+The web tier is one process with a pool of request threads: training status,
+background jobs and the prediction cache live in its memory. Throughput
+scales with INFERENCE_WORKERS, the model-serving processes it feeds.
+"""
+
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+
+# Request threads of the web process; more than one web process splits the job state.
+# Training progress streams hold a thread each, so the app admits at most SSE_MAX_STREAMS
+# of them (default: half of WEB_THREADS) and ends each after SSE_MAX_STREAM_SEC
+workers = int(os.environ.get('WEB_WORKERS', 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 8))
+
+# TensorFlow is not fork-safe: every web process imports the app (and spawns its
+# inference workers) itself instead of inheriting a preloaded copy
+preload_app = False
+
+# Model preloading happens while the worker boots; allow for large ensembles
+timeout = int(os.environ.get('WEB_TIMEOUT', 300))
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
@@ -10,6 +10,7 @@ function loadAnalytics() {
     loadQuickStats();
     loadComparisonChart();
     loadIndividualCharts();
+    loadCascadeAnalysis();
 }
 
 function loadQuickStats() {
@@ -17,6 +18,7 @@ function loadQuickStats() {
         .then(response => response.json())
         .then(data => {
             displayQuickStats(data.comparison_data);
+            displayStudentComparison(data.student);
         })
         .catch(error => {
             document.getElementById('quickStats').innerHTML = `
@@ -96,7 +98,41 @@ function displayQuickStats(data) {
     `;
 }
 
-function loadComparisonChart() {
+function displayStudentComparison(student) {
+    if (!student || student.student_val_accuracy == null) {
+        return;
+    }
+    
+    const percent = value => value == null ? 'n/a' : `${(value * 100).toFixed(1)}%`;
+    const latency = value => value == null ? 'not benchmarked' : `${value} ms`;
+    
+    document.getElementById('quickStats').insertAdjacentHTML('beforeend', `
+        <div class="col-12">
+            <div class="card bg-dark border-danger">
+                <div class="card-body d-flex flex-wrap justify-content-around text-center">
+                    <div>
+                        <h6 class="text-muted"><i class="bi bi-mortarboard me-1"></i>${student.model_name}</h6>
+                        <small class="text-muted">Distilled from ${student.teachers.join(', ')}</small>
+                    </div>
+                    <div>
+                        <div class="fs-5 fw-bold text-danger">${percent(student.student_val_accuracy)}</div>
+                        <small class="text-muted">vs ensemble ${percent(student.ensemble_val_accuracy)}</small>
+                    </div>
+                    <div>
+                        <div class="fs-5 fw-bold text-info">${latency(student.latency_ms)}</div>
+                        <small class="text-muted">vs ensemble ${latency(student.ensemble_latency_ms)}</small>
+                    </div>
+                    <div>
+                        <div class="fs-5 fw-bold text-success">${percent(student.agreement_with_ensemble)}</div>
+                        <small class="text-muted">agreement with ensemble</small>
+                    </div>
+                </div>
+            </div>
+        </div>
+    `);
+}
+
+function loadComparisonChart(version) {
     const img = document.getElementById('comparisonChart');
     const loading = document.getElementById('comparisonChartLoading');
     
@@ -117,10 +153,12 @@ function loadComparisonChart() {
         `;
     };
     
-    img.src = `/api/analytics/plots/model_comparison?t=${Date.now()}`;
+    // Browsers revalidate with ETag/Last-Modified and get 304 while the plot is unchanged;
+    // a version forces a reload after a re-render
+    img.src = '/api/analytics/plots/model_comparison' + (version ? `?v=${version}` : '');
 }
 
-function loadIndividualCharts() {
+function loadIndividualCharts(version) {
     const models = ['mobilenet', 'resnet', 'efficientnet', 'densenet'];
     const container = document.getElementById('individualCharts');
     
@@ -159,11 +197,11 @@ function loadIndividualCharts() {
     
     // Load individual charts
     models.forEach(modelType => {
-        loadModelChart(modelType);
+        loadModelChart(modelType, version);
     });
 }
 
-function loadModelChart(modelType) {
+function loadModelChart(modelType, version) {
     const img = document.getElementById(`chart-${modelType}`);
     const loading = document.getElementById(`loading-${modelType}`);
     
@@ -184,7 +222,99 @@ function loadModelChart(modelType) {
         `;
     };
     
-    img.src = `/api/analytics/plots/${modelType}_training_history?t=${Date.now()}`;
+    img.src = `/api/analytics/plots/${modelType}_training_history` + (version ? `?v=${version}` : '');
+}
+
+function loadCascadeAnalysis() {
+    fetch('/api/analytics/cascade')
+        .then(response => response.json())
+        .then(data => {
+            displayCascadeAnalysis(data);
+            if (data.job && data.job.status === 'running') {
+                setTimeout(loadCascadeAnalysis, 3000);
+            }
+        })
+        .catch(error => {
+            document.getElementById('cascadeAnalysis').innerHTML = `
+                <div class="alert alert-danger">Error loading cascade analysis: ${error.message}</div>
+            `;
+        });
+}
+
+function displayCascadeAnalysis(data) {
+    const container = document.getElementById('cascadeAnalysis');
+    const report = data.report;
+    const settings = data.settings;
+    let status = '';
+    
+    if (data.job.status === 'running') {
+        status = `<div class="alert alert-info"><div class="spinner-border spinner-border-sm me-2"></div>
+            Scoring validation images (${data.job.scored_models.length} models done)...</div>`;
+    } else if (data.job.status === 'error') {
+        status = `<div class="alert alert-danger">${data.job.error}</div>`;
+    }
+    
+    if (!report) {
+        container.innerHTML = status || `
+            <div class="alert alert-secondary mb-0">
+                <i class="bi bi-info-circle me-2"></i>
+                No cascade analysis yet. Run it to compare early-exit thresholds against the full ensemble.
+            </div>
+        `;
+        return;
+    }
+    
+    const isConfigured = row => row.confidence_threshold === settings.confidence_threshold &&
+        row.agreement_threshold === settings.agreement_threshold;
+    
+    container.innerHTML = `
+        ${status}
+        <p class="text-muted small">
+            ${report.validation_images} validation images, order ${report.order.join(' → ')}.
+            Full ensemble: <strong>${report.full_ensemble.accuracy}%</strong> accuracy,
+            <strong>${report.full_ensemble.avg_latency_ms} ms</strong> per image.
+            Serving mode: ${settings.ensemble_mode}.
+        </p>
+        <div class="table-responsive">
+            <table class="table table-dark table-sm table-hover mb-0">
+                <thead>
+                    <tr>
+                        <th>Confidence ≥</th><th>Agreement ≥</th><th>Accuracy</th><th>Δ Accuracy</th>
+                        <th>Avg Models</th><th>Avg Latency</th><th>Latency Saved</th>
+                    </tr>
+                </thead>
+                <tbody>
+                    ${report.thresholds.map(row => `
+                        <tr class="${isConfigured(row) ? 'table-active fw-bold' : ''}">
+                            <td>${row.confidence_threshold}%</td>
+                            <td>${row.agreement_threshold}%</td>
+                            <td>${row.accuracy}%</td>
+                            <td class="${row.accuracy_change < 0 ? 'text-danger' : 'text-success'}">${row.accuracy_change}</td>
+                            <td>${row.avg_models_run}</td>
+                            <td>${row.avg_latency_ms} ms</td>
+                            <td>${row.latency_saving_pct}%</td>
+                        </tr>
+                    `).join('')}
+                </tbody>
+            </table>
+        </div>
+    `;
+}
+
+function runCascadeAnalysis() {
+    fetch('/api/analytics/cascade', { method: 'POST' })
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) {
+                showToast(data.error, 'danger');
+            } else {
+                showToast('Cascade analysis started', 'info');
+                loadCascadeAnalysis();
+            }
+        })
+        .catch(error => {
+            showToast('Error starting cascade analysis: ' + error.message, 'danger');
+        });
 }
 
 function generateReport() {
@@ -193,14 +323,13 @@ function generateReport() {
     fetch('/api/analytics/generate_report')
         .then(response => response.json())
         .then(data => {
-            if (data.success) {
-                showToast('Report generated successfully!', 'success');
-                // Refresh comparison chart to show the new report
-                setTimeout(() => {
-                    loadComparisonChart();
-                }, 1000);
-            } else {
+            if (!data.success) {
                 showToast(data.error || 'Failed to generate report', 'danger');
+            } else if (data.status === 'current') {
+                reportReady();
+            } else {
+                // Rendering runs in the background; poll until the report is current
+                setTimeout(waitForReport, 2000);
             }
         })
         .catch(error => {
@@ -208,6 +337,34 @@ function generateReport() {
         });
 }
 
+function waitForReport() {
+    fetch('/api/analytics/plots')
+        .then(response => response.json())
+        .then(data => {
+            const report = (data.plots || {}).comprehensive_training_report;
+            if (!report) {
+                showToast('Failed to generate report', 'danger');
+            } else if (report.status === 'error') {
+                showToast('Failed to generate report: ' + report.error, 'danger');
+            } else if (report.status === 'current') {
+                reportReady();
+            } else {
+                setTimeout(waitForReport, 2000);
+            }
+        })
+        .catch(error => {
+            showToast('Error generating report: ' + error.message, 'danger');
+        });
+}
+
+function reportReady() {
+    showToast('Report generated successfully!', 'success');
+    // Reload the charts, which may have been re-rendered with the report
+    const version = Date.now();
+    loadComparisonChart(version);
+    loadIndividualCharts(version);
+}
+
 function downloadAllModels() {
     showToast('Preparing model downloads...', 'info');
     
@@ -336,6 +336,12 @@ function displayEnsembleResult(ensemble) {
                                     `<div>${cls}: ${votes} vote${votes !== 1 ? 's' : ''}</div>`
                                 ).join('')}
                             </div>
+                            ${ensemble.models_run ? `
+                                <div class="small text-muted mt-1">
+                                    ${ensemble.models_run.length} model${ensemble.models_run.length !== 1 ? 's' : ''} run
+                                    (${ensemble.ensemble_mode})
+                                </div>
+                            ` : ''}
                         </div>
                     </div>
                 </div>
@@ -5,6 +5,8 @@
 // Global state
 let selectedModels = new Set();
 let trainingInterval = null;
+let trainingEvents = null;
+let trainingState = null;
 let isTraining = false;
 
 // Initialize on page load
@@ -429,6 +431,39 @@ function startTraining() {
 }
 
 function startTrainingMonitoring() {
+    stopTrainingMonitoring();
+    
+    if (!window.EventSource) {
+        startTrainingPolling();
+        return;
+    }
+    
+    // Push-based progress: snapshot first, then per-epoch deltas
+    trainingEvents = new EventSource('/api/training_events');
+    trainingEvents.addEventListener('snapshot', event => {
+        trainingState = JSON.parse(event.data);
+        handleTrainingStatus(trainingState);
+    });
+    ['epoch', 'model_status', 'training_status'].forEach(type => {
+        trainingEvents.addEventListener(type, event => {
+            if (!trainingState) {
+                return;
+            }
+            applyTrainingEvent(trainingState, JSON.parse(event.data));
+            handleTrainingStatus(trainingState);
+        });
+    });
+    trainingEvents.onerror = () => {
+        // A stream that reaches its time limit reconnects by itself (CONNECTING);
+        // fall back to polling if the server refused it (e.g. too many open streams)
+        if (trainingEvents && trainingEvents.readyState === EventSource.CLOSED) {
+            trainingEvents = null;
+            startTrainingPolling();
+        }
+    };
+}
+
+function startTrainingPolling() {
     if (trainingInterval) {
         clearInterval(trainingInterval);
     }
@@ -436,33 +471,75 @@ function startTrainingMonitoring() {
     trainingInterval = setInterval(checkTrainingStatus, 2000); // Check every 2 seconds
 }
 
+function stopTrainingMonitoring() {
+    if (trainingEvents) {
+        trainingEvents.close();
+        trainingEvents = null;
+    }
+    if (trainingInterval) {
+        clearInterval(trainingInterval);
+        trainingInterval = null;
+    }
+}
+
+function isTrainingMonitored() {
+    return trainingEvents !== null || trainingInterval !== null;
+}
+
+function applyTrainingEvent(status, event) {
+    const { type, id, timestamp, ...fields } = event;
+    
+    if (type === 'training_status') {
+        Object.assign(status, fields);
+        return;
+    }
+    
+    status.progress = status.progress || {};
+    const progress = status.progress[event.model] = status.progress[event.model] || {};
+    
+    if (type === 'epoch') {
+        Object.assign(progress, {
+            status: 'training',
+            epochs: event.epoch,
+            accuracy: (event.val_accuracy || event.accuracy) * 100
+        });
+        status.current_model = event.model;
+    } else if (type === 'model_status') {
+        delete fields.model;
+        Object.assign(progress, fields);
+    }
+}
+
 function checkTrainingStatus() {
     fetch('/api/training_status')
         .then(response => response.json())
-        .then(data => {
-            updateTrainingDisplay(data);
-            
-            if (!data.is_training && trainingInterval) {
-                clearInterval(trainingInterval);
-                trainingInterval = null;
-                isTraining = false;
-                updateTrainingButton();
-                
-                if (data.error) {
-                    showToast('Training stopped with error: ' + data.error, 'danger');
-                } else {
-                    showToast('Training completed successfully!', 'success');
-                    setTimeout(() => {
-                        hideTrainingModal();
-                    }, 3000);
-                }
-            }
-        })
+        .then(handleTrainingStatus)
         .catch(error => {
             console.error('Error checking training status:', error);
         });
 }
 
+function handleTrainingStatus(data) {
+    updateTrainingDisplay(data);
+    
+    if (!data.is_training && isTrainingMonitored()) {
+        stopTrainingMonitoring();
+        isTraining = false;
+        updateTrainingButton();
+        
+        if (data.error) {
+            showToast('Training stopped with error: ' + data.error, 'danger');
+        } else if (data.cancelled) {
+            showToast('Training cancelled. Completed epochs are checkpointed and can be resumed.', 'warning');
+        } else {
+            showToast('Training completed successfully!', 'success');
+            setTimeout(() => {
+                hideTrainingModal();
+            }, 3000);
+        }
+    }
+}
+
 function updateTrainingDisplay(status) {
     const progressContainer = document.getElementById('trainingProgressContainer');
     const modalContent = document.getElementById('trainingModalContent');
@@ -498,12 +575,12 @@ function updateTrainingDisplay(status) {
                         ${progress.status === 'training' ? `
                             <div class="progress mb-2">
                                 <div class="progress-bar progress-bar-striped progress-bar-animated bg-${statusColor}" 
-                                     style="width: ${(progress.epochs / 15) * 100}%">
+                                     style="width: ${(progress.epochs / (progress.epochs_total || 15)) * 100}%">
                                 </div>
                             </div>
                             <div class="row">
                                 <div class="col-6">
-                                    <small><strong>Epoch:</strong> ${progress.epochs}/15</small>
+                                    <small><strong>Epoch:</strong> ${progress.epochs}/${progress.epochs_total || 15}</small>
                                 </div>
                                 <div class="col-6">
                                     <small><strong>Accuracy:</strong> ${progress.accuracy.toFixed(1)}%</small>
@@ -554,6 +631,7 @@ function getStatusIcon(status) {
         'pending': 'hourglass-split',
         'training': 'gear-wide-connected',
         'completed': 'check-circle-fill',
+        'cancelled': 'stop-circle-fill',
         'error': 'exclamation-triangle-fill'
     };
     return icons[status] || 'question-circle';
@@ -564,6 +642,7 @@ function getStatusColor(status) {
         'pending': 'secondary',
         'training': 'primary',
         'completed': 'success',
+        'cancelled': 'warning',
         'error': 'danger'
     };
     return colors[status] || 'secondary';
@@ -588,13 +667,11 @@ function stopTraining() {
     .then(response => response.json())
     .then(data => {
         showToast(data.message, 'warning');
-        if (trainingInterval) {
-            clearInterval(trainingInterval);
-            trainingInterval = null;
+        // Keep monitoring: the status flips to not training once the job has actually stopped
+        if (!isTrainingMonitored()) {
+            isTraining = false;
+            updateTrainingButton();
         }
-        isTraining = false;
-        updateTrainingButton();
-        hideTrainingModal();
     })
     .catch(error => {
         showToast('Error stopping training: ' + error.message, 'danger');
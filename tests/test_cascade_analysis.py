@@ -0,0 +1,67 @@
+"""Tests for the replay of the early-exit cascade on precomputed model outputs"""
+
+import numpy as np
+import pytest
+
+from utils.cascade_analysis import simulate_cascade
+
+ORDER = ['fast', 'slow']
+LATENCIES_MS = {'fast': 1.0, 'slow': 10.0}
+LABELS = np.array([0, 1, 1])
+PROBABILITIES = {
+    'fast': np.array([[0.95, 0.05], [0.6, 0.4], [0.2, 0.8]]),
+    'slow': np.array([[0.9, 0.1], [0.1, 0.9], [0.3, 0.7]])
+}
+
+
+def run(confidence_threshold, agreement_threshold=0):
+    return simulate_cascade(PROBABILITIES, LABELS, ORDER, LATENCIES_MS, confidence_threshold, agreement_threshold)
+
+
+def test_confident_images_exit_after_the_first_model():
+    result = run(90)
+
+    assert result['accuracy'] == 100.0
+    assert result['avg_models_run'] == pytest.approx(5 / 3, abs=1e-3)
+    assert result['avg_latency_ms'] == pytest.approx((1 + 11 + 11) / 3, abs=0.01)
+    assert result['exit_rate'] == {'fast': pytest.approx(1 / 3, abs=1e-4), 'slow': pytest.approx(2 / 3, abs=1e-4)}
+
+
+def test_low_threshold_trades_accuracy_for_latency():
+    result = run(50)
+
+    # The fast model alone gets the second image wrong
+    assert result['accuracy'] == pytest.approx(200 / 3, abs=0.01)
+    assert result['avg_models_run'] == 1.0
+    assert result['avg_latency_ms'] == 1.0
+    assert result['exit_rate'] == {'fast': 1.0, 'slow': 0.0}
+
+
+def test_unreachable_thresholds_run_the_full_ensemble():
+    result = run(np.inf, np.inf)
+
+    assert result['accuracy'] == 100.0
+    assert result['avg_models_run'] == 2.0
+    assert result['avg_latency_ms'] == 11.0
+    assert result['p95_latency_ms'] == 11.0
+    assert result['exit_rate'] == {'fast': 0.0, 'slow': 1.0}
+
+
+def test_agreement_threshold_keeps_disagreeing_images_running():
+    probabilities = {
+        'a': np.array([[0.45, 0.55]]),
+        'b': np.array([[1.0, 0.0]]),
+        'c': np.array([[0.9, 0.1]])
+    }
+    latencies = {'a': 1.0, 'b': 1.0, 'c': 1.0}
+    order = ['a', 'b', 'c']
+
+    # After two models the average is 72.5% confident, but only half of the models agree with it
+    strict = simulate_cascade(probabilities, np.array([0]), order, latencies, 70, 100)
+    tolerant = simulate_cascade(probabilities, np.array([0]), order, latencies, 70, 50)
+
+    assert strict['avg_models_run'] == 3.0
+    assert strict['exit_rate'] == {'a': 0.0, 'b': 0.0, 'c': 1.0}
+    assert tolerant['avg_models_run'] == 2.0
+    assert tolerant['exit_rate'] == {'a': 0.0, 'b': 1.0, 'c': 0.0}
+    assert strict['accuracy'] == tolerant['accuracy'] == 100.0
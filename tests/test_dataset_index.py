@@ -0,0 +1,137 @@
+"""Tests for the SQLite dataset index and its trigger-maintained class counts"""
+
+import os
+
+import pytest
+from PIL import Image
+
+from utils.dataset_index import DatasetIndex
+
+
+def write_image(path, color=(200, 30, 30), size=(32, 24)):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new('RGB', size, color).save(path, 'PNG')
+    return path
+
+
+def write_bytes(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data = tmp_path / 'data'
+    for i in range(3):
+        write_image(str(data / 'cats' / f'{i}.png'), color=(i * 40, 0, 0))
+    for i in range(2):
+        write_image(str(data / 'dogs' / f'{i}.png'), color=(0, i * 40, 0))
+    write_bytes(str(data / 'dogs' / 'broken.jpg'), b'not an image')
+    return str(data)
+
+
+@pytest.fixture
+def index(data_dir):
+    index = DatasetIndex(data_dir, max_workers=2)
+    index.rescan()
+    return index
+
+
+def test_rescan_counts_valid_and_invalid_images_per_class(index):
+    assert index.class_counts() == {'cats': 3, 'dogs': 2}
+    counts = index.class_counts(include_invalid=True)
+    assert (counts['dogs']['valid'], counts['dogs']['invalid']) == (2, 1)
+    assert index.totals()['valid'] == 5
+    assert index.totals()['invalid'] == 1
+    assert [row['path'] for row in index.invalid_files()] == ['dogs/broken.jpg']
+
+
+def test_insert_and_delete_triggers_keep_counts_and_bytes(index, data_dir):
+    path = write_image(os.path.join(data_dir, 'cats', 'new.png'))
+    index.add_files([path])
+
+    assert index.class_counts()['cats'] == 4
+    assert index.totals()['bytes'] == sum(row['size'] for row in index.files(valid_only=False))
+
+    index.remove_files([path])
+
+    assert index.class_counts()['cats'] == 3
+
+
+def test_update_trigger_moves_a_file_between_valid_and_invalid(index, data_dir):
+    path = os.path.join(data_dir, 'cats', '0.png')
+    write_bytes(path, b'corrupted')
+    index.add_files([path])
+
+    counts = index.class_counts(include_invalid=True)
+    assert (counts['cats']['valid'], counts['cats']['invalid']) == (2, 1)
+
+    write_image(path)
+    index.add_files([path])
+
+    counts = index.class_counts(include_invalid=True)
+    assert (counts['cats']['valid'], counts['cats']['invalid']) == (3, 0)
+
+
+def test_class_row_is_dropped_when_its_last_image_goes(index, data_dir):
+    paths = [os.path.join(data_dir, 'dogs', name) for name in ('0.png', '1.png', 'broken.jpg')]
+    index.remove_files(paths)
+
+    assert 'dogs' not in index.class_counts(include_invalid=True)
+
+
+def test_rescan_only_reads_changed_files(index, data_dir):
+    summary = index.rescan()
+    assert (summary['indexed'], summary['removed'], summary['unchanged']) == (0, 0, 6)
+
+    os.remove(os.path.join(data_dir, 'cats', '1.png'))
+    write_image(os.path.join(data_dir, 'cats', 'added.png'))
+    summary = index.rescan()
+
+    assert (summary['indexed'], summary['removed']) == (1, 1)
+    assert index.class_counts()['cats'] == 3
+
+
+def test_rescan_reindexes_files_edited_in_place(index, data_dir):
+    path = os.path.join(data_dir, 'cats', '2.png')
+    write_image(path, size=(64, 48))
+    os.utime(path, ns=(os.stat(path).st_atime_ns, os.stat(path).st_mtime_ns + 1_000_000))
+
+    summary = index.rescan()
+
+    assert summary['indexed'] == 1
+    assert index.class_counts() == {'cats': 3, 'dogs': 2}
+    row = next(row for row in index.files('cats') if row['path'] == 'cats/2.png')
+    assert (row['width'], row['height']) == (64, 48)
+
+
+def test_refresh_picks_up_new_files_and_vanished_classes(index, data_dir):
+    assert index.refresh() is None
+
+    write_image(os.path.join(data_dir, 'birds', '0.png'))
+    index.refresh()
+    assert index.class_counts()['birds'] == 1
+
+    for name in os.listdir(os.path.join(data_dir, 'dogs')):
+        os.remove(os.path.join(data_dir, 'dogs', name))
+    os.rmdir(os.path.join(data_dir, 'dogs'))
+    index.refresh()
+
+    assert index.class_counts() == {'birds': 1, 'cats': 3}
+
+
+def test_find_duplicate_matches_stored_or_original_hash(index):
+    row = index.files('cats')[0]
+
+    assert index.find_duplicate([row['content_hash']]) == row['path']
+    assert index.find_duplicate(['0' * 40, None]) is None
+    assert index.find_duplicate([]) is None
+
+
+def test_index_persists_across_instances(index, data_dir):
+    reopened = DatasetIndex(data_dir)
+
+    assert reopened.class_counts() == {'cats': 3, 'dogs': 2}
+    assert reopened.rescan()['indexed'] == 0
@@ -0,0 +1,100 @@
+"""Tests for the NumPy evaluation metrics computed from cached model outputs"""
+
+import numpy as np
+import pytest
+
+from utils.evaluation import calibration, confusion_matrix, per_class_report, subset_ensembles, top_k_accuracy
+
+
+def test_confusion_matrix_counts_true_rows_and_predicted_columns():
+    labels = np.array([0, 0, 1, 1, 2, 2])
+    predicted = np.array([0, 1, 1, 1, 0, 2])
+
+    matrix = confusion_matrix(labels, predicted, 3)
+
+    assert matrix.tolist() == [[1, 1, 0], [0, 2, 0], [1, 0, 1]]
+    assert matrix.sum() == len(labels)
+
+
+def test_confusion_matrix_keeps_classes_without_images():
+    matrix = confusion_matrix(np.array([0, 0]), np.array([0, 0]), 3)
+
+    assert matrix.shape == (3, 3)
+    assert matrix.tolist() == [[2, 0, 0], [0, 0, 0], [0, 0, 0]]
+
+
+def test_per_class_report_handles_a_class_never_predicted():
+    matrix = np.array([[2, 0], [1, 0]])
+
+    report, macro_f1 = per_class_report(matrix, ['cats', 'dogs'])
+
+    assert report['cats'] == {'precision': pytest.approx(0.6667), 'recall': 1.0, 'f1': 0.8, 'support': 2}
+    assert report['dogs'] == {'precision': 0.0, 'recall': 0.0, 'f1': 0.0, 'support': 1}
+    assert macro_f1 == 0.4
+
+
+def test_top_k_accuracy_uses_the_rank_of_the_true_class():
+    probabilities = np.array([
+        [0.7, 0.2, 0.1],   # true class ranked 1st
+        [0.5, 0.3, 0.2],   # true class 1 ranked 2nd
+        [0.6, 0.3, 0.1],   # true class 2 ranked 3rd
+        [0.1, 0.1, 0.8]    # true class ranked 1st
+    ])
+    labels = np.array([0, 1, 2, 2])
+
+    assert top_k_accuracy(probabilities, labels, (1, 2, 3)) == {'1': 50.0, '2': 75.0, '3': 100.0}
+
+
+def test_top_k_accuracy_skips_k_larger_than_the_number_of_classes():
+    probabilities = np.array([[0.9, 0.1], [0.4, 0.6]])
+
+    assert top_k_accuracy(probabilities, np.array([0, 0]), (1, 3, 5)) == {'1': 50.0}
+
+
+def test_calibration_of_perfectly_calibrated_outputs():
+    # Confidence 0.75 and three out of four correct
+    probabilities = np.array([[0.75, 0.25]] * 4)
+    labels = np.array([0, 0, 0, 1])
+
+    report = calibration(probabilities, labels, bins=10)
+
+    assert report['ece'] == 0.0
+    assert report['mce'] == 0.0
+    assert report['bins'] == [{'upper': 0.8, 'count': 4, 'confidence': 0.75, 'accuracy': 0.75}]
+    assert report['nll'] == pytest.approx(-(3 * np.log(0.75) + np.log(0.25)) / 4, abs=1e-4)
+    assert report['brier'] == pytest.approx((3 * 0.125 + 1.125) / 4, abs=1e-4)
+
+
+def test_calibration_error_of_overconfident_outputs():
+    probabilities = np.array([[1.0, 0.0], [1.0, 0.0], [0.6, 0.4], [0.6, 0.4]])
+    labels = np.array([0, 1, 0, 0])
+
+    report = calibration(probabilities, labels, bins=5)
+
+    # Confidence 1.0 lands in the last bin with 50% accuracy; the 0.6 bin is underconfident by 0.4
+    assert report['ece'] == pytest.approx((2 * 0.5 + 2 * 0.4) / 4)
+    assert report['mce'] == 0.5
+    assert [b['count'] for b in report['bins']] == [2, 2]
+
+
+def test_subset_ensembles_average_every_combination():
+    stacked = np.array([
+        [[1.0, 0.0]],
+        [[0.0, 1.0]],
+        [[0.5, 0.5]]
+    ])
+
+    subsets, averaged = subset_ensembles(stacked, ['a', 'b', 'c'])
+
+    assert subsets == [['a', 'b'], ['a', 'c'], ['b', 'c'], ['a', 'b', 'c']]
+    assert averaged.shape == (4, 1, 2)
+    np.testing.assert_allclose(averaged[:, 0], [[0.5, 0.5], [0.75, 0.25], [0.25, 0.75], [0.5, 0.5]])
+
+
+def test_subset_ensembles_without_enough_models():
+    stacked = np.ones((1, 3, 2))
+
+    subsets, averaged = subset_ensembles(stacked, ['a'])
+
+    assert subsets == []
+    assert averaged.shape == (0, 3, 2)
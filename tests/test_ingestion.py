@@ -0,0 +1,111 @@
+"""Tests for perceptual hashing and de-duplication during bulk ingestion"""
+
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.dataset_index import DatasetIndex, dhash, hamming_distances
+from utils.ingestion import IngestionPipeline
+
+
+def noise_image(seed, size=(96, 64)):
+    pixels = np.random.RandomState(seed).randint(0, 256, (size[1], size[0], 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+def encode(image, image_format='PNG', **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def test_dhash_is_stable_and_fits_sqlite_integers():
+    image = noise_image(0)
+
+    value = dhash(image)
+
+    assert value == dhash(image.copy())
+    assert -(1 << 63) <= value < (1 << 63)
+
+
+def test_dhash_survives_resizing_and_recompression():
+    image = noise_image(1)
+    resized = image.resize((48, 32), Image.BILINEAR)
+    recompressed = Image.open(io.BytesIO(encode(image, 'JPEG', quality=70)))
+
+    distances = hamming_distances(dhash(image), [dhash(resized), dhash(recompressed), dhash(noise_image(2))])
+
+    assert distances[0] <= 6
+    assert distances[1] <= 6
+    # Unrelated images differ in about half of the 64 bits
+    assert distances[2] > 16
+
+
+def test_hamming_distances_count_differing_bits():
+    assert hamming_distances(0b1011, [0b1011, 0b0011, 0, -1]).tolist() == [0, 1, 3, 61]
+
+
+@pytest.fixture
+def index(tmp_path):
+    return DatasetIndex(str(tmp_path / 'data'))
+
+
+def ingest(index, items, dedup):
+    pipeline = IngestionPipeline(index.data_dir, index, workers=2, dedup=dedup, pre_resize=False)
+    results = []
+    summary = pipeline.run(items, result_callback=results.append)
+    # Workers finish out of order, so report the statuses in input order
+    statuses = {result['source']: result['status'] for result in results}
+    return [statuses[name] for name, _, _ in items], summary
+
+
+def test_exact_and_near_duplicates_are_rejected(index):
+    original = noise_image(3)
+    items = [
+        ('cats/a.png', 'cats', encode(original)),
+        ('cats/a_copy.png', 'cats', encode(original)),
+        ('cats/a_small.jpg', 'cats', encode(original.resize((48, 32)), 'JPEG', quality=90)),
+        ('cats/b.png', 'cats', encode(noise_image(4)))
+    ]
+
+    statuses, summary = ingest(index, items, 'perceptual')
+
+    assert statuses == ['accepted', 'duplicate', 'near_duplicate', 'accepted']
+    assert (summary['accepted'], summary['duplicates'], summary['near_duplicates']) == (2, 1, 1)
+    assert index.class_counts() == {'cats': 2}
+
+
+def test_exact_mode_keeps_near_duplicates(index):
+    original = noise_image(5)
+    items = [
+        ('dogs/a.png', 'dogs', encode(original)),
+        ('dogs/a_small.jpg', 'dogs', encode(original.resize((48, 32)), 'JPEG', quality=90))
+    ]
+
+    statuses, _ = ingest(index, items, 'exact')
+
+    assert statuses == ['accepted', 'accepted']
+
+
+def test_near_duplicates_of_already_indexed_images_are_rejected(index):
+    original = noise_image(6)
+    ingest(index, [('cats/a.png', 'cats', encode(original))], 'perceptual')
+
+    statuses, _ = ingest(index, [('cats/again.jpg', 'cats', encode(original, 'JPEG', quality=80))], 'perceptual')
+
+    assert statuses == ['near_duplicate']
+
+
+def test_invalid_and_unclassified_files_get_their_own_status(index):
+    items = [
+        ('cats/broken.png', 'cats', b'not an image'),
+        ('loose.png', '', encode(noise_image(7))),
+        ('cats/notes.txt', 'cats', b'text')
+    ]
+
+    statuses, _ = ingest(index, items, 'perceptual')
+
+    assert statuses == ['invalid', 'skipped', 'skipped']
+    assert index.class_counts() == {}
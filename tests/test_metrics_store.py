@@ -0,0 +1,116 @@
+"""Tests for the append-only SQLite training metrics store"""
+
+import json
+
+import pytest
+
+from utils.metrics_store import MetricsStore
+
+
+def logs(accuracy, val_accuracy=None):
+    epoch_logs = {'accuracy': accuracy, 'loss': 1 - accuracy, 'images_per_sec': 100.0}
+    if val_accuracy is not None:
+        epoch_logs.update({'val_accuracy': val_accuracy, 'val_loss': 1 - val_accuracy})
+    return epoch_logs
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MetricsStore(str(tmp_path))
+
+
+def test_tail_returns_only_rows_after_the_cursor(store):
+    run_id = store.start_run('mobilenet')
+    store.append_epoch(run_id, 'mobilenet', 1, logs(0.5, 0.4))
+    cursor = store.last_id()
+    store.append_epoch(run_id, 'mobilenet', 2, logs(0.6, 0.5))
+    store.append_epoch(run_id, 'mobilenet', 3, logs(0.7, 0.6))
+
+    rows = store.tail(cursor)
+
+    assert [row['epoch'] for row in rows] == [2, 3]
+    assert rows[0]['id'] > cursor
+    assert store.tail(store.last_id()) == []
+
+
+def test_tail_filters_by_model_and_run(store):
+    mobilenet_run = store.start_run('mobilenet')
+    resnet_run = store.start_run('resnet')
+    store.append_epoch(mobilenet_run, 'mobilenet', 1, logs(0.5))
+    store.append_epoch(resnet_run, 'resnet', 1, logs(0.6))
+
+    assert [row['model_type'] for row in store.tail(0, model_types=['resnet'])] == ['resnet']
+    assert [row['run_id'] for row in store.tail(0, run_id=mobilenet_run)] == [mobilenet_run]
+    assert store.tail(0, model_types=[]) == []
+
+
+def test_tail_respects_the_limit(store):
+    run_id = store.start_run('mobilenet')
+    for epoch in range(1, 6):
+        store.append_epoch(run_id, 'mobilenet', epoch, logs(0.1 * epoch))
+
+    assert [row['epoch'] for row in store.tail(0, limit=2)] == [1, 2]
+
+
+def test_resume_continues_the_latest_run_and_drops_later_epochs(store):
+    run_id = store.start_run('mobilenet')
+    for epoch in range(1, 4):
+        store.append_epoch(run_id, 'mobilenet', epoch, logs(0.1 * epoch, 0.1 * epoch))
+
+    # Checkpointed after epoch 2; epoch 3 was cut short
+    resumed = store.start_run('mobilenet', resume_epoch=2)
+    store.append_epoch(resumed, 'mobilenet', 3, logs(0.9, 0.8))
+
+    assert resumed == run_id
+    progress = store.progress('mobilenet')
+    assert progress['epochs'] == [1, 2, 3]
+    assert progress['accuracy'] == pytest.approx([0.1, 0.2, 0.9])
+
+
+def test_new_run_starts_an_empty_history(store):
+    first = store.start_run('mobilenet')
+    store.append_epoch(first, 'mobilenet', 1, logs(0.5))
+
+    second = store.start_run('mobilenet')
+
+    assert second != first
+    assert store.latest_run('mobilenet') == second
+    assert store.progress('mobilenet')['epochs'] == []
+    assert store.progress('resnet') is None
+
+
+def test_history_leaves_out_metrics_the_run_did_not_log(store):
+    run_id = store.start_run('mobilenet')
+    store.append_epoch(run_id, 'mobilenet', 1, logs(0.5))
+    store.append_epoch(run_id, 'mobilenet', 2, logs(0.7))
+
+    history = store.history(run_id)
+
+    assert set(history) == {'accuracy', 'loss', 'images_per_sec'}
+    assert history['accuracy'] == pytest.approx([0.5, 0.7])
+    # The progress export keeps its old layout, with 0 for unlogged metrics
+    assert store.progress('mobilenet')['val_accuracy'] == [0.0, 0.0]
+
+
+def test_export_progress_writes_the_progress_json(store, tmp_path):
+    run_id = store.start_run('mobilenet')
+    store.append_epoch(run_id, 'mobilenet', 1, logs(0.5, 0.4))
+
+    path = store.export_progress('mobilenet')
+
+    with open(path) as f:
+        exported = json.load(f)
+    assert path == str(tmp_path / 'mobilenet_progress.json')
+    assert exported['epochs'] == [1]
+    assert exported['val_accuracy'] == pytest.approx([0.4])
+    assert store.export_progress('resnet') is None
+
+
+def test_stores_share_one_database_file(store, tmp_path):
+    run_id = store.start_run('mobilenet')
+    store.append_epoch(run_id, 'mobilenet', 1, logs(0.5))
+
+    # A training worker process opens its own store on the same folder
+    reader = MetricsStore(str(tmp_path))
+
+    assert [row['epoch'] for row in reader.tail(0)] == [1]
@@ -0,0 +1,142 @@
+"""Tests for the content-addressed prediction result cache"""
+
+import pytest
+
+from utils import prediction_cache
+from utils.prediction_cache import PredictionCache, content_hash
+from utils.prediction_types import EnsemblePrediction, ModelPrediction
+
+VERSIONS = {'mobilenet': 'keras:1:100', 'resnet': 'keras:1:200'}
+
+
+def results(predicted_class='cats'):
+    individual = [
+        ModelPrediction(model_name=model_type, model_display_name=model_type, predicted_class=predicted_class,
+                        confidence=90.0, all_probabilities={'cats': 90.0, 'dogs': 10.0}, prediction_time=0.01)
+        for model_type in VERSIONS
+    ]
+    ensemble = EnsemblePrediction(predicted_class=predicted_class, confidence=90.0, model_agreement=100.0,
+                                  models_run=list(VERSIONS))
+    return individual, ensemble
+
+
+class Clock:
+    """Stand-in for time.time that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(prediction_cache.time, 'time', clock)
+    return clock
+
+
+def test_content_hash_depends_on_bytes_and_variant():
+    assert content_hash(b'image') == content_hash(b'image')
+    assert content_hash(b'image') != content_hash(b'other')
+    assert content_hash(b'image', 'student') == f"{content_hash(b'image')}:student"
+
+
+def test_hit_returns_the_stored_results():
+    cache = PredictionCache(max_entries=10)
+    individual, ensemble = results()
+    cache.put('key', VERSIONS, individual, ensemble)
+
+    cached = cache.get('key', dict(VERSIONS))
+
+    assert cached == (individual, ensemble)
+    assert cache.summary()['hits'] == 1
+
+
+def test_retrained_model_invalidates_the_entry():
+    cache = PredictionCache(max_entries=10)
+    cache.put('key', VERSIONS, *results())
+
+    assert cache.get('key', {**VERSIONS, 'resnet': 'keras:2:200'}) is None
+    # The stale entry is dropped, not kept for the old version
+    assert cache.get('key', VERSIONS) is None
+    summary = cache.summary()
+    assert summary['stale'] == 1
+    assert summary['entries'] == 0
+
+
+def test_added_model_invalidates_the_entry():
+    cache = PredictionCache(max_entries=10)
+    cache.put('key', VERSIONS, *results())
+
+    assert cache.get('key', {**VERSIONS, 'efficientnet': 'keras:1:300'}) is None
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = PredictionCache(max_entries=10, ttl_sec=60)
+    cache.put('key', VERSIONS, *results())
+
+    clock.now += 59
+    assert cache.get('key', VERSIONS) is not None
+    clock.now += 2
+    assert cache.get('key', VERSIONS) is None
+    assert cache.summary()['expired'] == 1
+
+
+def test_ttl_of_zero_never_expires(clock):
+    cache = PredictionCache(max_entries=10, ttl_sec=0)
+    cache.put('key', VERSIONS, *results())
+
+    clock.now += 10 ** 9
+
+    assert cache.get('key', VERSIONS) is not None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = PredictionCache(max_entries=2)
+    cache.put('a', VERSIONS, *results())
+    cache.put('b', VERSIONS, *results())
+    cache.get('a', VERSIONS)
+    cache.put('c', VERSIONS, *results())
+
+    assert cache.get('b', VERSIONS) is None
+    assert cache.get('a', VERSIONS) is not None
+    assert cache.get('c', VERSIONS) is not None
+    assert cache.summary()['evictions'] == 1
+
+
+def test_results_without_versions_are_not_stored():
+    cache = PredictionCache(max_entries=10)
+    cache.put('key', {}, *results())
+
+    assert cache.summary()['stores'] == 0
+
+
+def test_persistent_cache_survives_a_restart(tmp_path, clock):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = PredictionCache(max_entries=10, ttl_sec=60, persist_path=path)
+    cache.put('fresh', VERSIONS, *results('dogs'))
+    clock.now -= 120
+    cache.put('old', VERSIONS, *results())
+    clock.now += 120
+
+    restarted = PredictionCache(max_entries=10, ttl_sec=60, persist_path=path)
+
+    # Expired rows are pruned when the cache is restored
+    assert restarted.summary()['entries'] == 1
+    assert restarted.get('old', VERSIONS) is None
+    individual, ensemble = restarted.get('fresh', VERSIONS)
+    assert ensemble.predicted_class == 'dogs'
+    assert [result.model_name for result in individual] == list(VERSIONS)
+
+
+def test_clear_empties_memory_and_disk(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    cache = PredictionCache(max_entries=10, persist_path=path)
+    cache.put('key', VERSIONS, *results())
+
+    cache.clear()
+
+    assert cache.get('key', VERSIONS) is None
+    assert PredictionCache(max_entries=10, persist_path=path).summary()['entries'] == 0
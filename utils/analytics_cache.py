@@ -0,0 +1,316 @@
+"""
+Cached analytics and background plot rendering
+Parsed metrics files and the values derived from them (comparison table,
+rankings) are rebuilt only when a source file's mtime or size changes. Plots
+are drawn by one background thread, and only plots whose source metrics
+changed since they were last drawn are re-rendered.
+"""
+
+import os
+import json
+import glob
+import time
+import queue
+import threading
+from datetime import datetime
+
+METRICS_SUFFIX = '_metrics.json'
+PLOT_MANIFEST = 'plots_manifest.json'
+COMPARISON_PLOT = 'model_comparison'
+REPORT_PLOT = 'comprehensive_training_report'
+HISTORY_PLOT_SUFFIX = '_training_history'
+
+
+def file_version(path):
+    """Version tag of a file from its mtime and size, or None if it does not exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def metrics_path(metrics_dir, model_type):
+    return os.path.join(metrics_dir, f"{model_type}{METRICS_SUFFIX}")
+
+
+def plot_path(metrics_dir, plot_name):
+    return os.path.join(metrics_dir, f"{plot_name}.png")
+
+
+def trained_metrics_models(metrics_dir):
+    """Models with a metrics file, in name order"""
+    return sorted(os.path.basename(path)[:-len(METRICS_SUFFIX)]
+                  for path in glob.glob(os.path.join(metrics_dir, f"*{METRICS_SUFFIX}")))
+
+
+class AnalyticsCache:
+    """
+    Parsed JSON files and values derived from them, keyed on the versions of
+    their source files. A value is rebuilt on the first read after any of its
+    sources changes.
+    """
+
+    def __init__(self):
+        self._files = {}
+        self._derived = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def read_json(self, path):
+        """Parsed contents of a JSON file (re-read only when it changed), or None if missing"""
+        version = file_version(path)
+        if version is None:
+            return None
+        with self._lock:
+            cached = self._files.get(path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        with open(path, 'r') as f:
+            data = json.load(f)
+        with self._lock:
+            self._files[path] = (version, data)
+        return data
+
+    def derived(self, name, paths, build):
+        """build() cached until one of the source paths changes, appears or disappears"""
+        versions = tuple(file_version(path) for path in paths)
+        with self._lock:
+            cached = self._derived.get(name)
+            if cached is not None and cached[0] == versions:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        value = build()
+        with self._lock:
+            self._derived[name] = (versions, value)
+        return value
+
+    def summary(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'files': len(self._files),
+                    'derived': len(self._derived)}
+
+
+def _pyplot():
+    """Non-interactive matplotlib, imported on first render so startup does not pay for it"""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _save_figure(figure, path):
+    """Write a PNG atomically so the plot route never serves a half-written file"""
+    tmp_path = f"{path}.tmp"
+    figure.savefig(tmp_path, format='png', dpi=100, bbox_inches='tight')
+    os.replace(tmp_path, path)
+
+
+def render_training_history(metrics, path):
+    """Accuracy and loss curves of one model's training run"""
+    plt = _pyplot()
+    history = metrics.get('history', {})
+    figure, (accuracy_axis, loss_axis) = plt.subplots(1, 2, figsize=(12, 4.5))
+    try:
+        for axis, key, title in ((accuracy_axis, 'accuracy', 'Accuracy'), (loss_axis, 'loss', 'Loss')):
+            for series, label in ((key, 'train'), (f'val_{key}', 'validation')):
+                values = history.get(series) or []
+                if values:
+                    axis.plot(range(1, len(values) + 1), values, marker='o', markersize=3, label=label)
+            axis.set_title(f"{metrics.get('model_name', metrics.get('model_type', ''))} {title}")
+            axis.set_xlabel('Epoch')
+            axis.grid(alpha=0.3)
+            axis.legend()
+        _save_figure(figure, path)
+    finally:
+        plt.close(figure)
+
+
+def render_model_comparison(all_metrics, path):
+    """Best validation accuracy and training time of every trained model side by side"""
+    plt = _pyplot()
+    names = [metrics.get('model_name', model_type) for model_type, metrics in all_metrics.items()]
+    accuracies = [metrics.get('summary', {}).get('best_val_accuracy', 0) * 100 for metrics in all_metrics.values()]
+    minutes = [metrics.get('training_time', 0) / 60 for metrics in all_metrics.values()]
+
+    figure, (accuracy_axis, time_axis) = plt.subplots(1, 2, figsize=(12, 4.5))
+    try:
+        accuracy_axis.bar(names, accuracies, color='tab:green')
+        accuracy_axis.set_title('Best Validation Accuracy (%)')
+        accuracy_axis.set_ylim(0, 100)
+        time_axis.bar(names, minutes, color='tab:blue')
+        time_axis.set_title('Training Time (min)')
+        for axis in (accuracy_axis, time_axis):
+            axis.tick_params(axis='x', rotation=20)
+            axis.grid(axis='y', alpha=0.3)
+        _save_figure(figure, path)
+    finally:
+        plt.close(figure)
+
+
+class PlotRenderer:
+    """
+    Background job queue for analytics plots. Each plot depends on a set of
+    metrics files; plots_manifest.json records the versions each plot was last
+    drawn from, so refresh() queues only plots whose sources changed. One
+    worker thread renders them in turn (pyplot is not thread-safe).
+    """
+
+    def __init__(self, metrics_dir='metrics', cache=None, report_builder=None):
+        self.metrics_dir = metrics_dir
+        self.cache = cache or AnalyticsCache()
+        # Renders the comprehensive report; it has no renderer of its own here
+        self.report_builder = report_builder
+        self.manifest_path = os.path.join(metrics_dir, PLOT_MANIFEST)
+        self._manifest = self._load_manifest()
+        self._jobs = queue.Queue()
+        self._queued = set()
+        self._running = None
+        self._errors = {}
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self):
+        """Caller holds self._lock"""
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def plots(self):
+        """{plot name: metrics files it is drawn from} for the models trained so far"""
+        model_types = trained_metrics_models(self.metrics_dir)
+        if not model_types:
+            return {}
+        all_sources = [metrics_path(self.metrics_dir, model_type) for model_type in model_types]
+        plots = {f"{model_type}{HISTORY_PLOT_SUFFIX}": [metrics_path(self.metrics_dir, model_type)]
+                 for model_type in model_types}
+        plots[COMPARISON_PLOT] = all_sources
+        if self.report_builder is not None:
+            plots[REPORT_PLOT] = all_sources
+        return plots
+
+    def _source_versions(self, sources):
+        return {os.path.basename(path): file_version(path) for path in sources}
+
+    def is_stale(self, plot_name, sources):
+        """Whether the plot is missing or was drawn from other versions of its sources"""
+        if not os.path.exists(plot_path(self.metrics_dir, plot_name)):
+            return True
+        with self._lock:
+            recorded = self._manifest.get(plot_name, {}).get('sources')
+        return recorded != self._source_versions(sources)
+
+    def refresh(self, plot_names=None, force=False):
+        """Queue the stale plots (or every named plot with force); returns the names queued"""
+        plots = self.plots()
+        names = [name for name in (plot_names or plots) if name in plots]
+        stale = [name for name in names if force or self.is_stale(name, plots[name])]
+
+        queued = []
+        with self._lock:
+            for name in stale:
+                # A plot that failed is retried once its sources change, not on every refresh
+                failed_versions = self._errors.get(name, {}).get('sources')
+                if name in self._queued or (not force and failed_versions == self._source_versions(plots[name])):
+                    continue
+                self._queued.add(name)
+                self._jobs.put(name)
+                queued.append(name)
+            if queued and self._worker is None:
+                self._worker = threading.Thread(target=self._work, name='plot-renderer', daemon=True)
+                self._worker.start()
+        if queued:
+            print(f"🎨 Queued plot rendering: {', '.join(queued)}")
+        return queued
+
+    def _render(self, plot_name, sources):
+        path = plot_path(self.metrics_dir, plot_name)
+        if plot_name == REPORT_PLOT:
+            report_path = self.report_builder()
+            if not report_path or not os.path.exists(report_path):
+                raise RuntimeError('The report builder did not produce a report')
+        elif plot_name == COMPARISON_PLOT:
+            all_metrics = {}
+            for source in sources:
+                metrics = self.cache.read_json(source)
+                if metrics is not None:
+                    all_metrics[os.path.basename(source)[:-len(METRICS_SUFFIX)]] = metrics
+            render_model_comparison(all_metrics, path)
+        else:
+            render_training_history(self.cache.read_json(sources[0]), path)
+
+    def _work(self):
+        """Render queued plots until the queue is empty"""
+        while True:
+            try:
+                plot_name = self._jobs.get(timeout=1.0)
+            except queue.Empty:
+                with self._lock:
+                    # refresh() queues under the same lock, so no job is left without a worker
+                    if self._jobs.empty():
+                        self._worker = None
+                        return
+                continue
+
+            with self._lock:
+                self._queued.discard(plot_name)
+                self._running = plot_name
+            sources = self.plots().get(plot_name)
+            versions = None
+            try:
+                if sources is None:
+                    continue
+                # Versions are taken before rendering: a change during the render re-queues the plot next time
+                versions = self._source_versions(sources)
+                start = time.perf_counter()
+                self._render(plot_name, sources)
+                seconds = round(time.perf_counter() - start, 2)
+                with self._lock:
+                    self._errors.pop(plot_name, None)
+                    self._manifest[plot_name] = {
+                        'sources': versions,
+                        'rendered_at': datetime.now().isoformat(),
+                        'render_seconds': seconds
+                    }
+                    self._save_manifest()
+                print(f"🎨 Rendered {plot_name} in {seconds}s")
+            except Exception as e:
+                print(f"⚠️ Plot rendering failed for {plot_name}: {e}")
+                with self._lock:
+                    self._errors[plot_name] = {'error': str(e), 'sources': versions}
+            finally:
+                with self._lock:
+                    self._running = None
+
+    def status(self):
+        """Per-plot state: current, stale, queued, rendering or error"""
+        plots = self.plots()
+        stale = {name for name, sources in plots.items() if self.is_stale(name, sources)}
+        with self._lock:
+            result = {}
+            for name in plots:
+                if name == self._running:
+                    state = 'rendering'
+                elif name in self._queued:
+                    state = 'queued'
+                elif name in self._errors:
+                    state = 'error'
+                else:
+                    state = 'stale' if name in stale else 'current'
+                entry = {'status': state, **{k: v for k, v in self._manifest.get(name, {}).items() if k != 'sources'}}
+                if name in self._errors:
+                    entry['error'] = self._errors[name]['error']
+                result[name] = entry
+            return result
@@ -0,0 +1,260 @@
+"""
+Bulk prediction utilities
+Streams images from a directory, zip or tar archive (or pre-resized dataset
+shards) through a batched, prefetching tf.data pipeline and writes per-image results incrementally as JSONL or CSV
+"""
+
+import os
+import csv
+import json
+import time
+import tarfile
+import zipfile
+from collections import deque
+
+import tensorflow as tf
+
+from utils.inference_utils import IMG_SIZE, format_model_prediction, format_ensemble_prediction, result_complete
+from utils.dataset_shards import is_shard_source, build_prediction_dataset_from_shards
+from utils.prediction_cache import content_hash
+# Defined in the TensorFlow-free dataset index; re-exported for existing imports
+from utils.dataset_index import IMAGE_EXTENSIONS, is_image_file
+
+
+def iter_directory_images(directory):
+    """Yield (relative_path, bytes) for every image below a directory"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for filename in sorted(files):
+            if not is_image_file(filename):
+                continue
+            file_path = os.path.join(root, filename)
+            with open(file_path, 'rb') as f:
+                yield os.path.relpath(file_path, directory), f.read()
+
+
+def iter_zip_images(archive_path):
+    """Yield (member_name, bytes) for every image in a zip archive"""
+    with zipfile.ZipFile(archive_path) as zf:
+        for info in zf.infolist():
+            if info.is_dir() or not is_image_file(info.filename):
+                continue
+            yield info.filename, zf.read(info)
+
+
+def iter_tar_images(archive_path):
+    """Yield (member_name, bytes) for every image in a (possibly compressed) tar archive"""
+    with tarfile.open(archive_path, 'r:*') as tf_archive:
+        for member in tf_archive:
+            if not member.isfile() or not is_image_file(member.name):
+                continue
+            file_obj = tf_archive.extractfile(member)
+            if file_obj is not None:
+                yield member.name, file_obj.read()
+
+
+def iter_source_images(source):
+    """Pick the right reader for a directory, zip or tar source"""
+    if os.path.isdir(source):
+        return iter_directory_images(source)
+    if zipfile.is_zipfile(source):
+        return iter_zip_images(source)
+    if tarfile.is_tarfile(source):
+        return iter_tar_images(source)
+    raise ValueError(f'Unsupported batch source: {source}. Use a directory, zip or tar archive.')
+
+
+def decode_image_tensor(image_bytes, target_size=IMG_SIZE):
+    """Graph-mode decode matching decode_image_bytes: RGB, nearest resize, scaled to [0, 1]"""
+    image = tf.io.decode_image(image_bytes, channels=3, expand_animations=False)
+    image = tf.image.resize(image, target_size, method='nearest')
+    return tf.cast(image, tf.float32) / 255.0
+
+
+def build_prediction_dataset(image_iter, batch_size=32, target_size=IMG_SIZE):
+    """
+    Build a (sequence numbers, names, images, cached flags) dataset from a
+    (sequence number, name, bytes, cached) iterator. Cached images are not
+    decoded; images that fail to decode are dropped, and the caller detects
+    them by the gap in sequence numbers.
+    """
+    dataset = tf.data.Dataset.from_generator(
+        lambda: image_iter,
+        output_signature=(
+            tf.TensorSpec(shape=(), dtype=tf.int64),
+            tf.TensorSpec(shape=(), dtype=tf.string),
+            tf.TensorSpec(shape=(), dtype=tf.string),
+            tf.TensorSpec(shape=(), dtype=tf.bool)
+        )
+    )
+
+    def decode(sequence, name, data, cached):
+        image = tf.cond(cached,
+                        lambda: tf.zeros((*target_size, 3), tf.float32),
+                        lambda: decode_image_tensor(data, target_size))
+        return sequence, name, image, cached
+
+    dataset = dataset.map(decode, num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+    dataset = dataset.ignore_errors()
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+class JsonlResultWriter:
+    """Append one JSON object per image"""
+
+    def __init__(self, output_path):
+        self.file = open(output_path, 'w')
+
+    def write(self, row):
+        self.file.write(json.dumps(row) + '\n')
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class CsvResultWriter:
+    """Append one flattened CSV row per image"""
+
+    def __init__(self, output_path, model_types):
+        self.file = open(output_path, 'w', newline='')
+        self.fieldnames = ['filename', 'status', 'error',
+                           'ensemble_predicted_class', 'ensemble_confidence', 'model_agreement', 'models_run']
+        for model_type in model_types:
+            self.fieldnames += [f'{model_type}_predicted_class', f'{model_type}_confidence',
+                                f'{model_type}_prediction_time']
+        self.writer = csv.DictWriter(self.file, fieldnames=self.fieldnames, extrasaction='ignore')
+        self.writer.writeheader()
+
+    def write(self, row):
+        flat = {'filename': row['filename'], 'status': row['status'], 'error': row.get('error', '')}
+
+        ensemble = row.get('ensemble_result') or {}
+        flat['ensemble_predicted_class'] = ensemble.get('predicted_class', '')
+        flat['ensemble_confidence'] = ensemble.get('confidence', '')
+        flat['model_agreement'] = ensemble.get('model_agreement', '')
+        flat['models_run'] = '+'.join(ensemble.get('models_run', []))
+
+        for result in row.get('individual_results', []):
+            model_type = result['model_name']
+            flat[f'{model_type}_predicted_class'] = result['predicted_class']
+            flat[f'{model_type}_confidence'] = result['confidence']
+            flat[f'{model_type}_prediction_time'] = result['prediction_time']
+
+        self.writer.writerow(flat)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def create_result_writer(output_path, output_format, model_types):
+    """Create the incremental writer for the requested output format"""
+    if output_format == 'csv':
+        return CsvResultWriter(output_path, model_types)
+    if output_format == 'jsonl':
+        return JsonlResultWriter(output_path)
+    raise ValueError(f'Unsupported output format: {output_format}')
+
+
+def run_batch_prediction(engine, source, output_path, output_format='jsonl',
+                         batch_size=32, progress_callback=None, cache=None):
+    """
+    Score every image in a directory, archive or shard folder with all loaded models.
+    Results are written as they are produced, so memory stays bounded by
+    the batch size and prefetch depth regardless of input size. With a
+    PredictionCache, images already scored by the current model versions
+    skip decoding and inference.
+    """
+    loading_status = engine.load_all_models()
+    loaded_models = [model for model, status in loading_status.items() if status == 'loaded']
+    if not loaded_models:
+        raise ValueError('No trained models available. Please train models first.')
+
+    model_versions = engine.model_versions() if cache is not None else None
+    cache_variant = engine.cache_variant() if cache is not None else None
+
+    # (sequence number, name, content hash, cached result) of images handed to the
+    # pipeline but not yet written, in input order; bounded by prefetch depth
+    pending = deque()
+
+    def tracked_images():
+        for sequence, (name, data) in enumerate(iter_source_images(source)):
+            key = cached = None
+            if cache is not None:
+                key = content_hash(data, cache_variant)
+                cached = cache.get(key, model_versions)
+            pending.append((sequence, name, key, cached))
+            # Cache hits still pass through the pipeline, without their bytes, so they
+            # are written in input order as soon as they come off the queue
+            yield sequence, name, b'' if cached is not None else data, cached is not None
+
+    if is_shard_source(source):
+        # Shards hold already decoded images, so nothing can fail to decode
+        dataset = build_prediction_dataset_from_shards(source, batch_size=batch_size)
+    else:
+        dataset = build_prediction_dataset(tracked_images(), batch_size=batch_size)
+    writer = create_result_writer(output_path, output_format, loaded_models)
+
+    summary = {'processed': 0, 'failed': 0, 'output_path': output_path}
+    if cache is not None:
+        summary['cached'] = 0
+    start_time = time.time()
+
+    def write_success(name, individual_results, ensemble_result):
+        writer.write({
+            'filename': name,
+            'status': 'success',
+            'individual_results': [format_model_prediction(r) for r in individual_results],
+            'ensemble_result': format_ensemble_prediction(ensemble_result)
+        })
+        summary['processed'] += 1
+
+    def take_pending(sequence):
+        """Pending entry of an image, writing the images before it that failed to decode"""
+        while pending and pending[0][0] < sequence:
+            _, failed_name, _, _ = pending.popleft()
+            writer.write({'filename': failed_name, 'status': 'error', 'error': 'Could not decode image'})
+            summary['failed'] += 1
+        if pending and pending[0][0] == sequence:
+            return pending.popleft()
+        return None
+
+    try:
+        for sequences, names, images, cached_flags in dataset:
+            names = [n.decode('utf-8') for n in names.numpy()]
+            cached_flags = cached_flags.numpy()
+
+            batch_results = iter(())
+            if not cached_flags.all():
+                batch_results = iter(engine.predict_batch(tf.boolean_mask(images, ~cached_flags)))
+
+            for sequence, name, is_cached in zip(sequences.numpy(), names, cached_flags):
+                entry = take_pending(sequence)
+                if is_cached:
+                    write_success(name, *entry[3])
+                    summary['cached'] += 1
+                    continue
+
+                individual_results, ensemble_result = next(batch_results)
+                write_success(name, individual_results, ensemble_result)
+                key = entry[2] if entry is not None else None
+                if key is not None and result_complete(ensemble_result):
+                    cache.put(key, model_versions, individual_results, ensemble_result)
+
+            writer.flush()
+            if progress_callback:
+                progress_callback(summary)
+
+        # Anything left failed to decode at the end of the stream
+        take_pending(float('inf'))
+    finally:
+        writer.close()
+
+    summary['elapsed'] = round(time.time() - start_time, 2)
+    summary['images_per_sec'] = round(summary['processed'] / summary['elapsed'], 2) if summary['elapsed'] else 0
+    return summary
@@ -0,0 +1,129 @@
+"""
+Micro-batching scheduler for concurrent prediction requests
+Coalesces single-image requests into one batched forward pass per model
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from utils.serving_metrics import MICRO_BATCH_SIZE
+
+
+class MicroBatchScheduler:
+    """
+    Gathers prediction requests for up to max_wait_ms or until max_batch_size
+    is reached, runs them through the engine as one batch and hands every
+    caller back its own (individual_results, ensemble_result) pair.
+    workers > 1 keeps that many batches in flight, for engines that run
+    batches in separate inference processes.
+    """
+
+    def __init__(self, engine, max_batch_size=8, max_wait_ms=5.0, workers=1):
+        self.engine = engine
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.num_workers = max(1, int(workers))
+        self._queue = queue.Queue()
+        self._workers = []
+        self._worker_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.stats = {'batches': 0, 'requests': 0, 'max_batch_seen': 0}
+
+    def submit(self, image_tensor, ensemble_mode=None):
+        """Queue a preprocessed (1, H, W, 3) tensor and return a Future for its result"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((image_tensor, ensemble_mode or self.engine.ensemble_mode, future))
+        return future
+
+    def predict(self, image_tensor, ensemble_mode=None, timeout=None):
+        """Blocking helper equivalent to engine.predict_all_models, but batched"""
+        return self.submit(image_tensor, ensemble_mode).result(timeout=timeout)
+
+    def queue_depth(self):
+        """Number of requests waiting for the next batch"""
+        return self._queue.qsize()
+
+    def stop(self):
+        """Stop the worker threads after their current batch"""
+        self._stopped.set()
+        for _ in self._workers:
+            self._queue.put(None)
+
+    def _ensure_worker(self):
+        """Start the worker threads on first use"""
+        if self._workers and all(worker.is_alive() for worker in self._workers):
+            return
+        with self._worker_lock:
+            self._workers = [worker for worker in self._workers if worker.is_alive()]
+            if len(self._workers) < self.num_workers:
+                self._stopped.clear()
+            while len(self._workers) < self.num_workers:
+                worker = threading.Thread(target=self._run, name=f'micro-batch-scheduler-{len(self._workers)}',
+                                          daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def _collect_batch(self):
+        """Block for the first request, then gather more until the batch is full or the wait expires"""
+        first = self._queue.get()
+        if first is None:
+            return []
+
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                self._stopped.set()
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run(self):
+        """Worker loop: collect, predict, dispatch"""
+        while not self._stopped.is_set():
+            batch = self._collect_batch()
+            if not batch:
+                continue
+
+            # Skip requests whose callers already gave up
+            batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            # Full and cascade requests take different paths through the models
+            by_mode = {}
+            for item in batch:
+                by_mode.setdefault(item[1], []).append(item)
+
+            for ensemble_mode, items in by_mode.items():
+                try:
+                    image_batch = np.concatenate([tensor for tensor, _, _ in items], axis=0)
+                    results = self.engine.predict_batch(image_batch, ensemble_mode)
+
+                    for (_, _, future), result in zip(items, results):
+                        future.set_result(result)
+                except Exception as e:
+                    for _, _, future in items:
+                        if not future.done():
+                            future.set_exception(e)
+
+            with self._stats_lock:
+                self.stats['batches'] += 1
+                self.stats['requests'] += len(batch)
+                self.stats['max_batch_seen'] = max(self.stats['max_batch_seen'], len(batch))
+            MICRO_BATCH_SIZE.observe(len(batch))
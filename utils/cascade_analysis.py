@@ -0,0 +1,167 @@
+"""
+Cascade ensemble analysis
+Takes every trained model's validation outputs from the evaluation cache
+(scoring only models without cached outputs), then replays the early-exit
+cascade over a grid of confidence/agreement thresholds to report the accuracy
+and average latency of each setting against the full ensemble
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+from utils.model_factory import ModelFactory
+from utils.evaluation import ModelEvaluation
+from utils.inference_utils import cascade_exit_mask
+
+CASCADE_ANALYSIS_FILE = 'cascade_analysis.json'
+DEFAULT_CONFIDENCE_THRESHOLDS = (50, 60, 70, 80, 90, 95, 99)
+DEFAULT_AGREEMENT_THRESHOLDS = (0, 50, 100)
+
+
+def load_cascade_analysis(metrics_dir):
+    """Last cascade analysis report, or None"""
+    path = os.path.join(metrics_dir, CASCADE_ANALYSIS_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def simulate_cascade(probabilities, labels, order, latencies_ms, confidence_threshold, agreement_threshold):
+    """
+    Replay the cascade on precomputed (N, C) probabilities per model.
+    Every image runs the models in order until cascade_exit_mask lets it
+    exit; images still undecided after the last model take the full ensemble.
+    """
+    num_images = len(labels)
+    predicted = np.zeros(num_images, dtype=np.int64)
+    models_run = np.zeros(num_images, dtype=np.int64)
+    latency_ms = np.zeros(num_images)
+    exits = {model_type: 0.0 for model_type in order}
+    active = np.arange(num_images)
+
+    for stage, model_type in enumerate(order, start=1):
+        if not len(active):
+            break
+        models_run[active] += 1
+        latency_ms[active] += latencies_ms[model_type]
+        stage_probabilities = [probabilities[m][active] for m in order[:stage]]
+
+        if stage == len(order):
+            exit_mask = np.ones(len(active), dtype=bool)
+        else:
+            exit_mask = cascade_exit_mask(stage_probabilities, confidence_threshold, agreement_threshold)
+
+        average = np.mean(stage_probabilities, axis=0)
+        predicted[active[exit_mask]] = average[exit_mask].argmax(axis=1)
+        exits[model_type] = round(float(exit_mask.sum()) / num_images, 4)
+        active = active[~exit_mask]
+
+    return {
+        'confidence_threshold': confidence_threshold,
+        'agreement_threshold': agreement_threshold,
+        'accuracy': round(float((predicted == labels).mean()) * 100, 2),
+        'avg_models_run': round(float(models_run.mean()), 3),
+        'avg_latency_ms': round(float(latency_ms.mean()), 2),
+        'p95_latency_ms': round(float(np.percentile(latency_ms, 95)), 2),
+        'exit_rate': exits
+    }
+
+
+class CascadeAnalysis:
+    """
+    Latency/accuracy trade-off of the cascade ensemble on the validation
+    split. Model outputs come from the evaluation cache, so models already
+    scored on the split are not run again. Per-model latency is the
+    benchmarked single-image p50 of the serving backend when available, else
+    the batch time measured when the outputs were scored, amortized per image.
+    """
+
+    def __init__(self, engine, data_dir='data', metrics_dir='metrics', cache_dir='cache', validation_split=0.2,
+                 batch_size=32, confidence_thresholds=DEFAULT_CONFIDENCE_THRESHOLDS,
+                 agreement_thresholds=DEFAULT_AGREEMENT_THRESHOLDS):
+        self.evaluation = ModelEvaluation(engine, data_dir=data_dir, metrics_dir=metrics_dir, cache_dir=cache_dir,
+                                          validation_split=validation_split, batch_size=batch_size)
+        self.engine = engine
+        self.data_dir = data_dir
+        self.metrics_dir = metrics_dir
+        self.confidence_thresholds = sorted(float(t) for t in confidence_thresholds)
+        self.agreement_thresholds = sorted(float(t) for t in agreement_thresholds)
+
+    def run(self, progress_callback=None):
+        """Score the validation split, sweep the thresholds and write the report"""
+        start_time = time.time()
+        paths, labels, fingerprint = self.evaluation.validation_set()
+        order = self.engine.cascade_order()
+        if not order:
+            raise ValueError('No trained models available. Please train models first.')
+
+        print(f"🔬 Cascade analysis on {len(paths)} validation images, order: {' → '.join(order)}")
+        probabilities, measured_ms, _ = self.evaluation.model_outputs(order, paths, fingerprint)
+        latencies_ms, latency_info = {}, {}
+
+        for model_type in order:
+            benchmarked_ms = self.engine.model_latency_ms(model_type)
+            latencies_ms[model_type] = benchmarked_ms if benchmarked_ms is not None else measured_ms[model_type]
+            latency_info[model_type] = {
+                'per_image_ms': round(latencies_ms[model_type], 2),
+                'source': 'benchmark' if benchmarked_ms is not None else 'measured'
+            }
+            if progress_callback:
+                progress_callback(model_type)
+
+        single_models = {}
+        for model_type in order:
+            accuracy = (probabilities[model_type].argmax(axis=1) == labels).mean() * 100
+            single_models[model_type] = {
+                'model_name': ModelFactory.SUPPORTED_MODELS.get(model_type, model_type),
+                'accuracy': round(float(accuracy), 2),
+                'latency_ms': latency_info[model_type]['per_image_ms']
+            }
+
+        # A threshold nothing can reach never exits early, which is the full ensemble
+        full = simulate_cascade(probabilities, labels, order, latencies_ms, np.inf, np.inf)
+        full_ensemble = {k: full[k] for k in ('accuracy', 'avg_models_run', 'avg_latency_ms')}
+
+        sweep = []
+        for agreement_threshold in self.agreement_thresholds:
+            for confidence_threshold in self.confidence_thresholds:
+                row = simulate_cascade(probabilities, labels, order, latencies_ms,
+                                       confidence_threshold, agreement_threshold)
+                row['accuracy_change'] = round(row['accuracy'] - full['accuracy'], 2)
+                row['latency_saving_pct'] = (round((1 - row['avg_latency_ms'] / full['avg_latency_ms']) * 100, 1)
+                                             if full['avg_latency_ms'] else 0.0)
+                sweep.append(row)
+
+        configured = simulate_cascade(probabilities, labels, order, latencies_ms,
+                                      self.engine.cascade_confidence, self.engine.cascade_agreement)
+
+        report = {
+            'timestamp': datetime.now().isoformat(),
+            'elapsed': round(time.time() - start_time, 1),
+            'data_dir': self.data_dir,
+            'validation_images': len(paths),
+            'backend': self.engine.registry.backend,
+            'order': order,
+            'model_latency': latency_info,
+            'single_models': single_models,
+            'full_ensemble': full_ensemble,
+            'configured': configured,
+            'thresholds': sweep
+        }
+
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, CASCADE_ANALYSIS_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+
+        print(f"✅ Cascade at {configured['confidence_threshold']:g}% confidence / "
+              f"{configured['agreement_threshold']:g}% agreement: {configured['accuracy']}% accuracy, "
+              f"{configured['avg_latency_ms']} ms vs full ensemble {full['accuracy']}%, {full['avg_latency_ms']} ms")
+        return report
@@ -0,0 +1,272 @@
+"""
+tf.data input pipeline for training
+Decodes and resizes every image once, caches the result and feeds training with
+parallel map, augmentation and prefetch. The training/validation split follows
+ImageDataGenerator.flow_from_directory(validation_split=...) exactly.
+"""
+
+import os
+import re
+import time
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import tensorflow as tf
+
+from utils.inference_utils import IMG_SIZE
+from utils.batch_prediction import is_image_file
+from utils.dataset_shards import ShardedDataset
+
+
+@dataclass
+class DatasetSplits:
+    """Training and validation datasets plus the metadata Keras generators expose"""
+    train_ds: tf.data.Dataset
+    val_ds: Optional[tf.data.Dataset]
+    class_indices: Dict[str, int]
+    train_samples: int
+    val_samples: int
+    train_files: List[str]
+    val_files: List[str]
+
+
+def list_split_files(data_dir, validation_split=0.2):
+    """
+    List (path, label) pairs for both subsets with flow_from_directory semantics:
+    classes are the sorted sub-folders and, per class, the first
+    int(validation_split * n) sorted files form the validation subset.
+    """
+    class_names = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+    class_indices = {name: i for i, name in enumerate(class_names)}
+    train, val = [], []
+
+    for class_name in class_names:
+        class_dir = os.path.join(data_dir, class_name)
+        files = []
+        for root, _, filenames in sorted(os.walk(class_dir), key=lambda x: x[0]):
+            files.extend(os.path.join(root, f) for f in sorted(filenames) if is_image_file(f))
+
+        split_at = int(validation_split * len(files))
+        label = class_indices[class_name]
+        val.extend((path, label) for path in files[:split_at])
+        train.extend((path, label) for path in files[split_at:])
+
+    return train, val, class_indices
+
+
+def load_and_resize(path, img_size=IMG_SIZE):
+    """Read, decode and resize one image to uint8 (nearest, like load_img)"""
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, img_size, method='nearest')
+    return tf.cast(image, tf.uint8)
+
+
+def augment_image(image):
+    """Light, cheap augmentation applied after the cache"""
+    image = tf.image.random_flip_left_right(image)
+    image = tf.image.random_brightness(image, max_delta=0.1)
+    image = tf.image.random_contrast(image, lower=0.9, upper=1.1)
+    return tf.clip_by_value(image, 0.0, 1.0)
+
+
+def files_fingerprint(files):
+    """Short hash of paths, sizes and mtimes so a file cache is rebuilt when the data changes"""
+    digest = hashlib.md5()
+    for path, label in files:
+        stat = os.stat(path)
+        digest.update(f"{path}|{label}|{stat.st_size}|{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()[:12]
+
+
+# Earlier cache layouts: (image, one-hot label) pairs and separate distillation image copies
+LEGACY_CACHE_SUBSETS = {
+    'train_images': ('train', 'distill_train'),
+    'val_images': ('val', 'distill_val')
+}
+
+
+def subset_cache_path(cache_dir, subset, img_size, files):
+    """
+    File prefix of a subset's tf.data image cache, keyed on the image size and
+    the files' fingerprint. The subset's caches built for another fingerprint
+    or size (or in an earlier layout) are superseded and deleted, so changing
+    the dataset does not leave another decoded copy of it behind.
+    """
+    size_key = f"{img_size[0]}x{img_size[1]}"
+    prefix = f"{subset}_{size_key}_{files_fingerprint(files)}"
+    names = '|'.join(re.escape(name) for name in (subset,) + LEGACY_CACHE_SUBSETS.get(subset, ()))
+    superseded = re.compile(rf"^({names})_\d+x\d+_[0-9a-f]{{12}}[._]")
+
+    for filename in os.listdir(cache_dir):
+        # tf.data writes <prefix>.index, <prefix>.data-* and lock files next to them
+        if superseded.match(filename) and not filename.startswith(prefix):
+            try:
+                os.remove(os.path.join(cache_dir, filename))
+            except OSError:
+                pass
+    return os.path.join(cache_dir, prefix)
+
+
+def _build_subset(files, num_classes, img_size, batch_size, cache_path, shuffle, augment, seed, targets=None):
+    """
+    Decode once, cache, then shuffle/augment/batch/prefetch.
+    Only the images are cached and the one-hot labels (or targets, an (N, K)
+    array) are zipped in after the cache, so training and distillation share
+    one decoded copy of each subset.
+    """
+    paths = [path for path, _ in files]
+    labels = [label for _, label in files]
+
+    # Cache resized uint8 images (4x smaller than float32); '' caches in memory
+    images = tf.data.Dataset.from_tensor_slices(paths).map(
+        lambda path: load_and_resize(path, img_size), num_parallel_calls=tf.data.AUTOTUNE
+    ).cache(cache_path or '')
+    if targets is None:
+        targets = tf.data.Dataset.from_tensor_slices(labels).map(lambda label: tf.one_hot(label, num_classes))
+    else:
+        targets = tf.data.Dataset.from_tensor_slices(targets)
+    dataset = tf.data.Dataset.zip((images, targets))
+
+    if shuffle:
+        dataset = dataset.shuffle(min(len(files), 2048), seed=seed, reshuffle_each_iteration=True)
+
+    dataset = dataset.map(
+        lambda image, label: (tf.cast(image, tf.float32) / 255.0, label),
+        num_parallel_calls=tf.data.AUTOTUNE
+    )
+    if augment:
+        dataset = dataset.map(lambda image, label: (augment_image(image), label),
+                              num_parallel_calls=tf.data.AUTOTUNE)
+
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+
+def build_training_datasets(data_dir, img_size=IMG_SIZE, batch_size=32, validation_split=0.2,
+                            cache_dir=None, augment=True, seed=42):
+    """
+    Build cached training/validation datasets from data/<class>/ folders.
+    With cache_dir the decoded images are cached to local files, otherwise in memory.
+    """
+    train_files, val_files, class_indices = list_split_files(data_dir, validation_split)
+    if not train_files:
+        raise ValueError(f'No training images found in {data_dir}')
+
+    train_cache = val_cache = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        train_cache = subset_cache_path(cache_dir, 'train_images', img_size, train_files)
+        val_cache = subset_cache_path(cache_dir, 'val_images', img_size, val_files)
+
+    num_classes = len(class_indices)
+    train_ds = _build_subset(train_files, num_classes, img_size, batch_size, train_cache,
+                             shuffle=True, augment=augment, seed=seed)
+    val_ds = None
+    if val_files:
+        val_ds = _build_subset(val_files, num_classes, img_size, batch_size, val_cache,
+                               shuffle=False, augment=False, seed=seed)
+
+    return DatasetSplits(
+        train_ds=train_ds,
+        val_ds=val_ds,
+        class_indices=class_indices,
+        train_samples=len(train_files),
+        val_samples=len(val_files),
+        train_files=[path for path, _ in train_files],
+        val_files=[path for path, _ in val_files]
+    )
+
+
+def build_distillation_datasets(train_files, val_files, class_indices, train_targets, val_targets,
+                                img_size=IMG_SIZE, batch_size=32, cache_dir=None, augment=True, seed=42):
+    """
+    Datasets for distillation: (image, target) pairs where each target row
+    concatenates the one-hot label and the teachers' soft probabilities.
+    The images come from the same cache as build_training_datasets.
+    """
+    train_cache = val_cache = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        train_cache = subset_cache_path(cache_dir, 'train_images', img_size, train_files)
+        val_cache = subset_cache_path(cache_dir, 'val_images', img_size, val_files)
+
+    num_classes = len(class_indices)
+    train_ds = _build_subset(train_files, num_classes, img_size, batch_size, train_cache,
+                             shuffle=True, augment=augment, seed=seed, targets=train_targets)
+    val_ds = None
+    if val_files:
+        val_ds = _build_subset(val_files, num_classes, img_size, batch_size, val_cache,
+                               shuffle=False, augment=False, seed=seed, targets=val_targets)
+
+    return DatasetSplits(
+        train_ds=train_ds,
+        val_ds=val_ds,
+        class_indices=class_indices,
+        train_samples=len(train_files),
+        val_samples=len(val_files),
+        train_files=[path for path, _ in train_files],
+        val_files=[path for path, _ in val_files]
+    )
+
+
+def build_training_datasets_from_shards(shard_dir, batch_size=32, validation_split=0.2, augment=True, seed=42):
+    """
+    Build training/validation datasets from pre-resized shards (see
+    utils.dataset_shards). Images are already decoded at the input
+    resolution, so no file cache is needed.
+    """
+    shards = ShardedDataset(shard_dir)
+    train_rows, val_rows, class_indices = shards.split(validation_split)
+    if not train_rows:
+        raise ValueError(f'No training images found in shards at {shard_dir}')
+
+    num_classes = len(class_indices)
+
+    def finish(dataset, augment_subset):
+        dataset = dataset.map(lambda image, label: (tf.cast(image, tf.float32) / 255.0, label),
+                              num_parallel_calls=tf.data.AUTOTUNE)
+        if augment_subset:
+            dataset = dataset.map(lambda image, label: (augment_image(image), label),
+                                  num_parallel_calls=tf.data.AUTOTUNE)
+        return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+    train_ds = finish(shards.dataset(train_rows, num_classes, shuffle=True, seed=seed), augment)
+    val_ds = finish(shards.dataset(val_rows, num_classes), False) if val_rows else None
+
+    return DatasetSplits(
+        train_ds=train_ds,
+        val_ds=val_ds,
+        class_indices=class_indices,
+        train_samples=len(train_rows),
+        val_samples=len(val_rows),
+        train_files=[row[0] for row in train_rows],
+        val_files=[row[0] for row in val_rows]
+    )
+
+
+class ThroughputCallback(tf.keras.callbacks.Callback):
+    """Log training images/sec for every epoch (validation time excluded)"""
+
+    def __init__(self, num_samples, model_type=''):
+        super().__init__()
+        self.num_samples = num_samples
+        self.model_type = model_type
+        self._epoch_start = None
+        self._train_end = None
+        self.history = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+        self._train_end = None
+
+    def on_test_begin(self, logs=None):
+        if self._epoch_start is not None and self._train_end is None:
+            self._train_end = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        elapsed = (self._train_end or time.perf_counter()) - self._epoch_start
+        images_per_sec = self.num_samples / elapsed if elapsed else 0.0
+        self.history.append(images_per_sec)
+        if logs is not None:
+            logs['images_per_sec'] = images_per_sec
+        print(f"⚡ {self.model_type} epoch {epoch + 1}: {images_per_sec:.1f} images/sec ({elapsed:.1f}s)")
@@ -0,0 +1,374 @@
+"""
+Persistent dataset index
+Records path, class, size, mtime, content hash, perceptual hash, decoded
+dimensions and validity of every training image in a SQLite database inside data/. Uploads update it
+directly, a stat-based rescan picks up outside changes, and per-class counts
+are kept in a summary table maintained by triggers.
+"""
+
+import io
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, UnidentifiedImageError
+
+INDEX_FILENAME = '.dataset_index.sqlite'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    class_name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    content_hash TEXT,
+    width INTEGER,
+    height INTEGER,
+    valid INTEGER NOT NULL,
+    error TEXT,
+    indexed_at REAL NOT NULL,
+    source_hash TEXT,
+    phash INTEGER
+);
+CREATE INDEX IF NOT EXISTS images_class ON images (class_name);
+CREATE INDEX IF NOT EXISTS images_hash ON images (content_hash);
+
+CREATE TABLE IF NOT EXISTS class_counts (
+    class_name TEXT PRIMARY KEY,
+    valid INTEGER NOT NULL DEFAULT 0,
+    invalid INTEGER NOT NULL DEFAULT 0,
+    bytes INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+"""
+
+# Recreated on every open, so index files written by older versions get the current triggers.
+# The OR IGNORE of a statement inside a trigger is overridden by the conflict handling of an
+# upsert that fires it, so new class rows are guarded with NOT EXISTS instead.
+TRIGGERS = """
+DROP TRIGGER IF EXISTS images_insert;
+DROP TRIGGER IF EXISTS images_delete;
+DROP TRIGGER IF EXISTS images_update;
+
+CREATE TRIGGER images_insert AFTER INSERT ON images BEGIN
+    INSERT INTO class_counts (class_name) SELECT NEW.class_name
+        WHERE NOT EXISTS (SELECT 1 FROM class_counts WHERE class_name = NEW.class_name);
+    UPDATE class_counts SET valid = valid + NEW.valid, invalid = invalid + 1 - NEW.valid,
+        bytes = bytes + NEW.size WHERE class_name = NEW.class_name;
+END;
+
+CREATE TRIGGER images_delete AFTER DELETE ON images BEGIN
+    UPDATE class_counts SET valid = valid - OLD.valid, invalid = invalid - 1 + OLD.valid,
+        bytes = bytes - OLD.size WHERE class_name = OLD.class_name;
+    DELETE FROM class_counts WHERE class_name = OLD.class_name AND valid = 0 AND invalid = 0;
+END;
+
+CREATE TRIGGER images_update AFTER UPDATE ON images BEGIN
+    UPDATE class_counts SET valid = valid - OLD.valid, invalid = invalid - 1 + OLD.valid,
+        bytes = bytes - OLD.size WHERE class_name = OLD.class_name;
+    INSERT INTO class_counts (class_name) SELECT NEW.class_name
+        WHERE NOT EXISTS (SELECT 1 FROM class_counts WHERE class_name = NEW.class_name);
+    UPDATE class_counts SET valid = valid + NEW.valid, invalid = invalid + 1 - NEW.valid,
+        bytes = bytes + NEW.size WHERE class_name = NEW.class_name;
+    DELETE FROM class_counts WHERE valid = 0 AND invalid = 0;
+END;
+"""
+
+
+# Columns added after the first release, created on older index files
+MIGRATIONS = {
+    'source_hash': 'ALTER TABLE images ADD COLUMN source_hash TEXT',
+    'phash': 'ALTER TABLE images ADD COLUMN phash INTEGER'
+}
+
+
+def is_image_file(filename):
+    """Check whether a filename has a supported image extension"""
+    return filename.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def dhash(image, hash_size=8):
+    """64-bit difference hash of a PIL image, as a signed integer (SQLite INTEGER range)"""
+    pixels = np.asarray(image.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    value = int(np.packbits(bits).view('>u8')[0])
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def hamming_distances(phash, phashes):
+    """Bit distance between one hash and an int64 array of hashes"""
+    xor = np.bitwise_xor(np.asarray(phashes, dtype=np.int64), np.int64(phash))
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def inspect_image(path):
+    """Stat, hash and fully decode one file; returns the index row fields"""
+    stat = os.stat(path)
+    record = {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'content_hash': None,
+        'width': None,
+        'height': None,
+        'valid': 0,
+        'error': None,
+        'source_hash': None,
+        'phash': None
+    }
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        record['content_hash'] = record['source_hash'] = hashlib.sha1(data).hexdigest()
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+            record['width'], record['height'] = img.size
+            record['phash'] = dhash(img)
+        record['valid'] = 1
+    except UnidentifiedImageError:
+        record['error'] = 'Unrecognized image format'
+    except Exception as e:
+        record['error'] = str(e)[:200]
+    return record
+
+
+class DatasetIndex:
+    """SQLite index of data/<class>/ images, updated incrementally"""
+
+    def __init__(self, data_dir='data', db_path=None, max_workers=None):
+        self.data_dir = data_dir
+        self.db_path = db_path or os.path.join(data_dir, INDEX_FILENAME)
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self._write_lock = threading.Lock()
+        os.makedirs(data_dir, exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            conn.executescript(TRIGGERS)
+            columns = {row['name'] for row in conn.execute('PRAGMA table_info(images)')}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+            conn.execute('CREATE INDEX IF NOT EXISTS images_source_hash ON images (source_hash)')
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection committed on success and always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def relative_path(self, path):
+        return os.path.relpath(path, self.data_dir).replace(os.sep, '/')
+
+    def absolute_path(self, relative_path):
+        return os.path.join(self.data_dir, *relative_path.split('/'))
+
+    def _class_dirs(self):
+        """Top-level class folders (one listdir of data/, no file listing)"""
+        if not os.path.isdir(self.data_dir):
+            return {}
+        return {entry.name: entry.stat().st_mtime_ns for entry in os.scandir(self.data_dir) if entry.is_dir()}
+
+    def _upsert(self, conn, records):
+        conn.executemany(
+            """INSERT INTO images (path, class_name, size, mtime_ns, content_hash, width, height, valid, error,
+                                   indexed_at, source_hash, phash)
+               VALUES (:path, :class_name, :size, :mtime_ns, :content_hash, :width, :height, :valid, :error,
+                       :indexed_at, :source_hash, :phash)
+               ON CONFLICT(path) DO UPDATE SET class_name=excluded.class_name, size=excluded.size,
+                   mtime_ns=excluded.mtime_ns, content_hash=excluded.content_hash, width=excluded.width,
+                   height=excluded.height, valid=excluded.valid, error=excluded.error,
+                   indexed_at=excluded.indexed_at, source_hash=excluded.source_hash, phash=excluded.phash""",
+            records
+        )
+
+    def _inspect_many(self, paths):
+        """Inspect files in parallel (decoding releases the GIL); returns row dicts"""
+        def inspect(path):
+            try:
+                record = inspect_image(path)
+            except OSError:
+                return None  # Removed while scanning
+            relative = self.relative_path(path)
+            record.update(path=relative, class_name=relative.split('/', 1)[0], indexed_at=time.time())
+            return record
+
+        if len(paths) < 2:
+            records = [inspect(path) for path in paths]
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                records = list(executor.map(inspect, paths))
+        return [record for record in records if record is not None]
+
+    def add_files(self, paths):
+        """Index (or re-index) specific files, e.g. right after an upload"""
+        paths = [path for path in paths if is_image_file(path)]
+        records = self._inspect_many(paths)
+        with self._write_lock, self._connect() as conn:
+            self._upsert(conn, records)
+        return records
+
+    def upsert_records(self, records):
+        """Store rows computed elsewhere (e.g. by the ingestion pipeline) without re-reading the files"""
+        with self._write_lock, self._connect() as conn:
+            self._upsert(conn, records)
+
+    def find_duplicate(self, hashes):
+        """Path of an indexed image whose stored or original content hash is in hashes"""
+        hashes = [h for h in hashes if h]
+        if not hashes:
+            return None
+        marks = ','.join('?' * len(hashes))
+        with self._connect() as conn:
+            row = conn.execute(f'SELECT path FROM images WHERE content_hash IN ({marks}) '
+                               f'OR source_hash IN ({marks}) LIMIT 1', hashes + hashes).fetchone()
+        return row['path'] if row else None
+
+    def perceptual_hashes(self):
+        """(paths, int64 array) of all valid images with a perceptual hash"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT path, phash FROM images WHERE valid = 1 AND phash IS NOT NULL').fetchall()
+        return [row['path'] for row in rows], np.array([row['phash'] for row in rows], dtype=np.int64)
+
+    def remove_files(self, paths):
+        with self._write_lock, self._connect() as conn:
+            conn.executemany('DELETE FROM images WHERE path = ?', [(self.relative_path(p),) for p in paths])
+
+    def rescan(self, class_names=None):
+        """
+        Bring the index in line with disk for the given classes (all by default).
+        Files whose size and mtime match the index are not re-read.
+        """
+        start_time = time.time()
+        class_dirs = self._class_dirs()
+        class_names = sorted(class_dirs) if class_names is None else list(class_names)
+
+        with self._connect() as conn:
+            # Rows indexed before perceptual hashes existed count as changed
+            known = {row['path']: (row['size'], row['mtime_ns']) if row['phash'] is not None or not row['valid']
+                     else None for row in conn.execute(
+                f"SELECT path, size, mtime_ns, valid, phash FROM images "
+                f"WHERE class_name IN ({','.join('?' * len(class_names))})",
+                class_names
+            )} if class_names else {}
+            indexed_classes = {row[0] for row in conn.execute('SELECT class_name FROM class_counts')}
+
+        seen, changed = set(), []
+        for class_name in class_names:
+            class_dir = os.path.join(self.data_dir, class_name)
+            for root, _, filenames in os.walk(class_dir):
+                for filename in filenames:
+                    if not is_image_file(filename):
+                        continue
+                    path = os.path.join(root, filename)
+                    relative = self.relative_path(path)
+                    seen.add(relative)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    if known.get(relative) != (stat.st_size, stat.st_mtime_ns):
+                        changed.append(path)
+
+        removed = [path for path in known if path not in seen]
+        records = self._inspect_many(changed)
+
+        with self._write_lock, self._connect() as conn:
+            self._upsert(conn, records)
+            conn.executemany('DELETE FROM images WHERE path = ?', [(path,) for path in removed])
+            # Classes whose folder disappeared entirely
+            if set(class_names) == set(class_dirs):
+                for class_name in indexed_classes - set(class_dirs):
+                    conn.execute('DELETE FROM images WHERE class_name = ?', (class_name,))
+                conn.execute('DELETE FROM directories')
+            conn.executemany('INSERT OR REPLACE INTO directories (path, mtime_ns) VALUES (?, ?)',
+                             [(name, class_dirs[name]) for name in class_names if name in class_dirs])
+
+        summary = {
+            'scanned_classes': len(class_names),
+            'indexed': len(records),
+            'removed': len(removed),
+            'unchanged': len(seen) - len(changed),
+            'elapsed': time.time() - start_time
+        }
+        if records or removed:
+            print(f"🗂️ Dataset index updated: {len(records)} indexed, {len(removed)} removed "
+                  f"({summary['elapsed']:.2f}s)")
+        return summary
+
+    def refresh(self):
+        """
+        Rescan only class folders whose directory mtime changed since the last
+        scan (files added, removed or renamed). Costs one stat per class when
+        nothing changed. In-place edits of existing files need rescan().
+        """
+        class_dirs = self._class_dirs()
+        with self._connect() as conn:
+            scanned = {row['path']: row['mtime_ns'] for row in conn.execute('SELECT path, mtime_ns FROM directories')}
+            indexed_classes = {row[0] for row in conn.execute('SELECT class_name FROM class_counts')}
+
+        stale = [name for name, mtime in class_dirs.items() if scanned.get(name) != mtime]
+        vanished = (indexed_classes | set(scanned)) - set(class_dirs)
+        if vanished:
+            with self._write_lock, self._connect() as conn:
+                for class_name in vanished:
+                    conn.execute('DELETE FROM images WHERE class_name = ?', (class_name,))
+                    conn.execute('DELETE FROM directories WHERE path = ?', (class_name,))
+        if stale:
+            return self.rescan(stale)
+        return None
+
+    def class_counts(self, include_invalid=False):
+        """{class: valid image count} (or full count rows) straight from the summary table"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT class_name, valid, invalid, bytes FROM class_counts ORDER BY class_name')
+            if include_invalid:
+                return {row['class_name']: dict(row) for row in rows}
+            return {row['class_name']: row['valid'] for row in rows if row['valid'] > 0}
+
+    def totals(self):
+        """Valid and invalid image totals plus bytes"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT COALESCE(SUM(valid), 0), COALESCE(SUM(invalid), 0), '
+                               'COALESCE(SUM(bytes), 0) FROM class_counts').fetchone()
+        return {'valid': row[0], 'invalid': row[1], 'bytes': row[2]}
+
+    def invalid_files(self, limit=50):
+        """Files that failed to decode, with the decoder error"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT path, error FROM images WHERE valid = 0 ORDER BY path LIMIT ?', (limit,))
+            return [dict(row) for row in rows]
+
+    def files(self, class_name=None, valid_only=True, limit=None):
+        """Indexed rows, optionally for one class"""
+        query = 'SELECT * FROM images'
+        clauses, params = [], []
+        if class_name is not None:
+            clauses.append('class_name = ?')
+            params.append(class_name)
+        if valid_only:
+            clauses.append('valid = 1')
+        if clauses:
+            query += ' WHERE ' + ' AND '.join(clauses)
+        query += ' ORDER BY path'
+        if limit is not None:
+            query += ' LIMIT ?'
+            params.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query, params)]
@@ -0,0 +1,299 @@
+"""
+Pre-resized, sharded dataset format
+Packs the indexed training images into memory-mappable uint8 NumPy shards at
+the model input resolution with a JSON manifest. Rebuilds are incremental:
+only new or changed images are decoded, removed ones are tombstoned, and
+sparse or small shards are compacted by copying rows instead of re-decoding.
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+
+from utils.inference_utils import IMG_SIZE
+
+MANIFEST_FILE = 'manifest.json'
+DEFAULT_SHARD_SIZE = 1024
+
+
+def is_shard_source(source):
+    """Check whether a path is a shard folder (or its manifest)"""
+    if os.path.basename(source) == MANIFEST_FILE:
+        return os.path.isfile(source)
+    return os.path.isfile(os.path.join(source, MANIFEST_FILE))
+
+
+def _shard_dir(source):
+    return os.path.dirname(source) if os.path.basename(source) == MANIFEST_FILE else source
+
+
+def load_manifest(shard_dir):
+    """Manifest dict, or None if the folder holds no shards yet"""
+    path = os.path.join(shard_dir, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _write_manifest(shard_dir, manifest):
+    path = os.path.join(shard_dir, MANIFEST_FILE)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def build_shards(dataset_index, shard_dir, img_size=IMG_SIZE, shard_size=DEFAULT_SHARD_SIZE):
+    """
+    Bring the shards in line with the dataset index. Returns a summary with
+    the number of decoded, carried-over and removed images.
+    """
+    # data_pipeline reads shards, so import its decoder lazily
+    from utils.data_pipeline import load_and_resize
+
+    start_time = time.time()
+    os.makedirs(shard_dir, exist_ok=True)
+    img_size = tuple(img_size)
+
+    current = {row['path']: (row['class_name'], row['content_hash']) for row in dataset_index.files()}
+    manifest = load_manifest(shard_dir)
+    if manifest is None or tuple(manifest['img_size']) != img_size:
+        if manifest is not None:
+            print(f"♻️ Shards were built at {manifest['img_size']}, rebuilding at {list(img_size)}")
+        old_shards = manifest['shards'] if manifest else []
+        manifest = {'img_size': list(img_size), 'shard_size': shard_size, 'next_shard': 0, 'shards': []}
+        for shard in old_shards:
+            _remove_file(os.path.join(shard_dir, shard['file']))
+
+    # Tombstone entries that no longer match the index
+    present, removed = set(), 0
+    for shard in manifest['shards']:
+        deleted = set(shard['deleted'])
+        for row, (path, class_name, content_hash) in enumerate(shard['entries']):
+            if row in deleted:
+                continue
+            if current.get(path) == (class_name, content_hash):
+                present.add(path)
+            else:
+                deleted.add(row)
+                removed += 1
+        shard['deleted'] = sorted(deleted)
+
+    # Mostly-dead shards, and small shards when there is something to merge them with,
+    # get their live rows copied into new shards
+    def live_rows(shard):
+        return len(shard['entries']) - len(shard['deleted'])
+
+    new_paths = sorted(path for path in current if path not in present)
+    sparse = [shard for shard in manifest['shards'] if live_rows(shard) * 2 < len(shard['entries'])]
+    small = [shard for shard in manifest['shards']
+             if shard not in sparse and live_rows(shard) < shard_size // 2]
+    compact = sparse + (small if new_paths or len(small) > 1 else [])
+    keep = [shard for shard in manifest['shards'] if shard not in compact]
+
+    if not new_paths and not compact:
+        if removed:
+            manifest.update(updated=datetime.now().isoformat(), num_images=len(present))
+            _write_manifest(shard_dir, manifest)
+        return {'decoded': 0, 'carried_over': 0, 'removed': removed, 'failed': 0,
+                'shards': len(manifest['shards']), 'images': len(present), 'elapsed': time.time() - start_time}
+
+    carried = []
+    for shard in compact:
+        deleted = set(shard['deleted'])
+        carried.extend((entry, shard['file'], row) for row, entry in enumerate(shard['entries']) if row not in deleted)
+
+    print(f"📦 Building shards: {len(new_paths)} new images to decode, {len(carried)} rows to compact")
+    writer = ShardWriter(shard_dir, img_size, shard_size, manifest, len(carried) + len(new_paths))
+
+    # Carry live rows of compacted shards over without decoding them again
+    open_shards = {}
+    for entry, filename, row in carried:
+        if filename not in open_shards:
+            open_shards[filename] = np.load(os.path.join(shard_dir, filename), mmap_mode='r')
+        writer.append(entry, open_shards[filename][row])
+    open_shards.clear()
+
+    # Decode new images in parallel with the same resize as the tf.data training pipeline
+    decoded = 0
+    if new_paths:
+        absolute = [dataset_index.absolute_path(path) for path in new_paths]
+        dataset = tf.data.Dataset.from_tensor_slices((new_paths, absolute))
+        dataset = dataset.map(lambda rel, path: (rel, load_and_resize(path, img_size)),
+                              num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+        dataset = dataset.ignore_errors().prefetch(tf.data.AUTOTUNE)
+        for rel, image in dataset.as_numpy_iterator():
+            path = rel.decode('utf-8')
+            class_name, content_hash = current[path]
+            writer.append((path, class_name, content_hash), image)
+            decoded += 1
+    new_shards = writer.close()
+    failed = len(new_paths) - decoded
+
+    manifest['shards'] = keep + new_shards
+    live_images = sum(len(s['entries']) - len(s['deleted']) for s in manifest['shards'])
+    manifest.update(updated=datetime.now().isoformat(), num_images=live_images)
+    _write_manifest(shard_dir, manifest)
+    for shard in compact:
+        _remove_file(os.path.join(shard_dir, shard['file']))
+
+    summary = {
+        'decoded': decoded,
+        'carried_over': len(carried),
+        'removed': removed,
+        'failed': failed,
+        'shards': len(manifest['shards']),
+        'images': live_images,
+        'elapsed': time.time() - start_time
+    }
+    print(f"📦 Shards ready: {live_images} images in {summary['shards']} shards ({summary['elapsed']:.1f}s)")
+    return summary
+
+
+class ShardWriter:
+    """Fill fixed-size memory-mapped shards row by row; each shard is renamed into place when full"""
+
+    def __init__(self, shard_dir, img_size, shard_size, manifest, total_rows):
+        self.shard_dir = shard_dir
+        self.img_size = img_size
+        self.shard_size = shard_size
+        self.manifest = manifest
+        self.remaining = total_rows
+        self.shards = []
+        self._array = None
+        self._file = None
+        self._entries = []
+
+    def _open(self):
+        self._file = f"shard_{self.manifest['next_shard']:05d}.npy"
+        self.manifest['next_shard'] += 1
+        self._array = np.lib.format.open_memmap(
+            os.path.join(self.shard_dir, self._file + '.tmp'), mode='w+', dtype=np.uint8,
+            shape=(min(self.shard_size, self.remaining), *self.img_size, 3)
+        )
+        self._entries = []
+
+    def append(self, entry, image):
+        if self._array is None:
+            self._open()
+        self._array[len(self._entries)] = image
+        self._entries.append(list(entry))
+        self.remaining -= 1
+        if len(self._entries) == self._array.shape[0]:
+            self._finish()
+
+    def _finish(self):
+        tmp_path = os.path.join(self.shard_dir, self._file + '.tmp')
+        count, array = len(self._entries), self._array
+        self._array = None
+        if count < array.shape[0]:
+            # Fewer rows than reserved (failed decodes): rewrite at the exact size
+            trimmed = np.array(array[:count])
+            del array
+            with open(tmp_path, 'wb') as f:
+                np.save(f, trimmed)
+        else:
+            array.flush()
+            del array
+        os.replace(tmp_path, os.path.join(self.shard_dir, self._file))
+        self.shards.append({'file': self._file, 'entries': self._entries, 'deleted': []})
+
+    def close(self):
+        """Finish the open shard and return the manifest entries of all written shards"""
+        if self._array is not None:
+            if self._entries:
+                self._finish()
+            else:
+                self._array = None
+                _remove_file(os.path.join(self.shard_dir, self._file + '.tmp'))
+        return self.shards
+
+
+def _remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+class ShardedDataset:
+    """Read-only view of the live rows in a shard folder"""
+
+    def __init__(self, source):
+        self.shard_dir = _shard_dir(source)
+        self.manifest = load_manifest(self.shard_dir)
+        if self.manifest is None:
+            raise FileNotFoundError(f'No shard manifest in {self.shard_dir}')
+        self.img_size = tuple(self.manifest['img_size'])
+        self._arrays = {}
+
+    def entries(self):
+        """Live (path, class_name, shard_number, row) tuples sorted by path"""
+        rows = []
+        for number, shard in enumerate(self.manifest['shards']):
+            deleted = set(shard['deleted'])
+            rows.extend((path, class_name, number, row)
+                        for row, (path, class_name, _) in enumerate(shard['entries']) if row not in deleted)
+        return sorted(rows)
+
+    def array(self, number):
+        """Memory-mapped uint8 images of one shard"""
+        if number not in self._arrays:
+            filename = self.manifest['shards'][number]['file']
+            self._arrays[number] = np.load(os.path.join(self.shard_dir, filename), mmap_mode='r')
+        return self._arrays[number]
+
+    def split(self, validation_split=0.2):
+        """
+        (train, val, class_indices) with flow_from_directory semantics: per class,
+        the first int(validation_split * n) images by path are validation
+        """
+        by_class = {}
+        for path, class_name, number, row in self.entries():
+            by_class.setdefault(class_name, []).append((path, number, row))
+
+        class_indices = {name: i for i, name in enumerate(sorted(by_class))}
+        train, val = [], []
+        for class_name, rows in sorted(by_class.items()):
+            split_at = int(validation_split * len(rows))
+            label = class_indices[class_name]
+            val.extend((path, number, row, label) for path, number, row in rows[:split_at])
+            train.extend((path, number, row, label) for path, number, row in rows[split_at:])
+        return train, val, class_indices
+
+    def dataset(self, rows, num_classes=None, shuffle=False, seed=42):
+        """(uint8 image, label) dataset streaming rows straight from the memory maps"""
+        rng = np.random.RandomState(seed)
+
+        def generator():
+            order = rng.permutation(len(rows)) if shuffle else range(len(rows))
+            for i in order:
+                _, number, row, label = rows[i]
+                yield self.array(number)[row], label
+
+        dataset = tf.data.Dataset.from_generator(generator, output_signature=(
+            tf.TensorSpec(shape=(*self.img_size, 3), dtype=tf.uint8),
+            tf.TensorSpec(shape=(), dtype=tf.int32)
+        )).apply(tf.data.experimental.assert_cardinality(len(rows)))
+        if num_classes is not None:
+            dataset = dataset.map(lambda image, label: (image, tf.one_hot(label, num_classes)),
+                                  num_parallel_calls=tf.data.AUTOTUNE)
+        return dataset
+
+
+def build_prediction_dataset_from_shards(source, batch_size=32):
+    """
+    (sequence numbers, names, images, cached flags) batches for batch prediction,
+    shaped like build_prediction_dataset and scaled like decode_image_tensor
+    """
+    shards = ShardedDataset(source)
+    rows = [(path, number, row, 0) for path, _, number, row in shards.entries()]
+    names = tf.data.Dataset.from_tensor_slices([path for path, _, _, _ in rows] or tf.constant([], tf.string))
+    images = shards.dataset(rows).map(lambda image, _: tf.cast(image, tf.float32) / 255.0,
+                                      num_parallel_calls=tf.data.AUTOTUNE)
+    dataset = tf.data.Dataset.zip((tf.data.Dataset.range(len(rows)), names, images,
+                                   tf.data.Dataset.from_tensors(False).repeat()))
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
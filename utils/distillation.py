@@ -0,0 +1,81 @@
+"""
+Ensemble knowledge distillation
+Teacher probabilities are cached per image content hash and teacher model
+version, so each trained ensemble member scores an image once. The student
+learns from the averaged (temperature-softened) teacher probabilities plus
+the hard labels.
+"""
+
+import os
+
+import numpy as np
+import tensorflow as tf
+
+from utils.model_factory import ModelFactory
+from utils.model_registry import backend_model_path
+from utils.feature_cache import FeatureCache
+
+DEFAULT_TEMPERATURE = 2.0
+DEFAULT_ALPHA = 0.7
+
+
+def trained_teachers(models_dir, model_types=None):
+    """Ensemble members with a trained Keras model on disk"""
+    model_types = model_types or list(ModelFactory.SUPPORTED_MODELS)
+    return [m for m in model_types if os.path.exists(backend_model_path(models_dir, m, 'keras'))]
+
+
+def teacher_version(models_dir, model_type):
+    """Version tag of a teacher's Keras file; a retrained teacher invalidates its cached outputs"""
+    stat = os.stat(backend_model_path(models_dir, model_type, 'keras'))
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def teacher_probabilities(paths, teachers, models_dir, cache_dir, img_size, batch_size=32):
+    """
+    {teacher: (N, C) probabilities} for the image paths. Outputs are stored in
+    a FeatureCache per teacher, so only new images or retrained teachers run.
+    """
+    outputs = {}
+    for model_type in teachers:
+        cache = FeatureCache(cache_dir, f"teacher_{model_type}", img_size,
+                             weights_tag=teacher_version(models_dir, model_type))
+        model = None
+        if not cache.has_features(paths):
+            model = tf.keras.models.load_model(backend_model_path(models_dir, model_type, 'keras'), compile=False)
+        outputs[model_type] = cache.get_features(paths, model, batch_size)
+    return outputs
+
+
+def distillation_targets(labels, soft_probabilities, num_classes):
+    """(N, 2C) targets: one-hot hard labels followed by the soft ensemble probabilities"""
+    hard = np.eye(num_classes, dtype=np.float32)[np.asarray(labels, dtype=np.int64)]
+    return np.concatenate([hard, np.asarray(soft_probabilities, dtype=np.float32)], axis=1)
+
+
+def _soften(probabilities, temperature):
+    """Probabilities at a higher temperature: softmax(log(p) / T)"""
+    return tf.nn.softmax(tf.math.log(tf.clip_by_value(probabilities, 1e-7, 1.0)) / temperature, axis=-1)
+
+
+def distillation_loss(num_classes, temperature=DEFAULT_TEMPERATURE, alpha=DEFAULT_ALPHA):
+    """
+    alpha * T^2 * KL(teacher_T || student_T) + (1 - alpha) * cross-entropy with the
+    hard labels, on targets from distillation_targets and softmax student outputs
+    """
+    kl_divergence = tf.keras.losses.KLDivergence(reduction='none')
+
+    def loss(y_true, y_pred):
+        hard, soft = y_true[:, :num_classes], y_true[:, num_classes:]
+        soft_loss = kl_divergence(_soften(soft, temperature), _soften(y_pred, temperature)) * temperature ** 2
+        hard_loss = tf.keras.losses.categorical_crossentropy(hard, y_pred)
+        return alpha * soft_loss + (1 - alpha) * hard_loss
+
+    return loss
+
+
+def hard_label_accuracy(num_classes):
+    """Accuracy against the hard-label half of the distillation targets, logged as 'accuracy'"""
+    def accuracy(y_true, y_pred):
+        return tf.keras.metrics.categorical_accuracy(y_true[:, :num_classes], y_pred)
+    return accuracy
@@ -0,0 +1,376 @@
+"""
+Vectorized model evaluation
+Every trained model scores the validation split once, in batches through the
+inference engine, and its softmax outputs are cached as a compact .npz array
+file keyed on the model file version and the split. Confusion matrices,
+per-class precision/recall, calibration, top-k accuracy and the ensemble of
+any subset of models are then computed with NumPy from the cached outputs,
+without new forward passes.
+"""
+
+import os
+import json
+import time
+import itertools
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+
+from utils.model_factory import ModelFactory
+from utils.model_registry import SERVABLE_MODELS, STUDENT_MODEL
+from utils.data_pipeline import files_fingerprint, list_split_files
+from utils.batch_prediction import decode_image_tensor
+
+EVALUATION_REPORT_FILE = 'evaluation_report.json'
+DEFAULT_TOP_K = (1, 3, 5)
+DEFAULT_CALIBRATION_BINS = 10
+
+
+def load_evaluation_report(metrics_dir):
+    """Last evaluation report, or None"""
+    path = os.path.join(metrics_dir, EVALUATION_REPORT_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def confusion_matrix(labels, predicted, num_classes):
+    """(C, C) counts, rows true class and columns predicted class"""
+    return np.bincount(labels * num_classes + predicted, minlength=num_classes * num_classes) \
+        .reshape(num_classes, num_classes)
+
+
+def per_class_report(matrix, class_names):
+    """Precision, recall, F1 and support per class from a confusion matrix, plus the macro F1"""
+    true_positives = np.diag(matrix).astype(np.float64)
+    predicted = matrix.sum(axis=0)
+    support = matrix.sum(axis=1)
+    precision = np.divide(true_positives, predicted, out=np.zeros_like(true_positives), where=predicted > 0)
+    recall = np.divide(true_positives, support, out=np.zeros_like(true_positives), where=support > 0)
+    denominator = precision + recall
+    f1 = np.divide(2 * precision * recall, denominator, out=np.zeros_like(denominator), where=denominator > 0)
+
+    report = {
+        name: {
+            'precision': round(float(precision[i]), 4),
+            'recall': round(float(recall[i]), 4),
+            'f1': round(float(f1[i]), 4),
+            'support': int(support[i])
+        }
+        for i, name in enumerate(class_names)
+    }
+    return report, round(float(f1.mean()), 4)
+
+
+def top_k_accuracy(probabilities, labels, ks):
+    """{k: accuracy %} from the rank of the true class (no sort), for every k up to the number of classes"""
+    true_probability = probabilities[np.arange(len(labels)), labels]
+    rank = (probabilities > true_probability[:, None]).sum(axis=1)
+    return {str(k): round(float((rank < k).mean()) * 100, 2) for k in ks if k <= probabilities.shape[1]}
+
+
+def calibration(probabilities, labels, bins=DEFAULT_CALIBRATION_BINS):
+    """Expected/maximum calibration error over confidence bins, negative log-likelihood and Brier score"""
+    num_images = len(labels)
+    confidence = probabilities.max(axis=1)
+    correct = (probabilities.argmax(axis=1) == labels).astype(np.float64)
+
+    bin_index = np.minimum((confidence * bins).astype(np.int64), bins - 1)
+    counts = np.bincount(bin_index, minlength=bins)
+    occupied = counts > 0
+    bin_confidence = np.divide(np.bincount(bin_index, weights=confidence, minlength=bins), counts,
+                               out=np.zeros(bins), where=occupied)
+    bin_accuracy = np.divide(np.bincount(bin_index, weights=correct, minlength=bins), counts,
+                             out=np.zeros(bins), where=occupied)
+    gaps = np.abs(bin_accuracy - bin_confidence)
+
+    true_probability = probabilities[np.arange(num_images), labels]
+    one_hot = np.eye(probabilities.shape[1])[labels]
+    return {
+        'ece': round(float((counts * gaps).sum() / num_images), 4),
+        'mce': round(float(gaps[occupied].max()), 4) if occupied.any() else 0.0,
+        'nll': round(float(-np.log(np.clip(true_probability, 1e-12, 1.0)).mean()), 4),
+        'brier': round(float(((probabilities - one_hot) ** 2).sum(axis=1).mean()), 4),
+        'bins': [
+            {
+                'upper': round((i + 1) / bins, 3),
+                'count': int(counts[i]),
+                'confidence': round(float(bin_confidence[i]), 4),
+                'accuracy': round(float(bin_accuracy[i]), 4)
+            }
+            for i in range(bins) if occupied[i]
+        ]
+    }
+
+
+def summarize(probabilities, labels, class_names, top_k=DEFAULT_TOP_K, bins=DEFAULT_CALIBRATION_BINS,
+              detailed=True):
+    """Accuracy, top-k and calibration of (N, C) probabilities; detailed adds the confusion matrix and per-class report"""
+    predicted = probabilities.argmax(axis=1)
+    matrix = confusion_matrix(labels, predicted, len(class_names))
+    per_class, macro_f1 = per_class_report(matrix, class_names)
+    calibration_report = calibration(probabilities, labels, bins)
+
+    summary = {
+        'accuracy': round(float((predicted == labels).mean()) * 100, 2),
+        'macro_f1': macro_f1,
+        'top_k_accuracy': top_k_accuracy(probabilities, labels, top_k)
+    }
+    if not detailed:
+        summary.update({key: calibration_report[key] for key in ('ece', 'nll', 'brier')})
+        return summary
+
+    summary.update({
+        'calibration': calibration_report,
+        'confusion_matrix': matrix.tolist(),
+        'per_class': per_class
+    })
+    return summary
+
+
+def subset_ensembles(stacked, model_types, min_size=2):
+    """
+    Averaged probabilities of every subset of models (at least min_size
+    members) in one tensor product: stacked is (M, N, C) in model_types order;
+    returns the subsets and a (K, N, C) array
+    """
+    subsets = [list(combination) for size in range(min_size, len(model_types) + 1)
+               for combination in itertools.combinations(model_types, size)]
+    if not subsets:
+        return [], np.zeros((0,) + stacked.shape[1:], dtype=stacked.dtype)
+
+    weights = np.array([[1.0 if model_type in subset else 0.0 for model_type in model_types]
+                        for subset in subsets])
+    weights /= weights.sum(axis=1, keepdims=True)
+    return subsets, np.tensordot(weights, stacked, axes=(1, 0))
+
+
+class ModelEvaluation:
+    """
+    Scores the validation split with each trained model once and caches the
+    probabilities per model in cache/evaluation/{model}.npz. A cached file is
+    reused until the model file, the split or the class list changes.
+    """
+
+    def __init__(self, engine, data_dir='data', metrics_dir='metrics', cache_dir='cache', validation_split=0.2,
+                 batch_size=32, top_k=DEFAULT_TOP_K, calibration_bins=DEFAULT_CALIBRATION_BINS):
+        if not os.path.isdir(data_dir):
+            raise ValueError(f'Data folder not found: {data_dir}')
+
+        self.engine = engine
+        self.data_dir = data_dir
+        self.metrics_dir = metrics_dir
+        self.output_dir = os.path.join(cache_dir, 'evaluation')
+        self.validation_split = validation_split
+        self.batch_size = max(1, int(batch_size))
+        self.top_k = sorted({int(k) for k in top_k if int(k) > 0})
+        self.calibration_bins = max(1, int(calibration_bins))
+
+    def validation_set(self):
+        """(paths, labels as indices into the served class names, split fingerprint) of the validation split"""
+        class_names = self.engine.refresh_class_names()
+        if not class_names:
+            raise ValueError('Class indices not found. Please train models first.')
+
+        _, val_files, class_indices = list_split_files(self.data_dir, self.validation_split)
+        index_to_name = {index: name for name, index in class_indices.items()}
+        served = {name: i for i, name in enumerate(class_names)}
+
+        # Classes added to the data folder after training cannot be predicted; leave them out
+        pairs = [(path, served[index_to_name[label]]) for path, label in val_files
+                 if index_to_name[label] in served]
+        if not pairs:
+            raise ValueError('No validation images found for the trained classes')
+
+        paths, labels = zip(*pairs)
+        return list(paths), np.asarray(labels, dtype=np.int64), files_fingerprint(pairs)
+
+    def outputs_path(self, model_type):
+        return os.path.join(self.output_dir, f"{model_type}.npz")
+
+    def _cache_key(self, model_type, fingerprint):
+        return {
+            'model_version': self.engine.registry.model_version(model_type),
+            'split': fingerprint,
+            'class_names': list(self.engine.class_names)
+        }
+
+    def cached_outputs(self, model_type, fingerprint):
+        """(probabilities, ms per image) cached for the current model and split, or None"""
+        path = self.outputs_path(model_type)
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data['meta']))
+                if meta['key'] != self._cache_key(model_type, fingerprint):
+                    return None
+                return data['probabilities'], meta['ms_per_image']
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def validation_dataset(self, paths):
+        """Batched, prefetching pipeline that decodes the images in parallel, the same way served predictions do"""
+        dataset = tf.data.Dataset.from_tensor_slices(paths)
+        dataset = dataset.map(lambda path: decode_image_tensor(tf.io.read_file(path)),
+                              num_parallel_calls=tf.data.AUTOTUNE, deterministic=True)
+        return dataset.batch(self.batch_size).prefetch(tf.data.AUTOTUNE)
+
+    def score_models(self, paths, ensemble_mode):
+        """
+        {model: ((N, C) probabilities, ms per image)} from one pass over the
+        images through engine.predict_batch ('full' runs every ensemble member,
+        'student' the student), so the models run wherever the engine serves
+        them, including inference worker processes
+        """
+        class_names = list(self.engine.class_names)
+        rows, seconds = {}, {}
+        for images in self.validation_dataset(paths):
+            for individual_results, _ in self.engine.predict_batch(images.numpy(), ensemble_mode):
+                for result in individual_results:
+                    rows.setdefault(result.model_name, []).append(
+                        [result.all_probabilities[name] / 100 for name in class_names])
+                    seconds[result.model_name] = seconds.get(result.model_name, 0.0) + result.prediction_time
+
+        # A model that failed on some batch has fewer rows than images and is left out
+        return {model_type: (np.asarray(model_rows, dtype=np.float32), seconds[model_type] * 1000 / len(paths))
+                for model_type, model_rows in rows.items() if len(model_rows) == len(paths)}
+
+    def save_outputs(self, model_type, fingerprint, probabilities, ms_per_image):
+        meta = {
+            'key': self._cache_key(model_type, fingerprint),
+            # The models end in softmax, so their outputs are probabilities rather than logits
+            'output': 'softmax_probabilities',
+            'ms_per_image': ms_per_image,
+            'num_images': len(probabilities),
+            'created': datetime.now().isoformat()
+        }
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = self.outputs_path(model_type)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, probabilities=probabilities, meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+
+    def model_outputs(self, model_types, paths, fingerprint):
+        """
+        ({model: probabilities}, {model: ms per image}, models scored) on the
+        split: served from the cache files, and at most one scoring pass each
+        for the missing ensemble members and the student
+        """
+        probabilities, ms_per_image = {}, {}
+        for model_type in model_types:
+            cached = self.cached_outputs(model_type, fingerprint)
+            if cached is not None:
+                probabilities[model_type], ms_per_image[model_type] = cached
+
+        missing = [m for m in model_types if m not in probabilities]
+        scored = []
+        for ensemble_mode, members in (('full', [m for m in missing if m != STUDENT_MODEL]),
+                                       ('student', [m for m in missing if m == STUDENT_MODEL])):
+            if not members:
+                continue
+            print(f"🔬 Scoring {len(paths)} validation images with {', '.join(members)}")
+            outputs = self.score_models(paths, ensemble_mode)
+            for model_type in members:
+                if model_type not in outputs:
+                    raise RuntimeError(f'{model_type} could not score the validation split')
+                probabilities[model_type], ms_per_image[model_type] = outputs[model_type]
+                self.save_outputs(model_type, fingerprint, *outputs[model_type])
+                scored.append(model_type)
+
+        return ({m: probabilities[m] for m in model_types}, {m: ms_per_image[m] for m in model_types}, scored)
+
+    def trained_models(self, model_types=None):
+        """Servable models (ensemble members and the student) with a trained model file"""
+        model_types = model_types or list(SERVABLE_MODELS)
+        return [m for m in model_types if self.engine.registry.model_version(m) is not None]
+
+    def collect(self, model_types=None, progress_callback=None):
+        """Validation labels and {model: (N, C) probabilities}, scoring only models without cached outputs"""
+        paths, labels, fingerprint = self.validation_set()
+        model_types = self.trained_models(model_types)
+        if not model_types:
+            raise ValueError('No trained models available. Please train models first.')
+
+        probabilities, ms_per_image, scored = self.model_outputs(model_types, paths, fingerprint)
+        if progress_callback:
+            for model_type in model_types:
+                progress_callback(model_type)
+        return labels, probabilities, ms_per_image, scored
+
+    def evaluate_subset(self, model_types):
+        """Metrics of the averaged ensemble of some models, from cached outputs only"""
+        paths, labels, fingerprint = self.validation_set()
+        outputs = []
+        for model_type in model_types:
+            cached = self.cached_outputs(model_type, fingerprint)
+            if cached is None:
+                raise LookupError(f'No cached outputs for {model_type} on the current validation split; '
+                                  f'run the evaluation first')
+            outputs.append(cached[0])
+
+        result = summarize(np.mean(outputs, axis=0), labels, self.engine.class_names, self.top_k,
+                           self.calibration_bins)
+        return dict(result, models=list(model_types), validation_images=len(labels))
+
+    def run(self, model_types=None, progress_callback=None):
+        """Evaluate every trained model and every ensemble subset and write metrics/evaluation_report.json"""
+        start_time = time.time()
+        labels, probabilities, ms_per_image, scored = self.collect(model_types, progress_callback)
+        class_names = list(self.engine.class_names)
+        print(f"🔬 Evaluating {len(probabilities)} models on {len(labels)} validation images "
+              f"({len(scored)} scored, {len(probabilities) - len(scored)} from cached outputs)")
+
+        models = {}
+        for model_type, model_probabilities in probabilities.items():
+            models[model_type] = dict(
+                summarize(model_probabilities, labels, class_names, self.top_k, self.calibration_bins),
+                model_name=SERVABLE_MODELS.get(model_type, model_type),
+                ms_per_image=round(ms_per_image[model_type], 2)
+            )
+
+        # Ensembles combine the ensemble members; the student is a stand-in for them, not a member
+        members = [m for m in probabilities if m in ModelFactory.SUPPORTED_MODELS]
+        ensembles, full_ensemble = [], None
+        if len(members) > 1:
+            subsets, averaged = subset_ensembles(np.stack([probabilities[m] for m in members]), members)
+            for subset, subset_probabilities in zip(subsets, averaged):
+                ensembles.append(dict(
+                    summarize(subset_probabilities, labels, class_names, self.top_k, self.calibration_bins,
+                              detailed=False),
+                    models=subset
+                ))
+            full_ensemble = dict(
+                summarize(averaged[-1], labels, class_names, self.top_k, self.calibration_bins),
+                models=members
+            )
+            ensembles.sort(key=lambda row: (-row['accuracy'], len(row['models'])))
+
+        report = {
+            'timestamp': datetime.now().isoformat(),
+            'elapsed': round(time.time() - start_time, 2),
+            'data_dir': self.data_dir,
+            'validation_images': len(labels),
+            'class_names': class_names,
+            'backend': self.engine.registry.backend,
+            'scored_models': scored,
+            'models': models,
+            'full_ensemble': full_ensemble,
+            'ensembles': ensembles
+        }
+
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, EVALUATION_REPORT_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+
+        if ensembles:
+            best = ensembles[0]
+            print(f"✅ Best ensemble: {' + '.join(best['models'])} at {best['accuracy']}% "
+                  f"(full ensemble {full_ensemble['accuracy']}%)")
+        return report
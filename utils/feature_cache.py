@@ -0,0 +1,225 @@
+"""
+Frozen-backbone feature cache
+Stores backbone embeddings per model type in memory-mapped .npy files keyed by
+image content hash, so head-only training only runs the backbone on new or
+changed images
+"""
+
+import os
+import json
+import hashlib
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+import tensorflow as tf
+
+from utils.inference_utils import IMG_SIZE
+from utils.data_pipeline import load_and_resize
+
+HASH_INDEX_FILE = 'content_hashes.json'
+
+
+def file_content_hash(path, chunk_size=1024 * 1024):
+    """SHA-1 of a file's bytes"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on path (created if missing), held across processes until the block exits"""
+    with open(path, 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def write_json_atomic(data, path):
+    """Write JSON through a tmp file unique to this process, then swap it in"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class ContentHashIndex:
+    """
+    Remember content hashes by (path, size, mtime) so unchanged files are not re-read.
+    The index is shared by parallel training workers: save() merges this process's new
+    entries into the file under a lock instead of overwriting the others' entries.
+    """
+
+    def __init__(self, cache_dir):
+        self.index_path = os.path.join(cache_dir, HASH_INDEX_FILE)
+        self.lock_path = self.index_path + '.lock'
+        self.entries = self._read()
+        self.updates = {}
+
+    def _read(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        with open(self.index_path, 'r') as f:
+            return json.load(f)
+
+    @property
+    def dirty(self):
+        return bool(self.updates)
+
+    def hash(self, path):
+        stat = os.stat(path)
+        entry = self.entries.get(path)
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+
+        content_hash = file_content_hash(path)
+        self.entries[path] = self.updates[path] = [stat.st_size, stat.st_mtime_ns, content_hash]
+        return content_hash
+
+    def save(self):
+        if not self.updates:
+            return
+        with file_lock(self.lock_path):
+            entries = self._read()
+            entries.update(self.updates)
+            write_json_atomic(entries, self.index_path)
+        self.entries = entries
+        self.updates = {}
+
+
+class FeatureCache:
+    """
+    Append-only, memory-mapped embedding store for one model type.
+    Rows live in features_{model}.npy; features_{model}.json maps content hash to row.
+    """
+
+    def __init__(self, cache_dir, model_type, img_size=IMG_SIZE, weights_tag='imagenet'):
+        self.cache_dir = cache_dir
+        self.model_type = model_type
+        self.img_size = tuple(img_size)
+        self.weights_tag = str(weights_tag)
+        os.makedirs(cache_dir, exist_ok=True)
+
+        self.features_path = os.path.join(cache_dir, f"features_{model_type}.npy")
+        self.index_path = os.path.join(cache_dir, f"features_{model_type}.json")
+        self.hash_index = ContentHashIndex(cache_dir)
+        self.rows = {}
+        self.num_rows = 0
+        self.features = None
+        self._load()
+
+    def _load(self):
+        """Open the existing cache unless it was built for another resolution or backbone"""
+        if not (os.path.exists(self.index_path) and os.path.exists(self.features_path)):
+            return
+
+        with open(self.index_path, 'r') as f:
+            meta = json.load(f)
+
+        if tuple(meta.get('img_size', ())) != self.img_size or meta.get('weights') != self.weights_tag:
+            print(f"♻️ Feature cache for {self.model_type} is outdated, rebuilding")
+            return
+
+        self.rows = meta['rows']
+        self.num_rows = meta['num_rows']
+        self.features = np.load(self.features_path, mmap_mode='r+')
+
+    def _save_index(self):
+        meta = {
+            'model_type': self.model_type,
+            'img_size': list(self.img_size),
+            'weights': self.weights_tag,
+            'num_rows': self.num_rows,
+            'rows': self.rows
+        }
+        write_json_atomic(meta, self.index_path)
+        self.hash_index.save()
+
+    def _ensure_capacity(self, needed_rows, feature_dim):
+        """Grow the memory-mapped array (doubling) so it can hold needed_rows"""
+        if self.features is not None and self.features.shape[0] >= needed_rows \
+                and self.features.shape[1] == feature_dim:
+            return
+
+        capacity = max(needed_rows, 2 * (self.features.shape[0] if self.features is not None else 0), 256)
+        tmp_path = f"{self.features_path}.{os.getpid()}.tmp.npy"
+        grown = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(capacity, feature_dim))
+
+        if self.features is not None and self.features.shape[1] == feature_dim and self.num_rows:
+            grown[:self.num_rows] = self.features[:self.num_rows]
+        else:
+            self.rows, self.num_rows = {}, 0
+
+        grown.flush()
+        del grown
+        self.features = None
+        os.replace(tmp_path, self.features_path)
+        self.features = np.load(self.features_path, mmap_mode='r+')
+
+    def has_features(self, paths):
+        """True if every image's embedding is cached, so the backbone need not be loaded"""
+        return all(self.hash_index.hash(path) in self.rows for path in paths)
+
+    def get_features(self, paths, backbone, batch_size=32):
+        """
+        Return an (N, D) array of embeddings for paths, running the backbone
+        only for images whose content hash is not cached yet
+        """
+        hashes = [self.hash_index.hash(path) for path in paths]
+        missing = {}
+        for path, content_hash in zip(paths, hashes):
+            if content_hash not in self.rows and content_hash not in missing:
+                missing[content_hash] = path
+
+        if missing:
+            print(f"🧠 Computing {self.model_type} features for {len(missing)} new images "
+                  f"({len(paths) - len(missing)} cached)")
+            self._compute(list(missing.items()), backbone, batch_size)
+        else:
+            print(f"🧠 All {len(paths)} {self.model_type} features served from cache")
+            self.hash_index.save()
+
+        return np.asarray(self.features[[self.rows[h] for h in hashes]])
+
+    def _compute(self, items, backbone, batch_size):
+        """Run the frozen backbone over (hash, path) items and append the embeddings"""
+        feature_dim = int(backbone.output_shape[-1])
+        self._ensure_capacity(self.num_rows + len(items), feature_dim)
+
+        dataset = tf.data.Dataset.from_tensor_slices([path for _, path in items])
+        dataset = dataset.map(
+            lambda path: tf.cast(load_and_resize(path, self.img_size), tf.float32) / 255.0,
+            num_parallel_calls=tf.data.AUTOTUNE
+        ).batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+        offset = 0
+        for batch in dataset:
+            embeddings = np.asarray(backbone(batch, training=False))
+            start = self.num_rows
+            self.features[start:start + len(embeddings)] = embeddings
+
+            for content_hash, _ in items[offset:offset + len(embeddings)]:
+                self.rows[content_hash] = self.num_rows
+                self.num_rows += 1
+            offset += len(embeddings)
+
+        self.features.flush()
+        self._save_index()
@@ -0,0 +1,295 @@
+"""
+Inference benchmark suite
+Measures every trained model per serving backend, batch size and CPU thread
+count in a fresh worker process: warm-up, then timed forward passes reported
+as p50/p95/p99 latency, images/sec and peak RSS in metrics/benchmark_<model>.json
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import platform
+import multiprocessing as mp
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+
+from utils.model_registry import MODEL_BACKENDS, SERVABLE_MODELS, backend_model_path
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_BATCH_SIZES = (1, 8, 32)
+DEFAULT_WARMUP_RUNS = 5
+DEFAULT_TIMED_RUNS = 30
+
+
+def default_thread_counts():
+    """Single-threaded and all-cores configurations"""
+    return sorted({1, os.cpu_count() or 1})
+
+
+def peak_rss_mb():
+    """High-water mark of this process's resident memory in MB, or None if unavailable"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def latency_stats(timings, batch_size):
+    """Percentile latencies (ms per batch) and throughput from per-run seconds"""
+    timings_ms = np.asarray(timings) * 1000
+    p50, p95, p99 = np.percentile(timings_ms, [50, 95, 99])
+    mean_ms = float(timings_ms.mean())
+    return {
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'mean_ms': round(mean_ms, 2),
+        'min_ms': round(float(timings_ms.min()), 2),
+        'per_image_p50_ms': round(float(p50) / batch_size, 2),
+        'images_per_sec': round(batch_size * 1000 / mean_ms, 1) if mean_ms else 0.0
+    }
+
+
+def benchmark_path(metrics_dir, model_type):
+    return os.path.join(metrics_dir, f"benchmark_{model_type}.json")
+
+
+def load_benchmark(metrics_dir, model_type):
+    """Last benchmark report of a model, or None"""
+    path = benchmark_path(metrics_dir, model_type)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def best_result(report, backend='keras', batch_size=1):
+    """Fastest thread configuration measured for a backend at a batch size, or None"""
+    rows = [row for row in (report or {}).get('results', [])
+            if row['backend'] == backend and row.get('batch_size') == batch_size and 'p50_ms' in row]
+    return min(rows, key=lambda row: row['p50_ms']) if rows else None
+
+
+def speed_label(report, backend='keras'):
+    """Dashboard speed label from measured single-image latency, or None if not benchmarked"""
+    row = best_result(report, backend)
+    if row is None:
+        return None
+    return f"{row['p50_ms']:.1f} ms p50"
+
+
+def pin_worker_threads(threads):
+    """Limit a benchmark worker's math libraries and TensorFlow pools to a thread count"""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+
+    from utils.inference_utils import configure_tf_threads
+    return configure_tf_threads('sequential', threads, 1)
+
+
+def run_isolated(context, target, config, timeout):
+    """
+    Run target(config, results) in a fresh process and collect the rows it
+    puts on the results queue until it puts None. A crash or timeout becomes
+    an error row carrying config['error_keys'].
+    """
+    results = context.Queue()
+    process = context.Process(target=target, args=(config, results), daemon=True)
+    process.start()
+
+    rows = []
+    deadline = time.time() + timeout
+    failure = {key: config[key] for key in config.get('error_keys', ())}
+    try:
+        while True:
+            try:
+                row = results.get(timeout=max(0.1, min(1.0, deadline - time.time())))
+            except queue.Empty:
+                if time.time() > deadline:
+                    rows.append(dict(failure, error=f'Timed out after {timeout}s'))
+                    break
+                if not process.is_alive() and results.empty():
+                    rows.append(dict(failure, error=f'Worker exited with code {process.exitcode}'))
+                    break
+                continue
+            if row is None:
+                break
+            rows.append(row)
+    finally:
+        if process.is_alive():
+            process.terminate()
+        process.join(timeout=5)
+
+    return rows
+
+
+def _benchmark_worker(config, results):
+    """Worker process entry point: benchmark one model/backend/thread-count configuration"""
+    try:
+        threads = config['threads']
+        pin_worker_threads(threads)
+
+        from utils.inference_utils import IMG_SIZE
+        from utils.model_registry import ModelRegistry
+        rss_before_load = peak_rss_mb()
+
+        registry = ModelRegistry(config['models_dir'], backend=config['backend'], tflite_threads=threads)
+        load_start = time.perf_counter()
+        model = registry.get(config['model_type'])
+        load_ms = (time.perf_counter() - load_start) * 1000
+
+        rng = np.random.RandomState(0)
+        first_call_ms = None
+        for batch_size in config['batch_sizes']:
+            batch = rng.uniform(size=(batch_size, *IMG_SIZE, 3)).astype(np.float32)
+
+            warmup_timings = []
+            for _ in range(max(1, config['warmup'])):
+                start = time.perf_counter()
+                np.asarray(model(batch, training=False))
+                warmup_timings.append(time.perf_counter() - start)
+            if first_call_ms is None:
+                first_call_ms = warmup_timings[0] * 1000
+
+            timings = []
+            for _ in range(config['runs']):
+                start = time.perf_counter()
+                np.asarray(model(batch, training=False))
+                timings.append(time.perf_counter() - start)
+
+            results.put({
+                'backend': config['backend'],
+                'threads': threads,
+                'batch_size': batch_size,
+                'runs': config['runs'],
+                **latency_stats(timings, batch_size),
+                'warmup_ms': round(sum(warmup_timings) * 1000, 1),
+                'first_call_ms': round(first_call_ms, 1),
+                'load_ms': round(load_ms, 1),
+                'rss_before_load_mb': rss_before_load,
+                'peak_rss_mb': peak_rss_mb()
+            })
+
+    except Exception as e:
+        results.put({'backend': config['backend'], 'threads': config['threads'], 'error': str(e)})
+
+    finally:
+        results.put(None)
+
+
+class InferenceBenchmark:
+    """
+    Benchmark trained models. Every (backend, thread count) pair runs in its
+    own spawned process so TensorFlow thread pools can be sized freely and
+    peak RSS is not polluted by other models.
+    """
+
+    def __init__(self, models_dir='models', metrics_dir='metrics', batch_sizes=DEFAULT_BATCH_SIZES,
+                 thread_counts=None, backends=None, warmup=DEFAULT_WARMUP_RUNS, runs=DEFAULT_TIMED_RUNS,
+                 timeout=600):
+        unknown = [backend for backend in backends or [] if backend not in MODEL_BACKENDS]
+        if unknown:
+            raise ValueError(f"Unknown model backend: {', '.join(unknown)}")
+        if runs < 1:
+            raise ValueError('runs must be at least 1')
+
+        self.models_dir = models_dir
+        self.metrics_dir = metrics_dir
+        self.batch_sizes = sorted({int(b) for b in batch_sizes})
+        self.thread_counts = sorted({int(t) for t in thread_counts or default_thread_counts()})
+        self.backends = list(backends) if backends else list(MODEL_BACKENDS)
+        self.warmup = warmup
+        self.runs = runs
+        self.timeout = timeout
+        self._context = mp.get_context('spawn')
+
+    def available_backends(self, model_type):
+        """Requested backends that have an artifact on disk for a model"""
+        return [backend for backend in self.backends
+                if os.path.exists(backend_model_path(self.models_dir, model_type, backend))]
+
+    def benchmark_model(self, model_type, progress_callback=None):
+        """Benchmark one model on every available backend and write its report"""
+        backends = self.available_backends(model_type)
+        if not backends:
+            raise FileNotFoundError(f'Model {model_type} has not been trained')
+
+        start_time = time.time()
+        results = []
+        for backend in backends:
+            for threads in self.thread_counts:
+                print(f"⏱️ Benchmarking {model_type} ({backend}, {threads} threads)")
+                rows = run_isolated(self._context, _benchmark_worker, {
+                    'model_type': model_type,
+                    'models_dir': self.models_dir,
+                    'backend': backend,
+                    'threads': threads,
+                    'batch_sizes': self.batch_sizes,
+                    'warmup': self.warmup,
+                    'runs': self.runs,
+                    'error_keys': ('backend', 'threads')
+                }, self.timeout)
+                for row in rows:
+                    if 'error' in row:
+                        print(f"   ❌ {row['error']}")
+                    else:
+                        print(f"   batch {row['batch_size']}: p50 {row['p50_ms']} ms, "
+                              f"{row['images_per_sec']} images/sec, peak RSS {row['peak_rss_mb']} MB")
+                results.extend(rows)
+                if progress_callback:
+                    progress_callback(model_type, backend, threads)
+
+        errors = [row['error'] for row in results if 'error' in row]
+        if len(errors) == len(results):
+            # Keep the previous report rather than replacing measurements with failures
+            raise RuntimeError(errors[0] if errors else 'No benchmark results')
+
+        report = {
+            'model_type': model_type,
+            'model_name': SERVABLE_MODELS.get(model_type, model_type),
+            'timestamp': datetime.now().isoformat(),
+            'elapsed': round(time.time() - start_time, 1),
+            'settings': {
+                'batch_sizes': self.batch_sizes,
+                'thread_counts': self.thread_counts,
+                'backends': backends,
+                'warmup': self.warmup,
+                'runs': self.runs
+            },
+            'host': {
+                'cpu_count': os.cpu_count(),
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+                'tensorflow': tf.__version__
+            },
+            'results': results
+        }
+
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = benchmark_path(self.metrics_dir, model_type)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+        return report
+
+    def run(self, model_types=None, progress_callback=None):
+        """Benchmark several models (default: every trained one); returns {model_type: report or error}"""
+        model_types = model_types or [m for m in SERVABLE_MODELS if self.available_backends(m)]
+        reports = {}
+        for model_type in model_types:
+            try:
+                reports[model_type] = self.benchmark_model(model_type, progress_callback)
+            except Exception as e:
+                print(f"❌ Benchmark of {model_type} failed: {e}")
+                reports[model_type] = {'model_type': model_type, 'error': str(e)}
+        return reports
@@ -0,0 +1,330 @@
+"""
+Out-of-process inference workers
+Worker processes load the trained models once at start-up and run the
+micro-batches of the web process, so TensorFlow compute never competes with
+request handling for the GIL. Workers are spawned, not forked: TensorFlow's
+runtime is not fork-safe once its thread pools exist.
+"""
+
+import os
+import time
+import itertools
+import threading
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from concurrent.futures import Future
+
+from utils.inference_utils import InferenceEngine
+from utils.model_factory import ModelFactory
+from utils.model_registry import STUDENT_MODEL
+from utils.serving_metrics import MODEL_INFERENCE_IMAGES, MODEL_INFERENCE_SECONDS
+
+
+def _portable_error(error):
+    """An exception that survives pickling back to the web process (TensorFlow errors may not)"""
+    if type(error).__module__ == 'builtins':
+        return type(error)(str(error))
+    return RuntimeError(f'{type(error).__name__}: {error}')
+
+
+def _registry_snapshot(registry):
+    """Model cache counters and resident model memory of a worker, for the web process's /metrics"""
+    return {
+        'summary': registry.summary(),
+        'memory_bytes': registry.memory_usage(),
+        'status': {model_type: info for model_type, info in registry.status().items() if 'memory_mb' in info}
+    }
+
+
+def _inference_worker(config, conn):
+    """Worker process entry point: preload the models, then serve batches until told to stop"""
+    try:
+        from utils.inference_utils import configure_tf_threads
+        from utils.model_registry import ModelRegistry
+
+        configure_tf_threads(config['execution_mode'], config['intra_op_threads'], config['inter_op_threads'])
+        registry = ModelRegistry(
+            models_dir=config['models_dir'],
+            memory_budget_mb=config['memory_budget_mb'],
+            backend=config['backend'],
+            tflite_threads=config['intra_op_threads']
+        )
+        engine = InferenceEngine(
+            models_dir=config['models_dir'],
+            metrics_dir=config['metrics_dir'],
+            registry=registry,
+            execution_mode=config['execution_mode'],
+            ensemble_mode=config['ensemble_mode'],
+            cascade_confidence=config['cascade_confidence'],
+            cascade_agreement=config['cascade_agreement']
+        )
+
+        # Load every trained model before accepting work, so no request pays for a cold start
+        loading_status = engine.load_all_models('full')
+        if os.path.exists(registry.model_path(STUDENT_MODEL)):
+            loading_status.update(engine.load_all_models('student'))
+    except Exception as e:
+        conn.send(('failed', None, str(e)))
+        return
+
+    conn.send(('ready', None, {'pid': os.getpid(), 'models': loading_status, 'registry': _registry_snapshot(registry)}))
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+
+        job_id, image_batch, ensemble_mode = job
+        try:
+            conn.send(('result', job_id, engine.predict_batch(image_batch, ensemble_mode)))
+        except Exception as e:
+            conn.send(('error', job_id, _portable_error(e)))
+        conn.send(('registry', None, _registry_snapshot(registry)))
+
+
+class ProcessInferenceEngine(InferenceEngine):
+    """
+    InferenceEngine whose forward passes run in a pool of worker processes.
+    Class names, benchmark labels, cache keys and model versions are still
+    answered in this process from the files on disk; predict_batch ships the
+    preprocessed batch to an idle worker over its own pipe. Workers pick up
+    retrained models through their own registry, and a worker that dies is
+    restarted.
+    """
+
+    def __init__(self, models_dir='models', metrics_dir='metrics', registry=None, execution_mode='sequential',
+                 ensemble_mode='full', cascade_confidence=90.0, cascade_agreement=100.0, workers=1,
+                 intra_op_threads=0, inter_op_threads=0, memory_budget_mb=None, startup_timeout=300,
+                 request_timeout=120):
+        super().__init__(models_dir, metrics_dir, registry, execution_mode, ensemble_mode,
+                         cascade_confidence, cascade_agreement)
+        self.workers = max(1, int(workers))
+        self.startup_timeout = startup_timeout
+        self.request_timeout = request_timeout
+        # Split the cores between the workers unless the thread pools are sized explicitly
+        cpu_count = os.cpu_count() or 1
+        self.worker_config = {
+            'models_dir': models_dir,
+            'metrics_dir': metrics_dir,
+            'backend': self.registry.backend,
+            'memory_budget_mb': memory_budget_mb,
+            'execution_mode': execution_mode,
+            'ensemble_mode': ensemble_mode,
+            'cascade_confidence': self.cascade_confidence,
+            'cascade_agreement': self.cascade_agreement,
+            'intra_op_threads': intra_op_threads or max(1, cpu_count // self.workers),
+            'inter_op_threads': inter_op_threads
+        }
+        self._context = mp.get_context('spawn')
+        self._processes = {}
+        self._connections = {}
+        self._worker_info = {}
+        self._idle = set()
+        self._running_jobs = {}
+        self._pending = {}
+        self._job_ids = itertools.count()
+        self._dispatcher = None
+        self._start_lock = threading.Lock()
+        # Guards the worker tables above; notified when a worker becomes ready or idle
+        self._state = threading.Condition()
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Spawn the workers and block until each has loaded its models"""
+        with self._start_lock:
+            if self._dispatcher is not None and self._dispatcher.is_alive():
+                return self
+
+            self._stopped.clear()
+            with self._state:
+                for worker_id in range(self.workers):
+                    self._spawn(worker_id)
+
+            self._dispatcher = threading.Thread(target=self._dispatch, name='inference-dispatcher', daemon=True)
+            self._dispatcher.start()
+
+            deadline = time.time() + self.startup_timeout
+            with self._state:
+                while (len(self._worker_info) < self.workers and not self._startup_failures()
+                       and time.time() < deadline):
+                    self._state.wait(timeout=1.0)
+                failed = self._startup_failures()
+                ready = len(self._worker_info) == self.workers
+
+            if failed or not ready:
+                self.stop()
+                raise RuntimeError(f"Inference workers failed to start: {failed[0] if failed else 'timed out'}")
+
+        print(f"✅ {self.workers} inference worker(s) ready "
+              f"({self.worker_config['intra_op_threads']} intra-op threads each)")
+        return self
+
+    def stop(self, timeout=10):
+        """Ask the workers to exit and terminate any that do not"""
+        self._stopped.set()
+        with self._state:
+            processes, connections = dict(self._processes), dict(self._connections)
+            self._processes.clear()
+            self._connections.clear()
+            self._worker_info.clear()
+            self._idle.clear()
+            self._running_jobs.clear()
+            pending, self._pending = self._pending, {}
+
+        for conn in connections.values():
+            try:
+                conn.send(None)
+            except (OSError, ValueError):
+                pass
+        for process in processes.values():
+            process.join(timeout=timeout)
+            if process.is_alive():
+                process.terminate()
+        for conn in connections.values():
+            conn.close()
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError('Inference workers stopped'))
+
+    def _spawn(self, worker_id):
+        """Start (or restart) one worker process; caller holds self._state"""
+        self._worker_info.pop(worker_id, None)
+        self._idle.discard(worker_id)
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_inference_worker,
+            args=(self.worker_config, child_conn),
+            name=f'inference-{worker_id}',
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+        self._processes[worker_id] = process
+        self._connections[worker_id] = parent_conn
+        print(f"🧵 Started inference worker {worker_id} (pid {process.pid})")
+
+    def _startup_failures(self):
+        """Errors of workers that could not load their models or died before reporting ready"""
+        failed = [info['error'] for info in self._worker_info.values() if 'error' in info]
+        failed += [f'worker {worker_id} exited with code {process.exitcode}'
+                   for worker_id, process in self._processes.items()
+                   if not process.is_alive() and worker_id not in self._worker_info]
+        return failed
+
+    def _dispatch(self):
+        """Route worker responses to the waiting futures and restart workers that died"""
+        while not self._stopped.is_set():
+            with self._state:
+                connections = {conn: worker_id for worker_id, conn in self._connections.items()}
+                sentinels = {process.sentinel: worker_id for worker_id, process in self._processes.items()}
+
+            for ready in wait(list(connections) + list(sentinels), timeout=1.0):
+                if ready in connections:
+                    try:
+                        message = ready.recv()
+                    except (EOFError, OSError):
+                        continue
+                    self._handle(connections[ready], *message)
+                elif not self._stopped.is_set():
+                    self._worker_exited(sentinels[ready])
+
+    def _handle(self, worker_id, kind, job_id, payload):
+        """Apply one message from a worker"""
+        future = None
+        with self._state:
+            if kind == 'ready':
+                self._worker_info[worker_id] = payload
+                self._idle.add(worker_id)
+            elif kind == 'failed':
+                self._worker_info[worker_id] = {'error': payload}
+            elif kind == 'registry':
+                if worker_id in self._worker_info:
+                    self._worker_info[worker_id]['registry'] = payload
+                return
+            else:
+                self._running_jobs.pop(worker_id, None)
+                self._idle.add(worker_id)
+                future = self._pending.pop(job_id, None)
+            self._state.notify_all()
+
+        if future is not None and not future.done():
+            if kind == 'result':
+                future.set_result(payload)
+            else:
+                future.set_exception(payload)
+
+    def _worker_exited(self, worker_id):
+        """Fail the batch a crashed worker was running and start a replacement"""
+        with self._state:
+            process = self._processes.get(worker_id)
+            # Workers that never got ready are reported by start() instead of restarted in a loop
+            if process is None or process.is_alive() or 'pid' not in self._worker_info.get(worker_id, {}):
+                return
+            print(f"⚠️ Inference worker {worker_id} exited with code {process.exitcode}; restarting")
+            future = self._pending.pop(self._running_jobs.pop(worker_id, None), None)
+            self._connections.pop(worker_id).close()
+            self._spawn(worker_id)
+
+        if future is not None and not future.done():
+            future.set_exception(RuntimeError(f'Inference worker exited with code {process.exitcode}'))
+
+    def load_all_models(self, ensemble_mode=None):
+        """Per-model status from the files on disk; the workers hold the models themselves"""
+        self.refresh_class_names()
+        ensemble_mode = ensemble_mode or self.ensemble_mode
+        model_types = [STUDENT_MODEL] if ensemble_mode == 'student' else ModelFactory.SUPPORTED_MODELS
+        return {model_type: 'loaded' if os.path.exists(self.registry.model_path(model_type)) else 'not_found'
+                for model_type in model_types}
+
+    def predict_batch(self, image_batch, ensemble_mode=None, timeout=None):
+        """Run a preprocessed (N, H, W, 3) batch on an idle worker; same results as InferenceEngine"""
+        self.start()
+        timeout = timeout or self.request_timeout
+        job_id = next(self._job_ids)
+        future = Future()
+
+        with self._state:
+            if not self._state.wait_for(lambda: self._idle, timeout=timeout):
+                raise RuntimeError('No inference worker became available')
+            worker_id = self._idle.pop()
+            self._running_jobs[worker_id] = job_id
+            self._pending[job_id] = future
+            conn = self._connections[worker_id]
+
+        try:
+            conn.send((job_id, image_batch, ensemble_mode or self.ensemble_mode))
+            batch_results = future.result(timeout=timeout)
+        finally:
+            with self._state:
+                self._pending.pop(job_id, None)
+
+        # The forward passes ran in the worker; record them in this process's /metrics
+        batch_size = len(batch_results)
+        for individual_results, _ in batch_results[:1]:
+            for result in individual_results:
+                MODEL_INFERENCE_SECONDS.observe(result.prediction_time * batch_size, model=result.model_name,
+                                                backend=self.registry.backend)
+                MODEL_INFERENCE_IMAGES.inc(batch_size, model=result.model_name, backend=self.registry.backend)
+        return batch_results
+
+    def registry_stats(self):
+        """{worker id: model cache counters and resident models} as last reported by each live worker"""
+        with self._state:
+            return {worker_id: info['registry'] for worker_id, info in self._worker_info.items()
+                    if 'registry' in info}
+
+    def worker_status(self):
+        """Pid, liveness and preloaded models of every worker"""
+        with self._state:
+            return {
+                worker_id: {
+                    'pid': process.pid,
+                    'alive': process.is_alive(),
+                    'busy': worker_id in self._running_jobs,
+                    'models': self._worker_info.get(worker_id, {}).get('models', {})
+                }
+                for worker_id, process in self._processes.items()
+            }
@@ -0,0 +1,459 @@
+"""
+In-memory inference utilities
+Decodes an uploaded image once and shares the preprocessed tensor across all trained models
+"""
+
+import io
+import os
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import tensorflow as tf
+from PIL import Image
+
+from utils.model_factory import ModelFactory
+from utils.model_registry import SERVABLE_MODELS, STUDENT_MODEL, ModelRegistry
+from utils.inference_benchmark import benchmark_path, best_result, load_benchmark, speed_label
+from utils.serving_metrics import (IMAGE_DECODE_SECONDS, MODEL_INFERENCE_ERRORS, MODEL_INFERENCE_IMAGES,
+                                   MODEL_INFERENCE_SECONDS)
+# Defined in the TensorFlow-free prediction types; re-exported for existing imports
+from utils.prediction_types import EnsemblePrediction, ModelPrediction
+
+# Must match the preprocessing used by flow_from_directory during training
+IMG_SIZE = (224, 224)
+CLASS_INDICES_FILE = 'class_indices.json'
+EXECUTION_MODES = ('sequential', 'parallel')
+ENSEMBLE_MODES = ('full', 'cascade', 'student')
+# Cascade order for models without a benchmark report, fastest first
+CASCADE_FALLBACK_ORDER = ('mobilenet', 'efficientnet', 'resnet', 'densenet')
+
+
+def decode_image_bytes(image_bytes, target_size=IMG_SIZE):
+    """Decode raw image bytes into a (1, H, W, 3) float32 tensor scaled to [0, 1]"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert('RGB')
+        if img.size != target_size:
+            img = img.resize(target_size, Image.NEAREST)
+        array = np.asarray(img, dtype=np.float32) / 255.0
+    return np.expand_dims(array, axis=0)
+
+
+def cascade_exit_mask(stage_probabilities, confidence_threshold, agreement_threshold):
+    """
+    Early-exit test of the cascade for a batch: given the (N, C) probability
+    arrays of the models run so far, return a boolean (N,) mask of the images
+    whose averaged ensemble is confident enough and whose models agree enough
+    (both thresholds in percent, as reported by the ensemble)
+    """
+    probabilities = np.stack(stage_probabilities)
+    average = probabilities.mean(axis=0)
+    ensemble_class = average.argmax(axis=1)
+    confidence = average.max(axis=1) * 100
+    agreement = (probabilities.argmax(axis=2) == ensemble_class).mean(axis=0) * 100
+    return (confidence >= confidence_threshold) & (agreement >= agreement_threshold)
+
+
+def result_complete(ensemble_result):
+    """True if every model the ensemble mode called for produced a result (safe to cache)"""
+    return ensemble_result is not None and not ensemble_result.models_failed
+
+
+def configure_tf_threads(execution_mode='sequential', intra_op_threads=0, inter_op_threads=0):
+    """
+    Configure TensorFlow thread pools before the runtime starts.
+    In parallel mode the CPU cores are split across the models that run
+    concurrently unless explicit thread counts are given.
+    """
+    if execution_mode == 'parallel':
+        num_models = len(ModelFactory.SUPPORTED_MODELS)
+        intra_op_threads = intra_op_threads or max(1, (os.cpu_count() or 1) // num_models)
+        inter_op_threads = inter_op_threads or num_models
+
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        print(f"⚠️ TensorFlow thread configuration error: {e}")
+
+    return {
+        'intra_op_threads': tf.config.threading.get_intra_op_parallelism_threads(),
+        'inter_op_threads': tf.config.threading.get_inter_op_parallelism_threads()
+    }
+
+
+def find_class_indices(*search_dirs):
+    """Return the path of the first class indices file found, or None"""
+    for directory in search_dirs:
+        if directory:
+            indices_path = os.path.join(directory, CLASS_INDICES_FILE)
+            if os.path.exists(indices_path):
+                return indices_path
+    return None
+
+
+def load_class_names(*search_dirs):
+    """Load class names ordered by training index from the first class indices file found"""
+    indices_path = find_class_indices(*search_dirs)
+    if not indices_path:
+        return []
+
+    with open(indices_path, 'r') as f:
+        class_indices = json.load(f)
+
+    if isinstance(class_indices, list):
+        return list(class_indices)
+
+    # Keras stores {class_name: index}; accept the inverted form as well
+    if all(isinstance(v, int) for v in class_indices.values()):
+        return [name for name, _ in sorted(class_indices.items(), key=lambda item: item[1])]
+    return [class_indices[k] for k in sorted(class_indices, key=int)]
+
+
+class InferenceEngine:
+    """
+    Runs trained models on one shared, preprocessed image tensor: every model
+    ('full' ensemble mode), fastest first, escalating to slower models only
+    while the ensemble is below the confidence/agreement thresholds ('cascade'),
+    or only the student distilled from the ensemble ('student')
+    """
+
+    def __init__(self, models_dir='models', metrics_dir='metrics', registry=None, execution_mode='sequential',
+                 ensemble_mode='full', cascade_confidence=90.0, cascade_agreement=100.0):
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(f'Unknown execution mode: {execution_mode}')
+        if ensemble_mode not in ENSEMBLE_MODES:
+            raise ValueError(f'Unknown ensemble mode: {ensemble_mode}')
+
+        self.models_dir = models_dir
+        self.metrics_dir = metrics_dir
+        self.registry = registry or ModelRegistry(models_dir)
+        self.execution_mode = execution_mode
+        self.ensemble_mode = ensemble_mode
+        self.cascade_confidence = float(cascade_confidence)
+        self.cascade_agreement = float(cascade_agreement)
+        self.class_names = []
+        self.model_info = ModelFactory.get_model_info()
+        self._class_indices_mtime = None
+        self._benchmark_reports = {}
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def refresh_class_names(self):
+        """Reload class names when the class indices file changes after retraining"""
+        indices_path = find_class_indices(self.models_dir, self.metrics_dir)
+        mtime = os.path.getmtime(indices_path) if indices_path else None
+
+        with self._lock:
+            if mtime != self._class_indices_mtime:
+                self.class_names = load_class_names(self.models_dir, self.metrics_dir)
+                self._class_indices_mtime = mtime
+
+        return self.class_names
+
+    def load_all_models(self, ensemble_mode=None):
+        """Make sure the models an ensemble mode uses are resident (within the registry budget); per-model status"""
+        self.refresh_class_names()
+        loading_status = {}
+        ensemble_mode = ensemble_mode or self.ensemble_mode
+        model_types = [STUDENT_MODEL] if ensemble_mode == 'student' else ModelFactory.SUPPORTED_MODELS
+
+        for model_type in model_types:
+            if not os.path.exists(self.registry.model_path(model_type)):
+                loading_status[model_type] = 'not_found'
+                continue
+
+            try:
+                self.registry.get(model_type)
+                loading_status[model_type] = 'loaded'
+            except Exception as e:
+                print(f"❌ Error loading {model_type}: {e}")
+                loading_status[model_type] = f'error: {e}'
+
+        self.registry.check_budget([m for m, state in loading_status.items() if state == 'loaded'])
+        return loading_status
+
+    def benchmark_report(self, model_type):
+        """Report from metrics/benchmark_<model>.json, re-read only when the file changes; None if absent"""
+        path = benchmark_path(self.metrics_dir, model_type)
+        mtime = os.path.getmtime(path) if os.path.exists(path) else None
+        cached = self._benchmark_reports.get(model_type)
+        if cached is None or cached[0] != mtime:
+            report = None
+            if mtime is not None:
+                try:
+                    report = load_benchmark(self.metrics_dir, model_type)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Could not read benchmark for {model_type}: {e}")
+            cached = (mtime, report)
+            self._benchmark_reports[model_type] = cached
+        return cached[1]
+
+    def speed_label(self, model_type):
+        """Measured speed label from the benchmark report, else the static model info label"""
+        label = speed_label(self.benchmark_report(model_type), self.registry.backend)
+        return label or self.model_info.get(model_type, {}).get('speed', '')
+
+    def model_latency_ms(self, model_type):
+        """Measured single-image p50 latency for the serving backend, or None if not benchmarked"""
+        row = best_result(self.benchmark_report(model_type), self.registry.backend)
+        return row['p50_ms'] if row else None
+
+    def cascade_order(self, model_types=None):
+        """Trained models ordered fastest first: by benchmarked latency, then the fallback order"""
+        model_types = self.registry.available_models() if model_types is None else model_types
+
+        def sort_key(model_type):
+            latency = self.model_latency_ms(model_type)
+            fallback = (CASCADE_FALLBACK_ORDER.index(model_type) if model_type in CASCADE_FALLBACK_ORDER
+                        else len(CASCADE_FALLBACK_ORDER))
+            return (latency is None, latency or 0.0, fallback)
+
+        return sorted(model_types, key=sort_key)
+
+    def cache_variant(self, ensemble_mode=None):
+        """Suffix distinguishing cached results of an ensemble mode (empty for the full ensemble)"""
+        ensemble_mode = ensemble_mode or self.ensemble_mode
+        if ensemble_mode == 'full':
+            return ''
+        if ensemble_mode == 'student':
+            return 'student'
+        return f"cascade:{self.cascade_confidence:g}:{self.cascade_agreement:g}:{','.join(self.cascade_order())}"
+
+    def model_versions(self, ensemble_mode=None):
+        """
+        {model_type: file version} of the trained models an ensemble mode runs,
+        used to key cached predictions: retraining the student leaves cached
+        ensemble results valid, and retraining an ensemble model leaves the
+        student's
+        """
+        ensemble_mode = ensemble_mode or self.ensemble_mode
+        model_types = [STUDENT_MODEL] if ensemble_mode == 'student' else ModelFactory.SUPPORTED_MODELS
+        versions = {model_type: self.registry.model_version(model_type) for model_type in model_types}
+        return {model_type: version for model_type, version in versions.items() if version}
+
+    def predict_image_bytes(self, image_bytes, ensemble_mode=None):
+        """Decode image bytes in memory and predict with the loaded models"""
+        with IMAGE_DECODE_SECONDS.time():
+            image_tensor = decode_image_bytes(image_bytes)
+        return self.predict_all_models(image_tensor, ensemble_mode)
+
+    def predict_all_models(self, image_tensor,
+                           ensemble_mode=None) -> Tuple[List[ModelPrediction], Optional[EnsemblePrediction]]:
+        """Predict a preprocessed (1, H, W, 3) tensor with the loaded models"""
+        return self.predict_batch(image_tensor, ensemble_mode)[0]
+
+    def predict_batch(self, image_batch,
+                      ensemble_mode=None) -> List[Tuple[List[ModelPrediction], Optional[EnsemblePrediction]]]:
+        """
+        Predict a preprocessed (N, H, W, 3) batch with one forward pass per model.
+        Returns one (individual_results, ensemble_result) pair per image; each
+        prediction_time is the model's batch time amortized over the batch.
+        ensemble_mode defaults to the engine's mode.
+        """
+        ensemble_mode = ensemble_mode or self.ensemble_mode
+        if ensemble_mode not in ENSEMBLE_MODES:
+            raise ValueError(f'Unknown ensemble mode: {ensemble_mode}')
+        if not self.refresh_class_names():
+            raise ValueError('Class indices not found. Please train models first.')
+
+        image_batch = tf.convert_to_tensor(image_batch, dtype=tf.float32)
+        if ensemble_mode == 'cascade':
+            return self._predict_cascade(image_batch)
+
+        batch_size = int(image_batch.shape[0])
+        per_image_results = [[] for _ in range(batch_size)]
+        if ensemble_mode == 'student':
+            if not os.path.exists(self.registry.model_path(STUDENT_MODEL)):
+                raise ValueError('The student model has not been trained. Please run distillation first.')
+            model_types = [STUDENT_MODEL]
+        else:
+            model_types = self.registry.available_models()
+
+        wall_start = time.perf_counter()
+        if self.execution_mode == 'parallel' and len(model_types) > 1:
+            # TensorFlow releases the GIL while ops run, so the backbones overlap
+            executor = self._get_executor()
+            outputs = list(executor.map(lambda model_type: self._run_model(model_type, image_batch), model_types))
+        else:
+            outputs = [self._run_model(model_type, image_batch) for model_type in model_types]
+        wall_time = time.perf_counter() - wall_start
+
+        models_failed = [model_type for model_type, output in zip(model_types, outputs) if output is None]
+        for output in outputs:
+            if output is None:
+                continue
+            model_type, probabilities, model_time = output
+            prediction_time = model_time / batch_size
+
+            for i in range(batch_size):
+                per_image_results[i].append(self._build_prediction(model_type, probabilities[i], prediction_time))
+
+        batch_results = []
+        for results in per_image_results:
+            ensemble_result = self._build_ensemble(results)
+            if ensemble_result:
+                ensemble_result.wall_time = wall_time / batch_size
+                ensemble_result.ensemble_mode = ensemble_mode
+                ensemble_result.models_failed = list(models_failed)
+            batch_results.append((results, ensemble_result))
+
+        return batch_results
+
+    def _predict_cascade(self, image_batch):
+        """
+        Early-exit ensemble: run the models fastest first, each on the images
+        that have not exited yet, and stop for an image once the ensemble of
+        the models run so far meets both cascade thresholds
+        """
+        batch_size = int(image_batch.shape[0])
+        per_image_results = [[] for _ in range(batch_size)]
+        # One (N, C) array per model run; rows of images that exited earlier stay unused
+        stage_probabilities = []
+        wall_times = np.zeros(batch_size)
+        models_failed = []
+        active = np.arange(batch_size)
+
+        for model_type in self.cascade_order():
+            if not len(active):
+                break
+
+            stage_batch = image_batch if len(active) == batch_size else tf.gather(image_batch, active)
+            output = self._run_model(model_type, stage_batch)
+            if output is None:
+                models_failed.append(model_type)
+                continue
+
+            _, probabilities, model_time = output
+            prediction_time = model_time / len(active)
+            wall_times[active] += prediction_time
+            for row, i in enumerate(active):
+                per_image_results[i].append(self._build_prediction(model_type, probabilities[row], prediction_time))
+
+            stage = np.zeros((batch_size, probabilities.shape[1]), dtype=np.float32)
+            stage[active] = probabilities
+            stage_probabilities.append(stage)
+
+            exit_mask = cascade_exit_mask([stage[active] for stage in stage_probabilities],
+                                          self.cascade_confidence, self.cascade_agreement)
+            active = active[~exit_mask]
+
+        batch_results = []
+        for i, results in enumerate(per_image_results):
+            ensemble_result = self._build_ensemble(results)
+            if ensemble_result:
+                ensemble_result.wall_time = float(wall_times[i])
+                ensemble_result.ensemble_mode = 'cascade'
+                ensemble_result.models_failed = list(models_failed)
+            batch_results.append((results, ensemble_result))
+
+        return batch_results
+
+    def _run_model(self, model_type, image_batch):
+        """Run one model's forward pass; returns (model_type, probabilities, seconds) or None on failure"""
+        try:
+            model = self.registry.get(model_type)
+        except Exception as e:
+            print(f"❌ Skipping {model_type}: {e}")
+            MODEL_INFERENCE_ERRORS.inc(model=model_type)
+            return None
+
+        start_time = time.perf_counter()
+        probabilities = np.asarray(model(image_batch, training=False))
+        elapsed = time.perf_counter() - start_time
+        MODEL_INFERENCE_SECONDS.observe(elapsed, model=model_type, backend=self.registry.backend)
+        MODEL_INFERENCE_IMAGES.inc(len(probabilities), model=model_type, backend=self.registry.backend)
+        return model_type, probabilities, elapsed
+
+    def _get_executor(self):
+        """Thread pool with one worker per supported model"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=len(ModelFactory.SUPPORTED_MODELS),
+                        thread_name_prefix='model-exec'
+                    )
+        return self._executor
+
+    def _build_prediction(self, model_type, probabilities, prediction_time):
+        """Convert a probability vector into a ModelPrediction"""
+        info = self.model_info.get(model_type, {})
+        all_probabilities = {
+            class_name: float(probabilities[i]) * 100
+            for i, class_name in enumerate(self.class_names)
+        }
+        best_index = int(np.argmax(probabilities))
+
+        return ModelPrediction(
+            model_name=model_type,
+            model_display_name=SERVABLE_MODELS.get(model_type, model_type),
+            predicted_class=self.class_names[best_index],
+            confidence=float(probabilities[best_index]) * 100,
+            all_probabilities=all_probabilities,
+            prediction_time=prediction_time,
+            model_params=info.get('params', ''),
+            model_speed=self.speed_label(model_type)
+        )
+
+    def _build_ensemble(self, individual_results):
+        """Combine individual predictions by probability averaging and majority vote"""
+        if not individual_results:
+            return None
+
+        average_probabilities = {
+            class_name: float(np.mean([r.all_probabilities[class_name] for r in individual_results]))
+            for class_name in self.class_names
+        }
+
+        voting_results = {}
+        for result in individual_results:
+            voting_results[result.predicted_class] = voting_results.get(result.predicted_class, 0) + 1
+
+        predicted_class = max(average_probabilities, key=average_probabilities.get)
+        model_agreement = voting_results.get(predicted_class, 0) / len(individual_results) * 100
+
+        return EnsemblePrediction(
+            predicted_class=predicted_class,
+            confidence=average_probabilities[predicted_class],
+            model_agreement=model_agreement,
+            voting_results=voting_results,
+            average_probabilities=average_probabilities,
+            models_run=[result.model_name for result in individual_results]
+        )
+
+
+def format_model_prediction(result):
+    """Serialize a ModelPrediction the way the prediction API returns it"""
+    return {
+        'model_name': result.model_name,
+        'model_display_name': result.model_display_name,
+        'predicted_class': result.predicted_class,
+        'confidence': round(result.confidence, 2),
+        'all_probabilities': {k: round(v, 2) for k, v in result.all_probabilities.items()},
+        'prediction_time': round(result.prediction_time * 1000, 1),  # Convert to ms
+        'model_params': result.model_params,
+        'model_speed': result.model_speed
+    }
+
+
+def format_ensemble_prediction(ensemble_result):
+    """Serialize an EnsemblePrediction the way the prediction API returns it"""
+    if not ensemble_result:
+        return None
+
+    return {
+        'predicted_class': ensemble_result.predicted_class,
+        'confidence': round(ensemble_result.confidence, 2),
+        'model_agreement': round(ensemble_result.model_agreement, 1),
+        'voting_results': ensemble_result.voting_results,
+        'average_probabilities': {k: round(v, 2) for k, v in ensemble_result.average_probabilities.items()},
+        'total_time': round(ensemble_result.wall_time * 1000, 1),  # Convert to ms
+        'ensemble_mode': ensemble_result.ensemble_mode,
+        'models_run': ensemble_result.models_run
+    }
@@ -0,0 +1,246 @@
+"""
+Bulk training-image ingestion
+Validates uploads or zip/tar archives of class folders in a worker pool:
+full decode check, exact and optional perceptual (dHash) de-duplication
+against the dataset index, and pre-resizing to the training resolution.
+Every input file gets a per-file result.
+"""
+
+import io
+import os
+import time
+import hashlib
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image, UnidentifiedImageError
+from werkzeug.utils import secure_filename
+
+from utils.inference_utils import IMG_SIZE
+from utils.batch_prediction import is_image_file, iter_source_images
+from utils.dataset_index import dhash, hamming_distances
+
+DEDUP_MODES = ('none', 'exact', 'perceptual')
+DEFAULT_MAX_PIXELS = 100_000_000
+
+
+def iter_archive_items(source):
+    """Yield (name, class_name, bytes) from a directory, zip or tar of <class>/<image> entries"""
+    for name, data in iter_source_images(source):
+        parts = [part for part in name.replace('\\', '/').split('/') if part]
+        # The class is the folder that directly contains the image
+        yield name, parts[-2] if len(parts) >= 2 else None, data
+
+
+def iter_upload_items(uploads):
+    """Yield (name, class_name, bytes) from (file_object_or_path, class_name, filename) triples"""
+    for upload, class_name, filename in uploads:
+        if isinstance(upload, str):
+            with open(upload, 'rb') as f:
+                data = f.read()
+        else:
+            data = upload.read()
+        yield filename, class_name, data
+
+
+class IngestionPipeline:
+    """
+    Decode, hash and pre-resize images in parallel; de-duplicate, write and
+    index them in input order on the calling thread.
+    """
+
+    def __init__(self, data_dir, dataset_index, img_size=IMG_SIZE, workers=None, dedup='exact',
+                 phash_threshold=6, pre_resize=True, max_pixels=DEFAULT_MAX_PIXELS, jpeg_quality=95):
+        if dedup not in DEDUP_MODES:
+            raise ValueError(f"dedup must be one of {', '.join(DEDUP_MODES)}")
+        self.data_dir = data_dir
+        self.dataset_index = dataset_index
+        self.short_side = max(img_size)
+        self.workers = workers or min(8, os.cpu_count() or 1)
+        self.dedup = dedup
+        self.phash_threshold = phash_threshold
+        self.pre_resize = pre_resize
+        self.max_pixels = max_pixels
+        self.jpeg_quality = jpeg_quality
+
+    def _target_size(self, width, height):
+        """Downscaled size whose shorter side matches the training resolution, or None"""
+        if not self.pre_resize or min(width, height) <= self.short_side:
+            return None
+        scale = self.short_side / min(width, height)
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def _process(self, name, class_name, data):
+        """Worker: validate and transform one image (no shared state)"""
+        result = {'source': name, 'class_name': class_name, 'bytes_in': len(data)}
+        result['source_hash'] = hashlib.sha1(data).hexdigest()
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                image_format = img.format
+                width, height = img.size
+                result.update(original_width=width, original_height=height)
+                if width * height > self.max_pixels:
+                    raise ValueError(f'Image has {width * height} pixels, limit is {self.max_pixels}')
+
+                target = self._target_size(width, height)
+                if target and image_format == 'JPEG':
+                    # Let libjpeg decode at a reduced DCT scale that still covers the target
+                    img.draft('RGB', target)
+                img.load()
+                rgb = img.convert('RGB')
+        except UnidentifiedImageError:
+            return dict(result, status='invalid', error='Unrecognized image format')
+        except Exception as e:
+            return dict(result, status='invalid', error=str(e)[:200])
+
+        result['phash'] = dhash(rgb)
+        if target:
+            rgb = rgb.resize(target, Image.LANCZOS)
+            buffer = io.BytesIO()
+            if image_format == 'PNG':
+                rgb.save(buffer, format='PNG', optimize=True)
+                result['extension'] = '.png'
+            else:
+                rgb.save(buffer, format='JPEG', quality=self.jpeg_quality)
+                result['extension'] = '.jpg'
+            data = buffer.getvalue()
+            result['resized'] = True
+        else:
+            result['extension'] = None
+            result['resized'] = False
+
+        result.update(status='valid', data=data, content_hash=hashlib.sha1(data).hexdigest(),
+                      width=rgb.width, height=rgb.height)
+        return result
+
+    def _destination(self, class_dir, name, extension):
+        """Unique, sanitised file path inside the class folder"""
+        base, original_extension = os.path.splitext(secure_filename(os.path.basename(name)) or 'image')
+        extension = extension or original_extension.lower()
+        path = os.path.join(class_dir, base + extension)
+        counter = 1
+        while os.path.exists(path):
+            path = os.path.join(class_dir, f'{base}_{counter}{extension}')
+            counter += 1
+        return path
+
+    def run(self, items, result_callback=None, flush_every=200):
+        """
+        Ingest (name, class_name, bytes) items. result_callback receives one
+        result dict per item; returns a summary with counts per status.
+        """
+        start_time = time.time()
+        counts = Counter()
+        bytes_in = bytes_stored = 0
+        batch_hashes = {}
+        phash_paths, phashes, phash_count = [], None, 0
+        if self.dedup == 'perceptual':
+            phash_paths, existing = self.dataset_index.perceptual_hashes()
+            phash_count = len(existing)
+            phashes = np.empty(max(1024, 2 * phash_count), dtype=np.int64)
+            phashes[:phash_count] = existing
+        pending_records = []
+
+        def emit(result):
+            counts[result['status']] += 1
+            result.pop('data', None)
+            result.pop('extension', None)
+            if result_callback:
+                result_callback(result)
+
+        def commit(result):
+            nonlocal bytes_in, bytes_stored, phashes, phash_count
+            bytes_in += result.get('bytes_in', 0)
+            if result['status'] != 'valid':
+                return emit(result)
+
+            if self.dedup != 'none':
+                duplicate = (batch_hashes.get(result['source_hash']) or batch_hashes.get(result['content_hash'])
+                             or self.dataset_index.find_duplicate([result['source_hash'], result['content_hash']]))
+                if duplicate:
+                    return emit(dict(result, status='duplicate', duplicate_of=duplicate))
+
+            if self.dedup == 'perceptual' and phash_count:
+                distances = hamming_distances(result['phash'], phashes[:phash_count])
+                nearest = int(distances.argmin())
+                if distances[nearest] <= self.phash_threshold:
+                    return emit(dict(result, status='near_duplicate', duplicate_of=phash_paths[nearest],
+                                     distance=int(distances[nearest])))
+
+            class_dir = os.path.join(self.data_dir, secure_filename(result['class_name']))
+            os.makedirs(class_dir, exist_ok=True)
+            path = self._destination(class_dir, result['source'], result['extension'])
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(result['data'])
+            os.replace(tmp_path, path)
+
+            relative = self.dataset_index.relative_path(path)
+            stat = os.stat(path)
+            bytes_stored += stat.st_size
+            pending_records.append({
+                'path': relative,
+                'class_name': relative.split('/', 1)[0],
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'content_hash': result['content_hash'],
+                'source_hash': result['source_hash'],
+                'phash': result['phash'],
+                'width': result['width'],
+                'height': result['height'],
+                'valid': 1,
+                'error': None,
+                'indexed_at': time.time()
+            })
+            batch_hashes[result['source_hash']] = batch_hashes[result['content_hash']] = relative
+            if phashes is not None:
+                if phash_count == len(phashes):
+                    phashes = np.concatenate([phashes, np.empty_like(phashes)])
+                phashes[phash_count] = result['phash']
+                phash_paths.append(relative)
+                phash_count += 1
+            if len(pending_records) >= flush_every:
+                self.dataset_index.upsert_records(pending_records)
+                pending_records.clear()
+            emit(dict(result, status='accepted', path=relative))
+
+        # Bounded window of in-flight work keeps memory flat for huge archives
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            in_flight = deque()
+            for name, class_name, data in items:
+                if not is_image_file(name):
+                    emit({'source': name, 'class_name': class_name, 'status': 'skipped',
+                          'error': 'Unsupported file extension'})
+                    continue
+                if not class_name or not secure_filename(class_name):
+                    emit({'source': name, 'class_name': class_name, 'status': 'skipped',
+                          'error': 'Image is not inside a class folder'})
+                    continue
+                in_flight.append(executor.submit(self._process, name, class_name, data))
+                while len(in_flight) >= self.workers * 4:
+                    commit(in_flight.popleft().result())
+            while in_flight:
+                commit(in_flight.popleft().result())
+
+        if pending_records:
+            self.dataset_index.upsert_records(pending_records)
+
+        elapsed = time.time() - start_time
+        processed = sum(counts.values())
+        summary = {
+            'processed': processed,
+            'accepted': counts['accepted'],
+            'duplicates': counts['duplicate'],
+            'near_duplicates': counts['near_duplicate'],
+            'invalid': counts['invalid'],
+            'skipped': counts['skipped'],
+            'bytes_in': bytes_in,
+            'bytes_stored': bytes_stored,
+            'elapsed': elapsed,
+            'images_per_sec': processed / elapsed if elapsed else 0.0
+        }
+        print(f"📥 Ingested {summary['accepted']}/{processed} images "
+              f"({summary['duplicates'] + summary['near_duplicates']} duplicates, {summary['invalid']} invalid) "
+              f"in {elapsed:.1f}s")
+        return summary
@@ -0,0 +1,46 @@
+"""
+Lazily constructed application components
+Model-backed components import TensorFlow when they are built, so the app
+creates them on first use (or from a warm-up thread) instead of at import
+"""
+
+import threading
+import time
+
+
+class LazyComponent:
+    """
+    Proxy that builds its target with factory() on first attribute access.
+    Construction runs once even when several threads race for it; a failed
+    construction is retried on the next access.
+    """
+
+    def __init__(self, factory, name=None):
+        self._factory = factory
+        self.name = name or getattr(factory, '__name__', 'component')
+        self._target = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+
+    @property
+    def loaded(self):
+        """Whether the target has been built"""
+        return self._target is not None
+
+    def resolve(self):
+        """The target, building it if needed"""
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    start = time.perf_counter()
+                    self._target = self._factory()
+                    self.load_seconds = round(time.perf_counter() - start, 3)
+                    print(f"⚡ Loaded {self.name} in {self.load_seconds}s")
+        return self._target
+
+    def __getattr__(self, name):
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        state = 'loaded' if self.loaded else 'not loaded'
+        return f'<LazyComponent {self.name} ({state})>'
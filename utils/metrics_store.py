@@ -0,0 +1,166 @@
+"""
+Append-only training metrics store
+Every completed epoch of a training run is appended as one row of a SQLite
+table instead of rewriting metrics/{model}_progress.json in full. Readers
+remember the id of the last row they saw and fetch only newer rows; the
+progress JSON is still available as an on-demand export.
+"""
+
+import os
+import json
+import time
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+STORE_FILENAME = 'training_history.sqlite'
+PROGRESS_KEYS = ('accuracy', 'val_accuracy', 'loss', 'val_loss', 'images_per_sec')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    model_type TEXT NOT NULL,
+    started_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS epochs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id INTEGER NOT NULL,
+    model_type TEXT NOT NULL,
+    epoch INTEGER NOT NULL,
+    accuracy REAL,
+    val_accuracy REAL,
+    loss REAL,
+    val_loss REAL,
+    images_per_sec REAL,
+    epoch_seconds REAL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs (model_type, run_id);
+CREATE INDEX IF NOT EXISTS epochs_run ON epochs (run_id, epoch);
+"""
+
+
+def empty_progress():
+    """Progress structure of metrics/{model}_progress.json"""
+    return {'epochs': [], **{key: [] for key in PROGRESS_KEYS}}
+
+
+class MetricsStore:
+    """
+    SQLite log of per-epoch training metrics, shared by the web process and
+    training worker processes (WAL mode, so readers never block the writer)
+    """
+
+    def __init__(self, metrics_dir='metrics', db_path=None):
+        self.metrics_dir = metrics_dir
+        self.db_path = db_path or os.path.join(metrics_dir, STORE_FILENAME)
+        os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Short-lived connection committed on success and always closed"""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def latest_run(self, model_type):
+        """Id of a model's most recent run, or None"""
+        with self._connect() as conn:
+            row = conn.execute('SELECT MAX(run_id) AS run_id FROM runs WHERE model_type = ?',
+                               (model_type,)).fetchone()
+        return row['run_id']
+
+    def start_run(self, model_type, resume_epoch=None):
+        """
+        Start a run and return its id. Resuming from a checkpoint continues the
+        model's latest run; rows after the checkpointed epoch (an epoch cut short
+        by a cancellation) are dropped so the run's history stays consistent.
+        """
+        run_id = self.latest_run(model_type) if resume_epoch is not None else None
+        with self._connect() as conn:
+            if run_id is not None:
+                conn.execute('DELETE FROM epochs WHERE run_id = ? AND epoch > ?', (run_id, resume_epoch))
+                return run_id
+            cursor = conn.execute('INSERT INTO runs (model_type, started_at) VALUES (?, ?)',
+                                  (model_type, datetime.now().isoformat()))
+            return cursor.lastrowid
+
+    def append_epoch(self, run_id, model_type, epoch, logs, epoch_seconds=None):
+        """Append one completed epoch (1-based) with its Keras logs; returns the row id"""
+        logs = logs or {}
+        # Metrics a run does not log (no validation split) stay NULL
+        values = [float(logs[key]) if key in logs else None for key in PROGRESS_KEYS]
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"INSERT INTO epochs (run_id, model_type, epoch, {', '.join(PROGRESS_KEYS)}, epoch_seconds, "
+                f"recorded_at) VALUES (?, ?, ?, {', '.join('?' * len(PROGRESS_KEYS))}, ?, ?)",
+                (run_id, model_type, epoch, *values, epoch_seconds, time.time())
+            )
+            return cursor.lastrowid
+
+    def last_id(self):
+        """Id of the newest row; pass it to tail() to read only what is appended afterwards"""
+        with self._connect() as conn:
+            return conn.execute('SELECT COALESCE(MAX(id), 0) FROM epochs').fetchone()[0]
+
+    def tail(self, after_id=0, model_types=None, run_id=None, limit=1000):
+        """Rows appended after after_id, oldest first, optionally for some models or one run"""
+        query = 'SELECT * FROM epochs WHERE id > ?'
+        params = [after_id]
+        if model_types is not None:
+            model_types = list(model_types)
+            if not model_types:
+                return []
+            query += f" AND model_type IN ({', '.join('?' * len(model_types))})"
+            params += model_types
+        if run_id is not None:
+            query += ' AND run_id = ?'
+            params.append(run_id)
+        query += ' ORDER BY id LIMIT ?'
+        params.append(limit)
+
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(query, params)]
+
+    def progress(self, model_type, run_id=None):
+        """A run's epochs (default: the latest run) in the progress JSON layout, or None"""
+        run_id = run_id or self.latest_run(model_type)
+        if run_id is None:
+            return None
+
+        progress = empty_progress()
+        with self._connect() as conn:
+            rows = conn.execute('SELECT * FROM epochs WHERE run_id = ? ORDER BY epoch, id', (run_id,)).fetchall()
+        for row in rows:
+            progress['epochs'].append(row['epoch'])
+            for key in PROGRESS_KEYS:
+                progress[key].append(row[key] if row[key] is not None else 0.0)
+        return progress
+
+    def history(self, run_id):
+        """A run's epochs as a Keras-style history, {metric: [value per epoch]}, without unlogged metrics"""
+        with self._connect() as conn:
+            rows = conn.execute('SELECT * FROM epochs WHERE run_id = ? ORDER BY epoch, id', (run_id,)).fetchall()
+        return {key: [row[key] for row in rows] for key in PROGRESS_KEYS
+                if rows and all(row[key] is not None for row in rows)}
+
+    def export_progress(self, model_type, path=None):
+        """Write the latest run as metrics/{model}_progress.json (or path); returns the path, or None"""
+        progress = self.progress(model_type)
+        if progress is None:
+            return None
+
+        path = path or os.path.join(self.metrics_dir, f"{model_type}_progress.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(progress, f)
+        os.replace(tmp_path, path)
+        return path
@@ -0,0 +1,288 @@
+"""
+Model registry with load-once caching
+Keeps trained models resident within a memory budget, evicts the least recently
+used model when the budget is exceeded and reloads models whose file changed
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+import tensorflow as tf
+
+from utils.model_factory import ModelFactory
+
+
+# Compact model distilled from the ensemble; served on its own, never as an ensemble member
+STUDENT_MODEL = 'student'
+SERVABLE_MODELS = {**ModelFactory.SUPPORTED_MODELS, STUDENT_MODEL: 'Distilled Student (MobileNetV2)'}
+
+# File name pattern per serving backend
+MODEL_BACKENDS = {
+    'keras': '{model_type}_model.h5',
+    'tflite_fp16': '{model_type}_model_fp16.tflite',
+    'tflite_int8': '{model_type}_model_int8.tflite'
+}
+
+
+def backend_model_path(models_dir, model_type, backend='keras'):
+    """Path of a model artifact for a serving backend"""
+    if backend not in MODEL_BACKENDS:
+        raise ValueError(f'Unknown model backend: {backend}')
+    return os.path.join(models_dir, MODEL_BACKENDS[backend].format(model_type=model_type))
+
+
+class TFLiteModel:
+    """
+    Callable wrapper around a TFLite interpreter with the same calling
+    convention as a Keras model: model(batch, training=False) -> probabilities
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        self.model_path = model_path
+        self.memory_bytes = os.path.getsize(model_path)
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_details = self.interpreter.get_input_details()[0]
+        self.output_details = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self.input_details['shape'][0])
+        # Interpreters are not thread-safe
+        self._lock = threading.Lock()
+
+    def __call__(self, inputs, training=False):
+        inputs = np.asarray(inputs, dtype=np.float32)
+
+        with self._lock:
+            if inputs.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self.input_details['index'], list(inputs.shape))
+                self.interpreter.allocate_tensors()
+                self._batch_size = inputs.shape[0]
+
+            input_scale, input_zero_point = self.input_details['quantization']
+            if self.input_details['dtype'] != np.float32 and input_scale:
+                inputs = (inputs / input_scale + input_zero_point).astype(self.input_details['dtype'])
+
+            self.interpreter.set_tensor(self.input_details['index'], inputs)
+            self.interpreter.invoke()
+            outputs = self.interpreter.get_tensor(self.output_details['index'])
+
+            output_scale, output_zero_point = self.output_details['quantization']
+            if self.output_details['dtype'] != np.float32 and output_scale:
+                outputs = (outputs.astype(np.float32) - output_zero_point) * output_scale
+
+        return outputs
+
+
+@dataclass
+class ModelEntry:
+    """A resident model and its bookkeeping"""
+    model: object
+    mtime: float
+    memory_bytes: int
+    loaded_at: float
+    last_used: float
+    hits: int = 0
+
+
+def estimate_model_memory(model):
+    """Approximate resident size of a model from its weight tensors"""
+    if isinstance(model, TFLiteModel):
+        return model.memory_bytes
+    return sum(int(np.prod(w.shape)) * tf.as_dtype(w.dtype).size for w in model.weights)
+
+
+class ModelRegistry:
+    """
+    Thread-safe LRU cache of trained models keyed by model type.
+    memory_budget_mb of 0 or None means no limit; backend selects the
+    Keras .h5 files or their exported TFLite variants.
+    """
+
+    def __init__(self, models_dir='models', memory_budget_mb=None, backend='keras', tflite_threads=None):
+        if backend not in MODEL_BACKENDS:
+            raise ValueError(f'Unknown model backend: {backend}')
+
+        self.models_dir = models_dir
+        self.backend = backend
+        self.tflite_threads = tflite_threads or None
+        self.memory_budget = int(memory_budget_mb * 1024 * 1024) if memory_budget_mb else None
+        self._entries = OrderedDict()
+        self._errors = {}
+        self._model_sizes = {}
+        self._load_locks = {}
+        self._lock = threading.RLock()
+        self.stats = {'hits': 0, 'misses': 0, 'loads': 0, 'reloads': 0, 'evictions': 0}
+
+    def model_path(self, model_type):
+        """Path of the served model artifact for a model type"""
+        return backend_model_path(self.models_dir, model_type, self.backend)
+
+    def _load(self, model_path):
+        """Load a model artifact for the configured backend"""
+        if self.backend == 'keras':
+            return tf.keras.models.load_model(model_path, compile=False)
+        return TFLiteModel(model_path, num_threads=self.tflite_threads)
+
+    def model_version(self, model_type):
+        """Version of the served model file (backend, mtime and size), or None if not trained"""
+        try:
+            stat = os.stat(self.model_path(model_type))
+        except OSError:
+            return None
+        return f"{self.backend}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def available_models(self):
+        """Ensemble model types that have a trained model file on disk"""
+        return [m for m in ModelFactory.SUPPORTED_MODELS if os.path.exists(self.model_path(m))]
+
+    def _resident(self, model_type, mtime):
+        """Resident model if it is current, recording the hit; caller holds the lock"""
+        entry = self._entries.get(model_type)
+        if entry is None or entry.mtime != mtime:
+            return None
+
+        self._entries.move_to_end(model_type)
+        entry.hits += 1
+        entry.last_used = time.time()
+        self.stats['hits'] += 1
+        return entry.model
+
+    def get(self, model_type):
+        """Return a resident model, loading or reloading it if needed"""
+        model_path = self.model_path(model_type)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f'Model {model_type} has not been trained')
+
+        mtime = os.path.getmtime(model_path)
+
+        with self._lock:
+            model = self._resident(model_type, mtime)
+            if model is not None:
+                return model
+            load_lock = self._load_locks.setdefault(model_type, threading.Lock())
+
+        # Load outside the registry lock, so a cold load does not block lookups of
+        # other models; concurrent requests for the same model wait for one load
+        with load_lock:
+            with self._lock:
+                model = self._resident(model_type, mtime)
+                if model is not None:
+                    return model
+
+                self.stats['misses'] += 1
+                if model_type in self._entries:
+                    # Model file changed on disk after retraining
+                    print(f"🔄 Reloading {model_type}: model file changed")
+                    del self._entries[model_type]
+                    self.stats['reloads'] += 1
+
+            try:
+                model = self._load(model_path)
+            except Exception as e:
+                with self._lock:
+                    self._errors[model_type] = str(e)
+                raise
+            memory_bytes = estimate_model_memory(model)
+
+            with self._lock:
+                self._errors.pop(model_type, None)
+                now = time.time()
+                self._entries[model_type] = ModelEntry(
+                    model=model,
+                    mtime=mtime,
+                    memory_bytes=memory_bytes,
+                    loaded_at=now,
+                    last_used=now
+                )
+                self._model_sizes[model_type] = memory_bytes
+                self.stats['loads'] += 1
+                self._enforce_budget(keep=model_type)
+
+            return model
+
+    def check_budget(self, model_types):
+        """
+        Whether the memory budget holds all of model_types at once. An ensemble
+        larger than the budget would evict and reload models on every request,
+        so this warns; sizes are those of the models' last load.
+        """
+        with self._lock:
+            required = sum(self._model_sizes.get(m, 0) for m in model_types)
+        if not self.memory_budget or required <= self.memory_budget:
+            return True
+
+        print(f"⚠️ Model memory budget ({self.memory_budget / (1024 * 1024):.1f} MB) is smaller than "
+              f"{' + '.join(model_types)} ({required / (1024 * 1024):.1f} MB): every prediction will evict "
+              f"and reload models. Raise MODEL_MEMORY_BUDGET_MB or set it to 0.")
+        return False
+
+    def evict(self, model_type):
+        """Drop a model from memory"""
+        with self._lock:
+            if self._entries.pop(model_type, None) is not None:
+                self.stats['evictions'] += 1
+                print(f"♻️ Evicted {model_type} from model cache")
+
+    def clear(self):
+        """Drop every resident model"""
+        with self._lock:
+            for model_type in list(self._entries):
+                self.evict(model_type)
+
+    def memory_usage(self):
+        """Total estimated bytes held by resident models"""
+        with self._lock:
+            return sum(entry.memory_bytes for entry in self._entries.values())
+
+    def _enforce_budget(self, keep=None):
+        """Evict least recently used models until the budget is respected"""
+        if not self.memory_budget:
+            return
+
+        while self.memory_usage() > self.memory_budget:
+            victim = next((m for m in self._entries if m != keep), None)
+            if victim is None:
+                break
+            self.evict(victim)
+
+    def status(self):
+        """Per-model lifecycle status for the models API"""
+        with self._lock:
+            model_status = {}
+
+            for model_type in SERVABLE_MODELS:
+                model_path = self.model_path(model_type)
+                entry = self._entries.get(model_type)
+                info = {'cache_state': 'not_trained'}
+
+                if model_type in self._errors:
+                    info = {'cache_state': 'error', 'error': self._errors[model_type]}
+                elif entry is not None:
+                    stale = not os.path.exists(model_path) or os.path.getmtime(model_path) != entry.mtime
+                    info = {
+                        'cache_state': 'stale' if stale else 'loaded',
+                        'memory_mb': round(entry.memory_bytes / (1024 * 1024), 1),
+                        'hits': entry.hits,
+                        'loaded_at': entry.loaded_at,
+                        'last_used': entry.last_used
+                    }
+                elif os.path.exists(model_path):
+                    info = {'cache_state': 'not_loaded'}
+
+                model_status[model_type] = info
+
+            return model_status
+
+    def summary(self):
+        """Cache-wide counters and memory usage"""
+        with self._lock:
+            return {
+                **self.stats,
+                'resident_models': list(self._entries),
+                'backend': self.backend,
+                'memory_mb': round(self.memory_usage() / (1024 * 1024), 1),
+                'memory_budget_mb': round(self.memory_budget / (1024 * 1024), 1) if self.memory_budget else None
+            }
@@ -0,0 +1,156 @@
+"""
+Prediction result cache
+Bounded LRU/TTL cache of per-model and ensemble results keyed by the SHA-256
+of the image bytes. Every entry records the model file versions it was
+computed with, so retraining a model invalidates its results automatically.
+Optionally persisted to SQLite so the cache survives restarts.
+"""
+
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import asdict
+
+from utils.prediction_types import ModelPrediction, EnsemblePrediction
+
+
+def content_hash(image_bytes, variant=''):
+    """Cache key of an image: SHA-256 of its raw bytes, plus the ensemble mode variant if any"""
+    digest = hashlib.sha256(image_bytes).hexdigest()
+    return f"{digest}:{variant}" if variant else digest
+
+
+class PredictionCache:
+    """
+    Thread-safe LRU cache of (individual_results, ensemble_result) pairs.
+    An entry is served only if the current model versions match the ones it
+    was computed with; ttl_sec of 0 or None disables expiry.
+    """
+
+    def __init__(self, max_entries=1024, ttl_sec=3600, persist_path=None):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_sec = ttl_sec or None
+        self.persist_path = persist_path
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'expired': 0, 'evictions': 0, 'stores': 0}
+
+        if persist_path:
+            self._db = sqlite3.connect(persist_path, check_same_thread=False)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS predictions (
+                    content_hash TEXT PRIMARY KEY,
+                    versions TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created REAL NOT NULL
+                )
+            ''')
+            self._db.commit()
+            self._load()
+
+    def _expired(self, entry, now=None):
+        return self.ttl_sec is not None and (now or time.time()) - entry['created'] > self.ttl_sec
+
+    def _load(self):
+        """Warm the in-memory LRU with the newest unexpired persisted entries"""
+        if self.ttl_sec is not None:
+            self._db.execute('DELETE FROM predictions WHERE created < ?', (time.time() - self.ttl_sec,))
+            self._db.commit()
+
+        rows = self._db.execute(
+            'SELECT content_hash, versions, payload, created FROM predictions ORDER BY created DESC LIMIT ?',
+            (self.max_entries,)
+        ).fetchall()
+        for key, versions, payload, created in reversed(rows):
+            payload = json.loads(payload)
+            self._entries[key] = {'versions': json.loads(versions), 'created': created, **payload}
+        if rows:
+            print(f"🗃️ Prediction cache: {len(rows)} entries restored from {self.persist_path}")
+
+    def _delete(self, key):
+        self._entries.pop(key, None)
+        if self._db is not None:
+            self._db.execute('DELETE FROM predictions WHERE content_hash = ?', (key,))
+            self._db.commit()
+
+    def get(self, key, versions):
+        """Cached (individual_results, ensemble_result) for the current model versions, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if self._expired(entry):
+                self._delete(key)
+                self.stats['expired'] += 1
+                self.stats['misses'] += 1
+                return None
+            if entry['versions'] != versions:
+                # Some model was retrained (or added/removed) since this entry was computed
+                self._delete(key)
+                self.stats['stale'] += 1
+                self.stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+
+        individual_results = [ModelPrediction(**result) for result in entry['individual']]
+        ensemble_result = EnsemblePrediction(**entry['ensemble']) if entry['ensemble'] else None
+        return individual_results, ensemble_result
+
+    def put(self, key, versions, individual_results, ensemble_result):
+        """Store the results computed with the given model versions"""
+        if not individual_results or not versions:
+            return
+
+        entry = {
+            'versions': dict(versions),
+            'created': time.time(),
+            'individual': [asdict(result) for result in individual_results],
+            'ensemble': asdict(ensemble_result) if ensemble_result else None
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self.stats['stores'] += 1
+            evicted = []
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self.stats['evictions'] += 1
+
+            if self._db is not None:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO predictions (content_hash, versions, payload, created) VALUES (?, ?, ?, ?)',
+                    (key, json.dumps(entry['versions']),
+                     json.dumps({'individual': entry['individual'], 'ensemble': entry['ensemble']}), entry['created'])
+                )
+                self._db.executemany('DELETE FROM predictions WHERE content_hash = ?', [(k,) for k in evicted])
+                self._db.commit()
+
+    def clear(self):
+        """Drop every entry (memory and disk)"""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM predictions')
+                self._db.commit()
+
+    def summary(self):
+        """Counters, size and hit rate for the stats API"""
+        with self._lock:
+            lookups = self.stats['hits'] + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_sec': self.ttl_sec,
+                'persistent': self._db is not None,
+                'hit_rate': round(self.stats['hits'] / lookups, 4) if lookups else 0.0
+            }
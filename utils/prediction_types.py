@@ -0,0 +1,35 @@
+"""
+Prediction result types
+Plain dataclasses without TensorFlow, so the prediction cache and the stats
+routes can use them before the models (or TensorFlow) are loaded
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+
+@dataclass
+class ModelPrediction:
+    """Prediction produced by a single model"""
+    model_name: str
+    model_display_name: str
+    predicted_class: str
+    confidence: float
+    all_probabilities: Dict[str, float]
+    prediction_time: float
+    model_params: str = ''
+    model_speed: str = ''
+
+
+@dataclass
+class EnsemblePrediction:
+    """Combined prediction across all models"""
+    predicted_class: str
+    confidence: float
+    model_agreement: float
+    voting_results: Dict[str, int] = field(default_factory=dict)
+    average_probabilities: Dict[str, float] = field(default_factory=dict)
+    wall_time: float = 0.0
+    ensemble_mode: str = 'full'
+    models_run: List[str] = field(default_factory=list)
+    models_failed: List[str] = field(default_factory=list)
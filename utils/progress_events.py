@@ -0,0 +1,143 @@
+"""
+In-process training progress event bus
+Training callbacks, worker processes and the progress-file watcher publish
+incremental events here; Server-Sent Events clients and training_status read
+them without touching the metrics files
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+
+HEARTBEAT_SEC = 15.0
+
+
+def format_sse(event, event_type=None, event_id=None):
+    """Serialize one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event_type:
+        lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(event)}")
+    return '\n'.join(lines) + '\n\n'
+
+
+class ProgressEventBus:
+    """
+    Thread-safe publish/subscribe log of progress events. Every event gets a
+    monotonically increasing id; the last history_size events are kept so a
+    reconnecting client (Last-Event-ID) only receives what it missed.
+    """
+
+    def __init__(self, history_size=1000):
+        self._events = deque(maxlen=history_size)
+        self._condition = threading.Condition()
+        self._listeners = []
+        self._last_id = 0
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def add_listener(self, listener):
+        """Call listener(event) synchronously for every published event"""
+        self._listeners.append(listener)
+
+    def publish(self, event):
+        """Stamp and store an event, run listeners and wake up waiting subscribers"""
+        with self._condition:
+            self._last_id += 1
+            event = dict(event, id=self._last_id, timestamp=time.time())
+            self._events.append(event)
+            # Listeners run under the lock so snapshot() never sees state and ids out of step
+            for listener in self._listeners:
+                try:
+                    listener(event)
+                except Exception as e:
+                    print(f"⚠️ Progress listener error: {e}")
+            self._condition.notify_all()
+        return event
+
+    def snapshot(self, build_state):
+        """Return (build_state(), last_id) atomically with respect to publish()"""
+        with self._condition:
+            return build_state(), self._last_id
+
+    def events_since(self, last_id, timeout=None):
+        """
+        Return (events, missed): events newer than last_id, waiting up to timeout
+        for one to arrive; missed is True if some were already dropped from history
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self._last_id > last_id, timeout)
+            events = [event for event in self._events if event['id'] > last_id]
+            missed = bool(events) and events[0]['id'] > last_id + 1
+        return events, missed
+
+
+class ProgressFileWatcher:
+    """
+    Turn metrics/{model}_progress.json rewrites into per-epoch bus events for
+    trainers that cannot report through callbacks (the generator pipeline).
+    One background thread reads the files, however many clients are listening.
+    """
+
+    def __init__(self, bus, metrics_dir, model_types, interval=1.0):
+        self.bus = bus
+        self.metrics_dir = metrics_dir
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        # Files left over from a previous run are ignored until they are rewritten
+        self._state = {model_type: {'mtime': self._mtime(model_type), 'epochs': 0} for model_type in model_types}
+
+    def _path(self, model_type):
+        return os.path.join(self.metrics_dir, f"{model_type}_progress.json")
+
+    def _mtime(self, model_type):
+        try:
+            return os.stat(self._path(model_type)).st_mtime_ns
+        except OSError:
+            return None
+
+    def poll(self):
+        """Publish epochs appended since the last poll"""
+        for model_type, state in self._state.items():
+            mtime = self._mtime(model_type)
+            if mtime is None or mtime == state['mtime']:
+                continue
+            try:
+                with open(self._path(model_type), 'r') as f:
+                    progress = json.load(f)
+            except (OSError, ValueError):
+                continue  # Partially written; retry on the next poll
+            state['mtime'] = mtime
+
+            epochs = progress.get('epochs', [])
+            if len(epochs) < state['epochs']:
+                state['epochs'] = 0
+            for i in range(state['epochs'], len(epochs)):
+                event = {'type': 'epoch', 'model': model_type, 'epoch': epochs[i]}
+                for key in ('accuracy', 'val_accuracy', 'loss', 'val_loss', 'images_per_sec'):
+                    values = progress.get(key) or []
+                    event[key] = float(values[i]) if i < len(values) else 0.0
+                self.bus.publish(event)
+            state['epochs'] = len(epochs)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='progress-file-watcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval * 2)
+        self.poll()
@@ -0,0 +1,208 @@
+"""
+Prometheus-style operational metrics
+Thread-safe counters, gauges and histograms with labels, rendered in the
+Prometheus text exposition format (0.0.4) for the /metrics endpoint. State
+owned by other components (model cache, queue depth) is read at scrape time
+through collectors instead of being mirrored.
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EPOCH_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if value == -math.inf:
+        return '-Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class _Metric:
+    """Base class: one named metric family with a fixed set of label names"""
+    metric_type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} expects labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, label pairs, value) tuples for rendering"""
+        with self._lock:
+            return [('', tuple(zip(self.labelnames, key)), value) for key, value in self._values.items()]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+    metric_type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that can go up and down"""
+    metric_type = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Bucketed distribution of observations with their sum and count"""
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['buckets'][i] += 1
+                    break
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of a with-block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = {key: dict(state, buckets=list(state['buckets'])) for key, state in self._values.items()}
+
+        samples = []
+        for key, state in values.items():
+            labels = tuple(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, state['buckets']):
+                cumulative += count
+                samples.append(('_bucket', labels + (('le', _format_value(float(bound))),), cumulative))
+            samples.append(('_bucket', labels + (('le', '+Inf'),), state['count']))
+            samples.append(('_sum', labels, state['sum']))
+            samples.append(('_count', labels, state['count']))
+        return samples
+
+
+class MetricsRegistry:
+    """Named metrics plus scrape-time collectors, rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f'Metric {metric.name} is already registered with a different definition')
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector):
+        """
+        collector() returns (name, type, documentation, [(labels_dict, value), ...])
+        tuples describing state that is read when /metrics is scraped
+        """
+        self._collectors.append(collector)
+
+    def render(self):
+        """Prometheus text exposition of every metric and collector"""
+        lines = []
+        families = [(metric.name, metric.metric_type, metric.documentation, metric.samples())
+                    for metric in list(self._metrics.values())]
+
+        for collector in self._collectors:
+            try:
+                for name, metric_type, documentation, values in collector():
+                    families.append((name, metric_type, documentation,
+                                     [('', tuple(sorted(labels.items())), value) for labels, value in values]))
+            except Exception as e:
+                print(f"⚠️ Metrics collector error: {e}")
+
+        for name, metric_type, documentation, samples in families:
+            lines.append(f'# HELP {name} {_escape(documentation)}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            for suffix, labels, value in samples:
+                lines.append(f'{name}{suffix}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# Process-wide registry and the metrics the serving and training code records into
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'Flask request latency by route', ('route', 'method', 'status'))
+IMAGE_DECODE_SECONDS = REGISTRY.histogram(
+    'image_decode_seconds', 'Time to decode and resize one uploaded image')
+MODEL_INFERENCE_SECONDS = REGISTRY.histogram(
+    'model_inference_seconds', 'Forward pass time of one model for one batch', ('model', 'backend'))
+MODEL_INFERENCE_IMAGES = REGISTRY.counter(
+    'model_inference_images_total', 'Images scored per model', ('model', 'backend'))
+MODEL_INFERENCE_ERRORS = REGISTRY.counter(
+    'model_inference_errors_total', 'Models skipped because they could not be loaded', ('model',))
+MICRO_BATCH_SIZE = REGISTRY.histogram(
+    'prediction_micro_batch_size', 'Requests coalesced into one micro-batch', buckets=(1, 2, 4, 8, 16, 32, 64))
+TRAINING_EPOCH_SECONDS = REGISTRY.histogram(
+    'training_epoch_duration_seconds', 'Wall time of one training epoch', ('model',), buckets=EPOCH_BUCKETS)
@@ -0,0 +1,179 @@
+"""
+Cold-start benchmark of the web app
+Each run imports app.py in a fresh interpreter, times the first request to the
+routes that need no model, records the idle resident memory, then times the
+warm-up that imports TensorFlow and loads the models. This module must stay
+TensorFlow-free, or the measured process would pay for TensorFlow up front.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import platform
+import statistics
+import multiprocessing as mp
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Routes served without TensorFlow; their first request is part of the cold start
+LIGHT_ROUTES = ('/', '/analytics', '/api/health', '/api/dataset_info', '/api/training_status', '/api/prediction_cache')
+
+
+def current_rss_mb():
+    """Resident memory of this process in MB (peak RSS where the current value is unavailable), or None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return round(resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 1)
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def _startup_worker(config, results):
+    """Benchmark process: import the app, hit the light routes, then warm up"""
+    try:
+        os.environ['WARMUP_ON_START'] = '0'
+        os.environ['INFERENCE_WORKERS'] = str(config['inference_workers'])
+        baseline_rss = current_rss_mb()
+
+        start = time.perf_counter()
+        import app as web_app
+        web_app.start_background_services()
+        import_seconds = time.perf_counter() - start
+
+        client = web_app.app.test_client()
+        first_request_ms = {}
+        for route in config['routes']:
+            start = time.perf_counter()
+            response = client.get(route)
+            first_request_ms[route] = {
+                'ms': round((time.perf_counter() - start) * 1000, 2),
+                'status': response.status_code
+            }
+
+        row = {
+            'import_seconds': round(import_seconds, 3),
+            'first_request_ms': first_request_ms,
+            'interpreter_rss_mb': baseline_rss,
+            'idle_rss_mb': current_rss_mb(),
+            'tensorflow_loaded_when_idle': 'tensorflow' in sys.modules
+        }
+
+        if config['warmup']:
+            start = time.perf_counter()
+            web_app.warm_up()
+            row.update({
+                'warmup_seconds': round(time.perf_counter() - start, 3),
+                'warmup_status': web_app.warmup_state['status'],
+                'warmup_error': web_app.warmup_state['error'],
+                'ready_rss_mb': current_rss_mb(),
+                'component_load_seconds': {
+                    component.name: component.load_seconds
+                    for component in (web_app.model_registry, web_app.inference_engine,
+                                      web_app.prediction_scheduler, web_app.prediction_cache)
+                    if component is not None and component.loaded
+                }
+            })
+            if config['inference_workers'] > 0:
+                web_app.inference_engine.stop()
+        results.put(row)
+    except Exception as e:
+        results.put({'error': f'{type(e).__name__}: {e}'})
+
+
+def _median(rows, key):
+    values = [row[key] for row in rows if row.get(key) is not None]
+    return round(statistics.median(values), 3) if values else None
+
+
+def summarize(rows):
+    """Median of every measurement over the successful runs"""
+    ok = [row for row in rows if 'error' not in row]
+    if not ok:
+        return {}
+    summary = {key: _median(ok, key) for key in ('import_seconds', 'interpreter_rss_mb', 'idle_rss_mb',
+                                                 'warmup_seconds', 'ready_rss_mb')}
+    summary['first_request_ms'] = {
+        route: round(statistics.median(row['first_request_ms'][route]['ms'] for row in ok), 2)
+        for route in ok[0]['first_request_ms']
+    }
+    summary['tensorflow_loaded_when_idle'] = any(row['tensorflow_loaded_when_idle'] for row in ok)
+    return summary
+
+
+class StartupBenchmark:
+    """Measure import time, first light requests, idle RSS and warm-up of app.py over fresh processes"""
+
+    def __init__(self, metrics_dir='metrics', runs=3, routes=LIGHT_ROUTES, warmup=True, inference_workers=0,
+                 timeout=600):
+        self.metrics_dir = metrics_dir
+        self.runs = runs
+        self.routes = list(routes)
+        self.warmup = warmup
+        self.inference_workers = inference_workers
+        self.timeout = timeout
+        os.makedirs(metrics_dir, exist_ok=True)
+
+    def settings(self):
+        return {
+            'runs': self.runs,
+            'routes': self.routes,
+            'warmup': self.warmup,
+            'inference_workers': self.inference_workers
+        }
+
+    def run_once(self):
+        """One cold start in a spawned interpreter (fork would inherit this process's imports)"""
+        context = mp.get_context('spawn')
+        results = context.Queue()
+        config = dict(self.settings())
+        process = context.Process(target=_startup_worker, args=(config, results), daemon=True)
+        process.start()
+        try:
+            row = results.get(timeout=self.timeout)
+        except queue.Empty:
+            row = {'error': f'timed out after {self.timeout}s' if process.is_alive()
+                   else f'benchmark process exited with code {process.exitcode}'}
+        process.join(timeout=30)
+        if process.is_alive():
+            process.terminate()
+        return row
+
+    def run(self):
+        """Run the cold starts and write metrics/startup_benchmark.json"""
+        rows = []
+        for run in range(1, self.runs + 1):
+            row = self.run_once()
+            if 'error' in row:
+                print(f"❌ Run {run}/{self.runs}: {row['error']}")
+            else:
+                print(f"⏱️ Run {run}/{self.runs}: import {row['import_seconds']}s, idle RSS {row['idle_rss_mb']} MB"
+                      + (f", warm-up {row['warmup_seconds']}s" if 'warmup_seconds' in row else ''))
+            rows.append(row)
+
+        report = {
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'settings': self.settings(),
+            'summary': summarize(rows),
+            'runs': rows
+        }
+        path = os.path.join(self.metrics_dir, 'startup_benchmark.json')
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+        return report
@@ -0,0 +1,181 @@
+"""
+TFLite export utilities
+Converts trained Keras models to float16 and int8 post-training-quantized TFLite
+artifacts and measures their accuracy, latency and size against the .h5 model
+"""
+
+import os
+import json
+import time
+import random
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+
+from utils.inference_utils import decode_image_bytes, load_class_names
+from utils.batch_prediction import is_image_file
+from utils.model_registry import TFLiteModel, backend_model_path
+
+
+def sample_labelled_images(data_dir, num_samples, seed=42, exclude=None):
+    """Pick a class-balanced random sample of (path, class_name) pairs from data/<class>/"""
+    exclude = set(exclude or [])
+    rng = random.Random(seed)
+    class_dirs = sorted(d for d in os.listdir(data_dir) if os.path.isdir(os.path.join(data_dir, d)))
+    if not class_dirs:
+        return []
+
+    per_class = max(1, num_samples // len(class_dirs))
+    samples = []
+
+    for class_name in class_dirs:
+        class_path = os.path.join(data_dir, class_name)
+        files = sorted(f for f in os.listdir(class_path) if is_image_file(f))
+        files = [os.path.join(class_path, f) for f in files if os.path.join(class_path, f) not in exclude]
+        rng.shuffle(files)
+        samples.extend((path, class_name) for path in files[:per_class])
+
+    return samples
+
+
+def load_sample_tensors(samples):
+    """Decode sample images with the serving preprocessing; unreadable files are skipped"""
+    tensors, labels = [], []
+    for path, class_name in samples:
+        try:
+            with open(path, 'rb') as f:
+                tensors.append(decode_image_bytes(f.read()))
+            labels.append(class_name)
+        except Exception as e:
+            print(f"⚠️ Skipping {path}: {e}")
+    return tensors, labels
+
+
+def convert_to_tflite(model, quantization, calibration_tensors=None):
+    """Convert a Keras model to a float16 or int8 post-training-quantized TFLite flatbuffer"""
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+    if quantization == 'fp16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        if not calibration_tensors:
+            raise ValueError('int8 quantization needs calibration images')
+
+        def representative_dataset():
+            for tensor in calibration_tensors:
+                yield [tensor]
+
+        converter.representative_dataset = representative_dataset
+        # Float input/output keeps the serving preprocessing unchanged
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+    else:
+        raise ValueError(f'Unknown quantization: {quantization}')
+
+    return converter.convert()
+
+
+def evaluate_backend(model, tensors, labels, class_names):
+    """Accuracy, predictions and mean batch-1 latency of a model on evaluation tensors"""
+    if not tensors:
+        return {'accuracy': None, 'latency_ms': None}, []
+
+    # Warm-up run so one-time graph/allocation costs are not counted
+    np.asarray(model(tensors[0], training=False))
+
+    predictions = []
+    start_time = time.perf_counter()
+    for tensor in tensors:
+        probabilities = np.asarray(model(tensor, training=False))[0]
+        predictions.append(int(np.argmax(probabilities)))
+    latency_ms = (time.perf_counter() - start_time) / len(tensors) * 1000
+
+    correct = sum(1 for p, label in zip(predictions, labels)
+                  if p < len(class_names) and class_names[p] == label)
+
+    return {'accuracy': correct / len(tensors), 'latency_ms': round(latency_ms, 2)}, predictions
+
+
+def export_model(model_type, models_dir='models', data_dir='data', metrics_dir='metrics',
+                 calibration_samples=100, evaluation_samples=100):
+    """
+    Export one trained model to fp16 and int8 TFLite artifacts and record the
+    accuracy gap, latency and size gains in metrics/{model}_tflite.json
+    """
+    keras_path = backend_model_path(models_dir, model_type, 'keras')
+    if not os.path.exists(keras_path):
+        raise FileNotFoundError(f'Model {model_type} has not been trained')
+
+    print(f"📦 Exporting {model_type} to TFLite")
+    model = tf.keras.models.load_model(keras_path, compile=False)
+    class_names = load_class_names(models_dir, metrics_dir)
+
+    calibration_set = sample_labelled_images(data_dir, calibration_samples, seed=42)
+    evaluation_set = sample_labelled_images(data_dir, evaluation_samples, seed=7,
+                                            exclude=[path for path, _ in calibration_set])
+    calibration_tensors, _ = load_sample_tensors(calibration_set)
+    evaluation_tensors, evaluation_labels = load_sample_tensors(evaluation_set)
+
+    keras_metrics, keras_predictions = evaluate_backend(model, evaluation_tensors, evaluation_labels, class_names)
+    report = {
+        'model_type': model_type,
+        'exported_at': datetime.now().isoformat(),
+        'calibration_images': len(calibration_tensors),
+        'evaluation_images': len(evaluation_tensors),
+        'backends': {
+            'keras': {**keras_metrics, 'size_mb': round(os.path.getsize(keras_path) / (1024 * 1024), 2)}
+        }
+    }
+
+    for backend, quantization in (('tflite_fp16', 'fp16'), ('tflite_int8', 'int8')):
+        try:
+            tflite_bytes = convert_to_tflite(model, quantization, calibration_tensors)
+            output_path = backend_model_path(models_dir, model_type, backend)
+            # Serving processes reload the file when its mtime changes; never expose a partial write
+            tmp_path = f"{output_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(tflite_bytes)
+            os.replace(tmp_path, output_path)
+
+            backend_metrics, predictions = evaluate_backend(
+                TFLiteModel(output_path), evaluation_tensors, evaluation_labels, class_names
+            )
+            size_bytes = os.path.getsize(output_path)
+
+            backend_metrics.update({
+                'size_mb': round(size_bytes / (1024 * 1024), 2),
+                'size_reduction': round(os.path.getsize(keras_path) / size_bytes, 2) if size_bytes else None,
+                'agreement_with_keras': (
+                    sum(1 for a, b in zip(predictions, keras_predictions) if a == b) / len(predictions)
+                    if predictions else None
+                ),
+                'accuracy_gap': (
+                    keras_metrics['accuracy'] - backend_metrics['accuracy']
+                    if keras_metrics['accuracy'] is not None else None
+                ),
+                'speedup': (
+                    round(keras_metrics['latency_ms'] / backend_metrics['latency_ms'], 2)
+                    if backend_metrics['latency_ms'] else None
+                )
+            })
+            report['backends'][backend] = backend_metrics
+            print(f"   ✅ {backend}: {backend_metrics['size_mb']} MB, {backend_metrics['latency_ms']} ms/image")
+
+        except Exception as e:
+            print(f"   ❌ {backend} export failed: {e}")
+            report['backends'][backend] = {'error': str(e)}
+
+    with open(os.path.join(metrics_dir, f"{model_type}_tflite.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+
+    return report
+
+
+def load_export_report(metrics_dir, model_type):
+    """Load the recorded TFLite export report for a model, if any"""
+    report_path = os.path.join(metrics_dir, f"{model_type}_tflite.json")
+    if not os.path.exists(report_path):
+        return None
+    with open(report_path, 'r') as f:
+        return json.load(f)
@@ -0,0 +1,256 @@
+"""
+Training throughput benchmark
+Trains each supported architecture for a fixed number of steps on a seeded
+synthetic dataset (or a small fixed one) on CPU, timing input-pipeline wait
+and train step separately, with an optional TensorFlow profiler trace
+"""
+
+import os
+import json
+import time
+import platform
+import subprocess
+import multiprocessing as mp
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+
+from utils.model_factory import ModelFactory
+from utils.inference_utils import IMG_SIZE
+from utils.inference_benchmark import peak_rss_mb, pin_worker_threads, run_isolated
+
+TRAINING_BENCHMARK_FILE = 'training_benchmark.json'
+TRAINING_BENCHMARK_HISTORY_FILE = 'training_benchmark_history.jsonl'
+SYNTHETIC_SOURCE = 'synthetic'
+
+
+def _percentiles(values_ms):
+    p50, p95 = np.percentile(values_ms, [50, 95])
+    return {'p50': round(float(p50), 2), 'p95': round(float(p95), 2), 'mean': round(float(np.mean(values_ms)), 2)}
+
+
+def synthetic_dataset(num_classes, img_size=IMG_SIZE, batch_size=32, num_images=None, seed=42, augment=True):
+    """
+    Endless dataset of seeded random uint8 images that goes through the same
+    scale/augment/batch/prefetch stages as the real tf.data pipeline
+    """
+    from utils.data_pipeline import augment_image
+
+    num_images = num_images or batch_size * 4
+    rng = np.random.RandomState(seed)
+    images = rng.randint(0, 256, size=(num_images, *img_size, 3), dtype=np.uint8)
+    labels = np.eye(num_classes, dtype=np.float32)[rng.randint(0, num_classes, size=num_images)]
+
+    dataset = tf.data.Dataset.from_tensor_slices((images, labels))
+    dataset = dataset.map(lambda image, label: (tf.cast(image, tf.float32) / 255.0, label),
+                          num_parallel_calls=tf.data.AUTOTUNE)
+    if augment:
+        dataset = dataset.map(lambda image, label: (augment_image(image), label),
+                              num_parallel_calls=tf.data.AUTOTUNE)
+    return dataset.batch(batch_size, drop_remainder=True).repeat().prefetch(tf.data.AUTOTUNE)
+
+
+def source_dataset(source, batch_size, num_classes, img_size=IMG_SIZE, seed=42):
+    """(dataset, num_classes) for 'synthetic', a data/<class>/ folder or a shard folder"""
+    if source == SYNTHETIC_SOURCE:
+        return synthetic_dataset(num_classes, img_size, batch_size, seed=seed), num_classes
+
+    from utils.data_pipeline import build_training_datasets, build_training_datasets_from_shards
+    from utils.dataset_shards import is_shard_source
+    if is_shard_source(source):
+        splits = build_training_datasets_from_shards(source, batch_size=batch_size, validation_split=0.0, seed=seed)
+    else:
+        splits = build_training_datasets(source, img_size=img_size, batch_size=batch_size,
+                                         validation_split=0.0, seed=seed)
+    return splits.train_ds.repeat(), len(splits.class_indices)
+
+
+def source_revision():
+    """Git commit of the code being benchmarked, with a dirty flag; None outside a checkout"""
+    repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir, capture_output=True,
+                                text=True, timeout=10, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=repo_dir,
+                                capture_output=True, text=True, timeout=10, check=True).stdout
+        return {'commit': commit, 'dirty': bool(status.strip())}
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _training_benchmark_worker(config, results):
+    """Worker process entry point: time fixed-step training of one architecture on CPU"""
+    model_type = config['model_type']
+    try:
+        tf.config.set_visible_devices([], 'GPU')
+        threads = pin_worker_threads(config['threads'])
+        tf.keras.utils.set_random_seed(config['seed'])
+
+        from utils.training_engine import build_classifier
+        dataset, num_classes = source_dataset(config['source'], config['batch_size'], config['num_classes'],
+                                              seed=config['seed'])
+        model = build_classifier(model_type, num_classes)
+        model.compile(optimizer=tf.keras.optimizers.Adam(learning_rate=1e-3),
+                      loss='categorical_crossentropy', metrics=['accuracy'])
+
+        iterator = iter(dataset)
+        warmup_ms, wait_ms, step_ms = [], [], []
+        profile_dir = None
+        profile_window = range(config['warmup_steps'], config['warmup_steps'] + config['profile_steps'])
+
+        for step in range(config['warmup_steps'] + config['steps']):
+            if config['profile'] and step == profile_window.start:
+                profile_dir = os.path.join(config['metrics_dir'], 'profiles',
+                                           f"{model_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+                tf.profiler.experimental.start(profile_dir)
+
+            with tf.profiler.experimental.Trace('train', step_num=step, _r=1):
+                start = time.perf_counter()
+                images, labels = next(iterator)
+                fetched = time.perf_counter()
+                # train_on_batch returns host values, so the step is finished when it returns
+                model.train_on_batch(images, labels)
+                finished = time.perf_counter()
+
+            if config['profile'] and step == profile_window.stop - 1:
+                tf.profiler.experimental.stop()
+            if step < config['warmup_steps']:
+                warmup_ms.append((finished - start) * 1000)
+            else:
+                wait_ms.append((fetched - start) * 1000)
+                step_ms.append((finished - fetched) * 1000)
+
+        total_sec = (sum(wait_ms) + sum(step_ms)) / 1000
+        results.put({
+            'model_type': model_type,
+            'model_name': ModelFactory.SUPPORTED_MODELS.get(model_type, model_type),
+            'steps': config['steps'],
+            'batch_size': config['batch_size'],
+            'step_time_ms': _percentiles(step_ms),
+            'input_wait_ms': _percentiles(wait_ms),
+            'input_wait_fraction': round(sum(wait_ms) / 1000 / total_sec, 4) if total_sec else 0.0,
+            'images_per_sec': round(config['steps'] * config['batch_size'] / total_sec, 2) if total_sec else 0.0,
+            'first_step_ms': round(warmup_ms[0], 1) if warmup_ms else None,
+            'trainable_params': int(sum(np.prod(w.shape) for w in model.trainable_weights)),
+            'threads': threads['intra_op_threads'],
+            'peak_rss_mb': peak_rss_mb(),
+            'profile_dir': profile_dir
+        })
+
+    except Exception as e:
+        results.put({'model_type': model_type, 'error': str(e)})
+
+    finally:
+        results.put(None)
+
+
+def _change_pct(value, previous):
+    return round((value / previous - 1) * 100, 1) if previous else None
+
+
+def compare_reports(current, baseline):
+    """Per-model relative change (%) in images/sec and p50 step time against a baseline report"""
+    comparison = {}
+    for model_type, result in current.get('results', {}).items():
+        previous = baseline.get('results', {}).get(model_type)
+        if not previous or 'error' in result or 'error' in previous:
+            continue
+        comparison[model_type] = {
+            'images_per_sec_change_pct': _change_pct(result['images_per_sec'], previous['images_per_sec']),
+            'step_time_p50_change_pct': _change_pct(result['step_time_ms']['p50'], previous['step_time_ms']['p50'])
+        }
+    return comparison
+
+
+class TrainingBenchmark:
+    """
+    Fixed-step CPU training benchmark. Each architecture trains in a fresh
+    process with the same seed, data, batch size and thread count, so runs
+    from different commits can be compared.
+    """
+
+    def __init__(self, metrics_dir='metrics', source=SYNTHETIC_SOURCE, steps=20, warmup_steps=3, batch_size=32,
+                 threads=None, num_classes=10, seed=42, profile=False, profile_steps=5, timeout=1800):
+        if steps < 1:
+            raise ValueError('steps must be at least 1')
+        if source != SYNTHETIC_SOURCE and not os.path.isdir(source):
+            raise ValueError(f"Benchmark source must be '{SYNTHETIC_SOURCE}' or a dataset folder: {source}")
+
+        self.metrics_dir = metrics_dir
+        self.source = source
+        self.steps = steps
+        self.warmup_steps = max(1, warmup_steps)
+        self.batch_size = batch_size
+        self.threads = threads or os.cpu_count() or 1
+        self.num_classes = num_classes
+        self.seed = seed
+        self.profile = profile
+        self.profile_steps = max(1, min(profile_steps, steps))
+        self.timeout = timeout
+        self._context = mp.get_context('spawn')
+
+    def settings(self):
+        return {
+            'source': self.source,
+            'steps': self.steps,
+            'warmup_steps': self.warmup_steps,
+            'batch_size': self.batch_size,
+            'threads': self.threads,
+            'num_classes': self.num_classes,
+            'seed': self.seed,
+            'profile': self.profile
+        }
+
+    def benchmark_model(self, model_type):
+        """Train one architecture for the configured steps and return its result"""
+        print(f"⏱️ Benchmarking {ModelFactory.SUPPORTED_MODELS.get(model_type, model_type)} training "
+              f"({self.steps} steps of {self.batch_size}, {self.threads} threads)")
+        rows = run_isolated(self._context, _training_benchmark_worker, {
+            **self.settings(),
+            'model_type': model_type,
+            'metrics_dir': self.metrics_dir,
+            'profile_steps': self.profile_steps,
+            'error_keys': ('model_type',)
+        }, self.timeout)
+        result = rows[0] if rows else {'model_type': model_type, 'error': 'No result returned'}
+
+        if 'error' in result:
+            print(f"   ❌ {result['error']}")
+        else:
+            print(f"   {result['images_per_sec']} images/sec, step p50 {result['step_time_ms']['p50']} ms, "
+                  f"input wait {result['input_wait_fraction'] * 100:.1f}%")
+        return result
+
+    def run(self, model_types=None):
+        """Benchmark the given architectures (default: all supported) and write the report"""
+        model_types = model_types or list(ModelFactory.SUPPORTED_MODELS)
+        start_time = time.time()
+        results = {model_type: self.benchmark_model(model_type) for model_type in model_types}
+
+        report = {
+            'timestamp': datetime.now().isoformat(),
+            'elapsed': round(time.time() - start_time, 1),
+            'revision': source_revision(),
+            'settings': self.settings(),
+            'host': {
+                'cpu_count': os.cpu_count(),
+                'platform': platform.platform(),
+                'processor': platform.processor(),
+                'tensorflow': tf.__version__
+            },
+            'results': {model_type: {k: v for k, v in result.items() if k != 'model_type'}
+                        for model_type, result in results.items()}
+        }
+
+        os.makedirs(self.metrics_dir, exist_ok=True)
+        path = os.path.join(self.metrics_dir, TRAINING_BENCHMARK_FILE)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(report, f, indent=2)
+        os.replace(tmp_path, path)
+
+        # One line per run keeps the numbers of earlier commits for comparison
+        with open(os.path.join(self.metrics_dir, TRAINING_BENCHMARK_HISTORY_FILE), 'a') as f:
+            f.write(json.dumps(report) + '\n')
+        return report
@@ -0,0 +1,172 @@
+"""
+Keras callbacks shared by the training engine and its worker processes
+Progress recording, cooperative cancellation, per-epoch checkpoints and
+progress events
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+import tensorflow as tf
+
+# PROGRESS_KEYS lives in the TensorFlow-free metrics store; re-exported for existing imports
+from utils.metrics_store import PROGRESS_KEYS, MetricsStore
+
+
+def checkpoint_paths(models_dir, model_type):
+    """Model and state file of a model's training checkpoint"""
+    return (os.path.join(models_dir, f"{model_type}_checkpoint.h5"),
+            os.path.join(models_dir, f"{model_type}_checkpoint.json"))
+
+
+def save_model_atomic(model, path):
+    """
+    Save a Keras model through a temporary file, so a process that reloads
+    the file on an mtime change never reads a half-written model
+    """
+    root, extension = os.path.splitext(path)
+    tmp_path = f"{root}.{os.getpid()}.tmp{extension}"
+    model.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint_state(models_dir, model_type):
+    """Return the saved checkpoint state, or None if there is no usable checkpoint"""
+    model_path, state_path = checkpoint_paths(models_dir, model_type)
+    if not (os.path.exists(model_path) and os.path.exists(state_path)):
+        return None
+    with open(state_path, 'r') as f:
+        return json.load(f)
+
+
+def remove_checkpoint(models_dir, model_type):
+    """Delete a model's checkpoint once training completed"""
+    for path in checkpoint_paths(models_dir, model_type):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def epoch_event(model_type, epoch, logs, epoch_seconds=None):
+    """Incremental per-epoch progress event"""
+    logs = logs or {}
+    event = {'type': 'epoch', 'model': model_type, 'epoch': epoch + 1}
+    for key in PROGRESS_KEYS:
+        event[key] = float(logs.get(key, 0.0))
+    if epoch_seconds is not None:
+        event['epoch_seconds'] = epoch_seconds
+    return event
+
+
+class EpochTimer(tf.keras.callbacks.Callback):
+    """Wall time of the running epoch (training and validation)"""
+
+    def __init__(self):
+        super().__init__()
+        self._epoch_start = None
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self._epoch_start = time.perf_counter()
+
+    def epoch_seconds(self):
+        return time.perf_counter() - self._epoch_start if self._epoch_start is not None else None
+
+
+class ProgressCallback(EpochTimer):
+    """
+    Append each completed epoch to the metrics store; resume_epoch continues
+    the model's last run. An epoch cut short by a cancellation is not recorded.
+    """
+
+    def __init__(self, model_type, metrics_dir, resume_epoch=None, stop_event=None):
+        super().__init__()
+        self.model_type = model_type
+        self.store = MetricsStore(metrics_dir)
+        self.resume_epoch = resume_epoch
+        self.stop_event = stop_event
+        self.run_id = None
+
+    def on_train_begin(self, logs=None):
+        self.run_id = self.store.start_run(self.model_type, self.resume_epoch)
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self.stop_event is not None and self.stop_event.is_set():
+            return
+        self.store.append_epoch(self.run_id, self.model_type, epoch + 1, logs, self.epoch_seconds())
+
+    def history(self):
+        """Keras-style history of every epoch recorded for this run"""
+        return self.store.history(self.run_id)
+
+
+class EventBusCallback(EpochTimer):
+    """Publish model start and per-epoch deltas to a ProgressEventBus, skipping an epoch cut short by a cancellation"""
+
+    def __init__(self, bus, model_type, stop_event=None):
+        super().__init__()
+        self.bus = bus
+        self.model_type = model_type
+        self.stop_event = stop_event
+
+    def on_train_begin(self, logs=None):
+        self.bus.publish({'type': 'model_status', 'model': self.model_type, 'status': 'training',
+                          'epochs_total': self.params.get('epochs')})
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self.stop_event is not None and self.stop_event.is_set():
+            return
+        self.bus.publish(epoch_event(self.model_type, epoch, logs, self.epoch_seconds()))
+
+
+class CancellationCallback(tf.keras.callbacks.Callback):
+    """Stop model.fit at the next batch boundary once stop_event is set"""
+
+    def __init__(self, stop_event):
+        super().__init__()
+        self.stop_event = stop_event
+
+    def on_train_batch_end(self, batch, logs=None):
+        if self.stop_event.is_set():
+            self.model.stop_training = True
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self.stop_event.is_set():
+            self.model.stop_training = True
+
+
+class EpochCheckpoint(tf.keras.callbacks.Callback):
+    """
+    Save the model and a small JSON state file (epoch, mode, classes) after
+    every completed epoch so an interrupted run can resume from the last one.
+    The per-epoch history lives in the metrics store, not in the checkpoint.
+    Epochs cut short by a cancellation are not checkpointed.
+    """
+
+    def __init__(self, model_type, models_dir, mode, class_indices, stop_event=None, initial_state=None):
+        super().__init__()
+        self.model_path, self.state_path = checkpoint_paths(models_dir, model_type)
+        self.stop_event = stop_event
+        self.state = initial_state or {
+            'model_type': model_type,
+            'mode': mode,
+            'class_indices': class_indices,
+            'epoch': 0
+        }
+        # Checkpoints written before the metrics store carried the whole history
+        self.state.pop('history', None)
+
+    def on_epoch_end(self, epoch, logs=None):
+        if self.stop_event is not None and self.stop_event.is_set():
+            return
+
+        self.state['epoch'] = epoch + 1
+        self.state['timestamp'] = datetime.now().isoformat()
+
+        # Write to temporary files first so a crash never leaves a torn checkpoint
+        save_model_atomic(self.model, self.model_path)
+
+        tmp_state_path = self.state_path + '.tmp'
+        with open(tmp_state_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_state_path, self.state_path)
@@ -0,0 +1,401 @@
+"""
+tf.data based training engine
+Trains the supported architectures from the cached tf.data input pipeline and
+writes the same models/ and metrics/ artifacts as the generator-based pipeline
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+import tensorflow as tf
+
+from utils.model_factory import ModelFactory
+from utils.model_registry import SERVABLE_MODELS, STUDENT_MODEL
+from utils.inference_utils import IMG_SIZE, CLASS_INDICES_FILE, load_class_names
+from utils.data_pipeline import (build_distillation_datasets, build_training_datasets,
+                                 build_training_datasets_from_shards, list_split_files, ThroughputCallback)
+from utils.feature_cache import FeatureCache
+from utils.distillation import (DEFAULT_ALPHA, DEFAULT_TEMPERATURE, distillation_loss, distillation_targets,
+                                hard_label_accuracy, teacher_probabilities, trained_teachers)
+from utils.training_callbacks import (ProgressCallback, CancellationCallback, EpochCheckpoint, EventBusCallback,
+                                      checkpoint_paths, load_checkpoint_state, remove_checkpoint, save_model_atomic)
+
+# Feature cache tag of the ModelFactory feature extractors; changing it invalidates cached features
+FEATURE_CACHE_TAG = 'model_factory'
+
+def build_classifier(model_type, num_classes, img_size=IMG_SIZE):
+    """
+    Servable model of a model type, built by ModelFactory exactly as the
+    generator pipeline builds it, so every training path saves the same
+    architecture as {model}_model.h5
+    """
+    if model_type not in ModelFactory.SUPPORTED_MODELS:
+        raise ValueError(f'Unsupported model type: {model_type}')
+    return ModelFactory.create_model(model_type, num_classes, input_shape=(*img_size, 3))
+
+
+def split_classifier(model):
+    """
+    Split a sequential classifier into its feature extractor (the layers up to
+    the first flat (batch, features) output) and the classification head after
+    it. Both reuse the classifier's layers, so training the head trains the
+    classifier in place.
+    """
+    if not isinstance(model, tf.keras.Sequential):
+        raise ValueError('Head-only training needs a sequential classifier')
+
+    split = next((index for index, layer in enumerate(model.layers) if len(layer.output.shape) == 2), None)
+    if split is None or split == len(model.layers) - 1:
+        raise ValueError(f'Cannot find the classification head of {model.name}')
+
+    extractor = tf.keras.Sequential([tf.keras.Input(shape=model.input_shape[1:])] + model.layers[:split + 1],
+                                    name=f'{model.name}_features')
+    head = tf.keras.Sequential([tf.keras.Input(shape=model.layers[split].output.shape[1:])] + model.layers[split + 1:],
+                               name=f'{model.name}_head')
+    return extractor, head
+
+
+class TrainingEngine:
+    """Train models from the cached tf.data pipeline instead of ImageDataGenerator"""
+
+    def __init__(self, data_dir='data', models_dir='models', metrics_dir='metrics', img_size=IMG_SIZE,
+                 batch_size=32, epochs=10, validation_split=0.2, learning_rate=1e-3, cache_dir=None,
+                 event_bus=None, shard_dir=None):
+        self.data_dir = data_dir
+        self.models_dir = models_dir
+        self.metrics_dir = metrics_dir
+        self.img_size = img_size
+        self.batch_size = batch_size
+        self.epochs = epochs
+        self.validation_split = validation_split
+        self.learning_rate = learning_rate
+        self.cache_dir = cache_dir
+        self.event_bus = event_bus
+        self.shard_dir = shard_dir
+
+        for folder in (models_dir, metrics_dir):
+            os.makedirs(folder, exist_ok=True)
+
+    def load_datasets(self):
+        """Build the training/validation datasets from shards if configured, else from cached files"""
+        if self.shard_dir:
+            return build_training_datasets_from_shards(
+                self.shard_dir,
+                batch_size=self.batch_size,
+                validation_split=self.validation_split
+            )
+        return build_training_datasets(
+            self.data_dir,
+            img_size=self.img_size,
+            batch_size=self.batch_size,
+            validation_split=self.validation_split,
+            cache_dir=self.cache_dir
+        )
+
+    def settings(self):
+        """Constructor keyword arguments, so worker processes can rebuild an equivalent engine"""
+        return {
+            'img_size': self.img_size,
+            'batch_size': self.batch_size,
+            'epochs': self.epochs,
+            'validation_split': self.validation_split,
+            'learning_rate': self.learning_rate,
+            'shard_dir': self.shard_dir
+        }
+
+    def warm_cache(self):
+        """Decode the whole dataset once so concurrent trainers share a complete file cache"""
+        splits = self.load_datasets()
+        for dataset in (splits.train_ds, splits.val_ds):
+            if dataset is not None:
+                for _ in dataset:
+                    pass
+        return splits
+
+    def save_class_indices(self, class_indices):
+        """Persist class indices next to the models for serving"""
+        indices_path = os.path.join(self.models_dir, CLASS_INDICES_FILE)
+        tmp_path = f"{indices_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(class_indices, f, indent=2)
+        os.replace(tmp_path, indices_path)
+
+    def resumable_state(self, model_type, mode, class_indices):
+        """Checkpoint state to resume from, or None if missing or made for another mode/dataset"""
+        state = load_checkpoint_state(self.models_dir, model_type)
+        if state is None:
+            return None
+        if state.get('mode') != mode or state.get('class_indices') != class_indices:
+            print(f"♻️ Ignoring {model_type} checkpoint: trained in another mode or on other classes")
+            return None
+        return state
+
+    def load_checkpoint_model(self, model_type, loss='categorical_crossentropy', metrics=('accuracy',)):
+        """
+        Load checkpointed weights with a freshly compiled optimizer; Adam slots
+        stored in HDF5 do not restore reliably across Keras versions
+        """
+        model = tf.keras.models.load_model(checkpoint_paths(self.models_dir, model_type)[0], compile=False)
+        self._compile(model, loss, metrics)
+        return model
+
+    def _compile(self, model, loss='categorical_crossentropy', metrics=('accuracy',)):
+        model.compile(
+            optimizer=tf.keras.optimizers.Adam(learning_rate=self.learning_rate),
+            loss=loss,
+            metrics=list(metrics)
+        )
+
+    def _fit(self, model_type, model, train_ds, val_ds, num_samples, mode, class_indices,
+             callbacks=None, stop_event=None, state=None):
+        """
+        Run model.fit with progress, throughput, checkpoint and cancellation
+        callbacks, continuing after state['epoch'] when resuming.
+        Returns the history of all epochs of the run (from the metrics store) and whether it was cancelled.
+        """
+        initial_epoch = state['epoch'] if state else 0
+        throughput = ThroughputCallback(num_samples, model_type)
+        progress = ProgressCallback(model_type, self.metrics_dir, resume_epoch=initial_epoch if state else None,
+                                    stop_event=stop_event)
+        checkpoint = EpochCheckpoint(model_type, self.models_dir, mode, class_indices,
+                                     stop_event=stop_event, initial_state=state)
+
+        fit_callbacks = [throughput, progress, checkpoint] + list(callbacks or [])
+        if self.event_bus is not None:
+            fit_callbacks.append(EventBusCallback(self.event_bus, model_type, stop_event))
+        if stop_event is not None:
+            fit_callbacks.insert(0, CancellationCallback(stop_event))
+
+        model.fit(
+            train_ds,
+            validation_data=val_ds,
+            initial_epoch=initial_epoch,
+            epochs=self.epochs,
+            callbacks=fit_callbacks,
+            verbose=2
+        )
+
+        cancelled = stop_event is not None and stop_event.is_set()
+        return progress.history(), cancelled
+
+    def _cancelled_result(self, model_type):
+        state = load_checkpoint_state(self.models_dir, model_type)
+        epochs_completed = state['epoch'] if state else 0
+        print(f"⏹️ Training of {model_type} cancelled after {epochs_completed} completed epochs")
+        return {'status': 'cancelled', 'epochs_completed': epochs_completed, 'resumable': state is not None}
+
+    def train_model(self, model_type, splits=None, callbacks=None, stop_event=None, resume=False):
+        """
+        Train one model type and save its model and metrics.
+        With resume=True training continues from the last completed epoch checkpoint.
+        """
+        print(f"🚀 Training {ModelFactory.SUPPORTED_MODELS.get(model_type, model_type)} with tf.data pipeline")
+        start_time = time.time()
+
+        splits = splits or self.load_datasets()
+        self.save_class_indices(splits.class_indices)
+
+        state = self.resumable_state(model_type, 'full', splits.class_indices) if resume else None
+        if state:
+            print(f"⏯️ Resuming {model_type} from epoch {state['epoch']}")
+            model = self.load_checkpoint_model(model_type)
+        else:
+            model = build_classifier(model_type, len(splits.class_indices), self.img_size)
+            self._compile(model)
+
+        history, cancelled = self._fit(model_type, model, splits.train_ds, splits.val_ds, splits.train_samples,
+                                       'full', splits.class_indices, callbacks, stop_event, state)
+        if cancelled:
+            return self._cancelled_result(model_type)
+
+        save_model_atomic(model, os.path.join(self.models_dir, f"{model_type}_model.h5"))
+        remove_checkpoint(self.models_dir, model_type)
+        return self.save_metrics(model_type, history, time.time() - start_time, splits.train_samples,
+                                 splits.val_samples, history.get('images_per_sec', []))
+
+    def train_head_only(self, model_type, callbacks=None, stop_event=None, resume=False):
+        """
+        Train only the classification head on cached frozen-backbone embeddings.
+        The backbone runs once per new or changed image; augmentation is not
+        applied because features are precomputed.
+        """
+        if not self.cache_dir:
+            raise ValueError('Head-only training needs a cache directory')
+
+        print(f"🚀 Training {ModelFactory.SUPPORTED_MODELS.get(model_type, model_type)} head on cached features")
+        start_time = time.time()
+
+        train_files, val_files, class_indices = list_split_files(self.data_dir, self.validation_split)
+        if not train_files:
+            raise ValueError(f'No training images found in {self.data_dir}')
+        self.save_class_indices(class_indices)
+        num_classes = len(class_indices)
+
+        model = build_classifier(model_type, num_classes, self.img_size)
+        extractor, head = split_classifier(model)
+        feature_cache = FeatureCache(os.path.join(self.cache_dir, 'features'), model_type,
+                                     self.img_size, FEATURE_CACHE_TAG)
+
+        def feature_dataset(files, shuffle):
+            features = feature_cache.get_features([path for path, _ in files], extractor, self.batch_size)
+            labels = tf.one_hot([label for _, label in files], num_classes)
+            dataset = tf.data.Dataset.from_tensor_slices((features, labels))
+            if shuffle:
+                dataset = dataset.shuffle(len(files), reshuffle_each_iteration=True)
+            return dataset.batch(self.batch_size).prefetch(tf.data.AUTOTUNE)
+
+        train_ds = feature_dataset(train_files, shuffle=True)
+        val_ds = feature_dataset(val_files, shuffle=False) if val_files else None
+        if stop_event is not None and stop_event.is_set():
+            return self._cancelled_result(model_type)
+
+        state = self.resumable_state(model_type, 'head_only', class_indices) if resume else None
+        if state:
+            print(f"⏯️ Resuming {model_type} head from epoch {state['epoch']}")
+            checkpoint = tf.keras.models.load_model(checkpoint_paths(self.models_dir, model_type)[0], compile=False)
+            head.set_weights(checkpoint.get_weights())
+        self._compile(head)
+
+        history, cancelled = self._fit(model_type, head, train_ds, val_ds, len(train_files), 'head_only',
+                                       class_indices, callbacks, stop_event, state)
+        if cancelled:
+            return self._cancelled_result(model_type)
+
+        # The classifier shares the trained head's layers, so serving is unchanged
+        save_model_atomic(model, os.path.join(self.models_dir, f"{model_type}_model.h5"))
+        remove_checkpoint(self.models_dir, model_type)
+
+        return self.save_metrics(model_type, history, time.time() - start_time, len(train_files),
+                                 len(val_files), history.get('images_per_sec', []),
+                                 input_pipeline='feature_cache')
+
+    def train_student(self, teachers=None, temperature=DEFAULT_TEMPERATURE, alpha=DEFAULT_ALPHA, callbacks=None,
+                      stop_event=None, resume=False):
+        """
+        Distil the trained ensemble into one MobileNetV2-sized student served
+        as models/student_model.h5. Targets are the teachers' averaged
+        probabilities (cached per image and teacher version) plus the labels.
+        """
+        if not self.cache_dir:
+            raise ValueError('Distillation needs a cache directory for teacher outputs')
+
+        teachers = trained_teachers(self.models_dir, teachers)
+        if not teachers:
+            raise ValueError('Distillation needs at least one trained teacher model')
+
+        print(f"🎓 Distilling {', '.join(teachers)} into a {SERVABLE_MODELS[STUDENT_MODEL]}")
+        start_time = time.time()
+
+        train_files, val_files, class_indices = list_split_files(self.data_dir, self.validation_split)
+        if not train_files:
+            raise ValueError(f'No training images found in {self.data_dir}')
+        class_names = [name for name, _ in sorted(class_indices.items(), key=lambda item: item[1])]
+        if load_class_names(self.models_dir) != class_names:
+            raise ValueError('The teachers were trained on other classes; retrain them before distilling')
+        num_classes = len(class_names)
+
+        files = train_files + val_files
+        outputs = teacher_probabilities([path for path, _ in files], teachers, self.models_dir,
+                                        os.path.join(self.cache_dir, 'teachers'), self.img_size, self.batch_size)
+        soft = np.mean([outputs[m] for m in teachers], axis=0)
+        targets = distillation_targets([label for _, label in files], soft, num_classes)
+        if stop_event is not None and stop_event.is_set():
+            return self._cancelled_result(STUDENT_MODEL)
+
+        splits = build_distillation_datasets(train_files, val_files, class_indices,
+                                             targets[:len(train_files)], targets[len(train_files):],
+                                             img_size=self.img_size, batch_size=self.batch_size,
+                                             cache_dir=self.cache_dir)
+
+        loss = distillation_loss(num_classes, temperature, alpha)
+        metrics = (hard_label_accuracy(num_classes),)
+        state = self.resumable_state(STUDENT_MODEL, 'distill', class_indices) if resume else None
+        if state:
+            print(f"⏯️ Resuming student from epoch {state['epoch']}")
+            model = self.load_checkpoint_model(STUDENT_MODEL, loss, metrics)
+        else:
+            model = build_classifier('mobilenet', num_classes, self.img_size)
+            self._compile(model, loss, metrics)
+
+        history, cancelled = self._fit(STUDENT_MODEL, model, splits.train_ds, splits.val_ds, splits.train_samples,
+                                       'distill', class_indices, callbacks, stop_event, state)
+        if cancelled:
+            return self._cancelled_result(STUDENT_MODEL)
+
+        save_model_atomic(model, os.path.join(self.models_dir, f"{STUDENT_MODEL}_model.h5"))
+        remove_checkpoint(self.models_dir, STUDENT_MODEL)
+
+        # How close the student gets to the ensemble it learned from, on held-out images
+        distillation = {'teachers': teachers, 'temperature': temperature, 'alpha': alpha}
+        if val_files:
+            val_labels = np.array([label for _, label in val_files])
+            val_soft = soft[len(train_files):]
+            student_predictions = np.concatenate([np.argmax(model.predict_on_batch(images), axis=1)
+                                                  for images, _ in splits.val_ds])
+            distillation.update({
+                'ensemble_val_accuracy': float(np.mean(val_soft.argmax(axis=1) == val_labels)),
+                'student_val_accuracy': float(np.mean(student_predictions == val_labels)),
+                'agreement_with_ensemble': float(np.mean(student_predictions == val_soft.argmax(axis=1)))
+            })
+
+        return self.save_metrics(STUDENT_MODEL, history, time.time() - start_time, splits.train_samples,
+                                 splits.val_samples, history.get('images_per_sec', []),
+                                 input_pipeline='distillation', extra={'distillation': distillation})
+
+    def save_metrics(self, model_type, history, training_time, train_samples, val_samples, images_per_sec,
+                     input_pipeline='tf_data', extra=None):
+        """Write metrics/{model}_metrics.json in the format the analytics routes read"""
+        history = {key: [float(v) for v in values] for key, values in history.items()}
+        accuracy_key = 'val_accuracy' if history.get('val_accuracy') else 'accuracy'
+        accuracies = history.get(accuracy_key, [])
+
+        metrics = {
+            'model_type': model_type,
+            'model_name': SERVABLE_MODELS.get(model_type, model_type),
+            'history': history,
+            'training_time': training_time,
+            'input_pipeline': input_pipeline,
+            'train_samples': train_samples,
+            'val_samples': val_samples,
+            'images_per_sec': images_per_sec,
+            'timestamp': datetime.now().isoformat(),
+            'summary': {
+                'best_val_accuracy': max(accuracies) if accuracies else 0,
+                'final_accuracy': accuracies[-1] if accuracies else 0,
+                'total_epochs': len(accuracies)
+            },
+            **(extra or {})
+        }
+
+        with open(os.path.join(self.metrics_dir, f"{model_type}_metrics.json"), 'w') as f:
+            json.dump(metrics, f, indent=2)
+
+        return {
+            'status': 'success',
+            'final_accuracy': metrics['summary']['final_accuracy'],
+            'training_time': training_time
+        }
+
+    def train_all_models(self, selected_models, head_only=False, stop_event=None, resume=False):
+        """Train the selected models one after another, sharing one dataset or feature cache"""
+        results = {}
+        splits = None if head_only else self.load_datasets()
+
+        for model_type in selected_models:
+            if stop_event is not None and stop_event.is_set():
+                results[model_type] = {'status': 'cancelled', 'epochs_completed': 0}
+                continue
+            try:
+                if head_only:
+                    results[model_type] = self.train_head_only(model_type, stop_event=stop_event, resume=resume)
+                else:
+                    results[model_type] = self.train_model(model_type, splits=splits, stop_event=stop_event,
+                                                           resume=resume)
+            except Exception as e:
+                print(f"❌ Error training {model_type}: {e}")
+                results[model_type] = {'status': 'error', 'error': str(e)}
+
+        return results
@@ -0,0 +1,237 @@
+"""
+Parallel multi-model training scheduler
+Runs several model trainings concurrently in separate worker processes, each
+with its own CPU-thread quota, while respecting a global memory limit.
+Workers stop cooperatively on cancel() and are terminated after a grace period.
+"""
+
+import os
+import time
+import queue
+import multiprocessing as mp
+
+from utils.model_factory import ModelFactory
+from utils.model_registry import STUDENT_MODEL
+
+# Rough peak memory of one training worker (MB), used for admission control
+TRAINING_MEMORY_ESTIMATES_MB = {
+    'mobilenet': 1500,
+    STUDENT_MODEL: 1500,
+    'efficientnet': 2000,
+    'densenet': 2500,
+    'resnet': 3000
+}
+DEFAULT_MEMORY_ESTIMATE_MB = 2500
+
+
+def _configure_worker_threads(threads):
+    """Pin the worker's math libraries and TensorFlow pools to its CPU quota"""
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+
+    import tensorflow as tf
+    tf.config.threading.set_intra_op_parallelism_threads(threads)
+    tf.config.threading.set_inter_op_parallelism_threads(max(1, min(2, threads)))
+    return tf
+
+
+def _train_worker(model_type, config, events, stop_event):
+    """Worker process entry point: train one model and report progress and result"""
+    try:
+        tf = _configure_worker_threads(config['threads'])
+
+        from utils.training_callbacks import EpochTimer, epoch_event
+
+        class QueueProgressCallback(EpochTimer):
+            def on_epoch_end(self, epoch, logs=None):
+                if stop_event.is_set():
+                    return
+                events.put(dict(epoch_event(model_type, epoch, logs, self.epoch_seconds()),
+                                type='progress', pid=os.getpid()))
+
+        if model_type == STUDENT_MODEL or config['input_pipeline'] in ('tf_data', 'shards'):
+            from utils.training_engine import TrainingEngine
+            engine = TrainingEngine(
+                data_dir=config['data_dir'],
+                models_dir=config['models_dir'],
+                metrics_dir=config['metrics_dir'],
+                cache_dir=config['cache_dir'],
+                **config.get('engine_kwargs', {})
+            )
+            if model_type == STUDENT_MODEL:
+                result = engine.train_student(callbacks=[QueueProgressCallback()], stop_event=stop_event,
+                                              resume=config['resume'], **config.get('distill_kwargs', {}))
+            else:
+                train = engine.train_head_only if config['head_only'] else engine.train_model
+                result = train(model_type, callbacks=[QueueProgressCallback()], stop_event=stop_event,
+                               resume=config['resume'])
+        else:
+            # The generator pipeline cannot be interrupted cooperatively; cancel() terminates it
+            from utils.training_utils import TrainingPipeline
+            pipeline = TrainingPipeline(
+                data_dir=config['data_dir'],
+                models_dir=config['models_dir'],
+                metrics_dir=config['metrics_dir']
+            )
+            result = pipeline.train_all_models([model_type]).get(model_type, {
+                'status': 'error', 'error': 'No result returned'
+            })
+
+        # Export the TFLite variants here too, so conversion never runs in the serving process
+        export = config.get('export_kwargs')
+        if export and result.get('status') == 'success' and not stop_event.is_set():
+            from utils.tflite_export import export_model
+            try:
+                export_model(model_type, models_dir=config['models_dir'], data_dir=config['data_dir'],
+                             metrics_dir=config['metrics_dir'], **export)
+                result['tflite_exported'] = True
+            except Exception as e:
+                print(f"⚠️ TFLite export failed for {model_type}: {e}")
+                result['tflite_exported'] = False
+
+        events.put({'type': 'result', 'model': model_type, 'result': result})
+
+    except Exception as e:
+        events.put({'type': 'result', 'model': model_type, 'result': {'status': 'error', 'error': str(e)}})
+
+
+class TrainingScheduler:
+    """
+    Schedule one worker process per model. Jobs start largest-first while a
+    worker slot is free and the estimated memory of running jobs stays under
+    memory_limit_mb (one job is always allowed to run).
+    """
+
+    def __init__(self, data_dir='data', models_dir='models', metrics_dir='metrics', cache_dir=None,
+                 max_workers=None, threads_per_worker=None, memory_limit_mb=None,
+                 input_pipeline='generator', head_only=False, resume=False, engine_kwargs=None,
+                 distill_kwargs=None, export_kwargs=None, cancel_grace_sec=30):
+        cpu_count = os.cpu_count() or 1
+        self.max_workers = max(1, max_workers or min(len(ModelFactory.SUPPORTED_MODELS), cpu_count))
+        self.threads_per_worker = max(1, threads_per_worker or cpu_count // self.max_workers)
+        self.memory_limit_mb = memory_limit_mb or None
+        self.config = {
+            'data_dir': data_dir,
+            'models_dir': models_dir,
+            'metrics_dir': metrics_dir,
+            'cache_dir': cache_dir,
+            'input_pipeline': input_pipeline,
+            'head_only': head_only,
+            'resume': resume,
+            'threads': self.threads_per_worker,
+            'engine_kwargs': engine_kwargs or {},
+            'distill_kwargs': distill_kwargs or {},
+            'export_kwargs': export_kwargs
+        }
+        # TensorFlow is not fork-safe; always start clean interpreters
+        self._context = mp.get_context('spawn')
+        self._stop_event = self._context.Event()
+        self._cancelled_at = None
+        self.cancel_grace_sec = cancel_grace_sec
+        self.workers = {}
+
+    @staticmethod
+    def memory_estimate(model_type):
+        """Estimated peak memory of training one model (MB)"""
+        return TRAINING_MEMORY_ESTIMATES_MB.get(model_type, DEFAULT_MEMORY_ESTIMATE_MB)
+
+    def _can_start(self, model_type):
+        """Check worker slots and the global memory limit"""
+        if len(self.workers) >= self.max_workers:
+            return False
+        if not self.workers or not self.memory_limit_mb:
+            return True
+        running_mb = sum(self.memory_estimate(m) for m in self.workers)
+        return running_mb + self.memory_estimate(model_type) <= self.memory_limit_mb
+
+    def cancel(self):
+        """Ask running workers to stop after their current batch and start no new jobs"""
+        if self._cancelled_at is None:
+            self._cancelled_at = time.time()
+        self._stop_event.set()
+
+    @property
+    def cancelled(self):
+        return self._stop_event.is_set()
+
+    def _terminate_stragglers(self):
+        """Terminate workers that ignored the stop request for longer than the grace period"""
+        if self._cancelled_at is None or time.time() - self._cancelled_at < self.cancel_grace_sec:
+            return
+        for model_type, process in self.workers.items():
+            if process.is_alive():
+                print(f"🛑 Terminating {model_type} worker (pid {process.pid})")
+                process.terminate()
+
+    def run(self, selected_models, on_event=None):
+        """
+        Train the selected models and block until all workers finish.
+        on_event receives every progress/started/result event dict.
+        """
+        events = self._context.Queue()
+        pending = sorted(selected_models, key=self.memory_estimate, reverse=True)
+        results = {}
+
+        def emit(event):
+            if on_event:
+                on_event(event)
+
+        def handle(event):
+            if event['type'] == 'result':
+                results[event['model']] = event['result']
+                process = self.workers.pop(event['model'], None)
+                if process is not None:
+                    process.join(timeout=30)
+            emit(event)
+
+        while pending or self.workers:
+            if self.cancelled:
+                for model_type in pending:
+                    handle({'type': 'result', 'model': model_type,
+                            'result': {'status': 'cancelled', 'epochs_completed': 0}})
+                pending = []
+                self._terminate_stragglers()
+
+            # Admit as many pending jobs as slots and memory allow
+            for model_type in list(pending):
+                if not self._can_start(model_type):
+                    continue
+                process = self._context.Process(
+                    target=_train_worker,
+                    args=(model_type, self.config, events, self._stop_event),
+                    name=f'train-{model_type}',
+                    daemon=True
+                )
+                process.start()
+                self.workers[model_type] = process
+                pending.remove(model_type)
+                print(f"🧵 Started {model_type} worker (pid {process.pid}, {self.threads_per_worker} threads)")
+                emit({'type': 'started', 'model': model_type, 'pid': process.pid})
+
+            try:
+                handle(events.get(timeout=1.0))
+            except queue.Empty:
+                pass
+
+            # Workers that died without reporting a result (e.g. killed by the OOM killer)
+            for model_type, process in list(self.workers.items()):
+                if process.is_alive():
+                    continue
+
+                # Give the queue feeder a moment, then drain results that raced the exit
+                time.sleep(0.5)
+                try:
+                    while True:
+                        handle(events.get_nowait())
+                except queue.Empty:
+                    pass
+
+                if model_type not in results:
+                    if self.cancelled:
+                        result = {'status': 'cancelled', 'epochs_completed': None}
+                    else:
+                        result = {'status': 'error', 'error': f'Worker exited with code {process.exitcode}'}
+                    handle({'type': 'result', 'model': model_type, 'result': result})
+                self.workers.pop(model_type, None)
+
+        return results
@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+"""
+Production WSGI entry point
+Serve with gunicorn (settings in gunicorn.conf.py):
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+
+Unless overridden in the environment, predictions run in inference worker
+processes that load the models before the server accepts requests, and
+training runs in worker processes, so neither competes with request
+handling for the GIL. With WARMUP_ON_START=0 the models load on the first
+prediction instead, for the fastest cold start.
+"""
+
+import os
+
+os.environ.setdefault('INFERENCE_WORKERS', '1')
+os.environ.setdefault('TRAINING_SUBPROCESS', '1')
+
+from app import app, start_background_services, warm_up
+
+start_background_services()
+if app.config['WARMUP_ON_START']:
+    warm_up()
+
+application = app